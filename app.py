@@ -1,56 +1,131 @@
-import logging
-from logging.handlers import RotatingFileHandler
 from flask import Flask
-from modelo import init_db
+from werkzeug.local import LocalProxy
+from werkzeug.middleware.proxy_fix import ProxyFix
 from extensions import db
-from logica.Login.login import bp_login
-from logica.Admin.administracion import bp_admin
-from logica.Logica_Historial.Control_Historial import bp_historial  # Importar el blueprint de historial
 from datetime import datetime
 import os
 
-app = Flask(__name__)
+# Valores por defecto; las variables de entorno del mismo nombre los sobrescriben
+SECRET_KEY_DESARROLLO = 'atarazana'
 
-# Configuración básica de la app
-app.config['SECRET_KEY'] = 'atarazana'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mensajeria.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+def _cargar_configuracion(app, configuracion=None):
+    """Lee una sola vez la configuración base; `configuracion` (p. ej. en pruebas) tiene prioridad"""
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', SECRET_KEY_DESARROLLO)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Tokens aceptados por /api/resultados (separados por comas)
+    app.config['INGESTA_TOKENS'] = [t for t in os.environ.get('INGESTA_TOKENS', '').split(',') if t]
+    # Crear esquema y semillas al arrancar si la versión registrada no coincide;
+    # con 0 se espera que el despliegue ejecute `flask init-db`
+    app.config['BD_INICIALIZAR_AL_ARRANCAR'] = os.environ.get(
+        'BD_INICIALIZAR_AL_ARRANCAR', '1').lower() in ('1', 'true', 'si', 'sí')
+    # Proxies de confianza delante de la aplicación (nginx, balanceador); con 0 se usa
+    # la IP de la conexión. Nunca mayor que los saltos reales: X-Forwarded-For se puede falsificar
+    app.config['PROXY_SALTOS'] = int(os.environ.get('PROXY_SALTOS', 0))
+    if configuracion:
+        app.config.update(configuracion)
 
-# Configuración básica del logging
-if not os.path.exists('logs'):
-    os.mkdir('logs')
+def _registrar_blueprints(app):
+    # Importados aquí: cargar el módulo app no arrastra toda la lógica de negocio
+    from logica.Login.login import bp_login
+    from logica.Admin.administracion import bp_admin
+    from logica.Logica_Historial.Control_Historial import bp_historial
+    from logica.Logica_Campanias.Ingesta_Resultados import bp_ingesta
+    from logica.Logica_Campanias.Control_Campanias import bp_campanias
+    from logica.Logica_Trabajos.Control_Trabajos import bp_trabajos
 
-file_handler = RotatingFileHandler('logs/publimes.log', maxBytes=10240, backupCount=3)
-file_handler.setFormatter(logging.Formatter(
-    '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-))
-file_handler.setLevel(logging.INFO)
-app.logger.addHandler(file_handler)
+    app.register_blueprint(bp_login)
+    app.register_blueprint(bp_admin, url_prefix='/admin')
+    app.register_blueprint(bp_historial, url_prefix='/historial')
+    app.register_blueprint(bp_ingesta, url_prefix='/api')
+    app.register_blueprint(bp_trabajos, url_prefix='/trabajos')
+    app.register_blueprint(bp_campanias, url_prefix='/campanias')
 
-app.logger.setLevel(logging.INFO)
-app.logger.info('Inicio de la aplicación Publimes')
+def create_app(configuracion=None):
+    """Crea y configura la aplicación Publimes"""
+    from base_datos import configurar_base_datos
+    from bitacora import configurar_logging
+    from metricas import configurar_metricas
+    from consultas_repetidas import configurar_detector_n1
+    from consultas_lentas import configurar_consultas_lentas
+    from contrasenas import configurar_contrasenas
+    from decoradores import obtener_usuario_actual
+    from modelo import asegurar_base_datos
 
-# Inicializar base de datos
-db.init_app(app)
+    app = Flask(__name__)
+    _cargar_configuracion(app, configuracion)
 
-# Context processor para el año actual
-@app.context_processor
-def inject_current_year():
-    return {'current_year': datetime.now().year}
+    # IP y esquema reales del cliente detrás de PROXY_SALTOS proxies (límite de login, logs)
+    if app.config['PROXY_SALTOS']:
+        saltos = app.config['PROXY_SALTOS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos, x_host=saltos)
 
-# Inicializar la base de datos
-init_db(app)
+    # URI y pool desde el entorno (DATABASE_URL, DB_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS, ...)
+    configurar_base_datos(app)
 
-# Registrar Blueprints (añadido bp_historial)
-app.register_blueprint(bp_login)
-app.register_blueprint(bp_admin, url_prefix='/admin')
-app.register_blueprint(bp_historial, url_prefix='/historial')  # Añadido el blueprint de historial
+    # Algoritmo y costo del hash de contraseñas (CONTRASENA_METODO, CONTRASENA_COSTO, CONTRASENA_HILOS)
+    configurar_contrasenas(app)
+
+    # Logging estructurado fuera del hilo de la petición (LOG_DIR, LOG_NIVEL, LOG_ROTACION, ...)
+    configurar_logging(app)
+    app.logger.info('Inicio de la aplicación Publimes')
+
+    # Métricas por endpoint en /metrics (METRICAS_HABILITADAS, METRICAS_TOKEN)
+    configurar_metricas(app)
+
+    # Detector de consultas N+1 (N1_MODO: desactivado | advertir | fallar)
+    configurar_detector_n1(app)
+
+    # Log aparte de consultas lentas con su plan (CONSULTA_LENTA_MS, CONSULTAS_LENTAS_LOG; 0 lo desactiva)
+    configurar_consultas_lentas(app)
+
+    # Inicializar base de datos
+    db.init_app(app)
+
+    # Context processor para el año actual
+    @app.context_processor
+    def inject_current_year():
+        return {'current_year': datetime.now().year}
+
+    # Context processor para el usuario en sesión (se carga solo si la plantilla lo usa)
+    @app.context_processor
+    def inject_usuario_actual():
+        return {'usuario_actual': LocalProxy(obtener_usuario_actual)}
+
+    # Esquema y semillas: una consulta si la base ya está en la versión actual
+    if app.config['BD_INICIALIZAR_AL_ARRANCAR']:
+        if asegurar_base_datos(app):
+            app.logger.info('Base de datos inicializada')
+
+    _registrar_blueprints(app)
+
+    from logica.Logica_Campanias.Ingesta_Resultados import buffer_resultados
+    from trabajos import gestor_trabajos
+    from comandos import registrar_comandos
+    from limite_login import limitador_login
+
+    # Buffer de escritura diferida para los resultados de envío
+    buffer_resultados.init_app(app)
+
+    # Trabajos en segundo plano (importaciones, exportaciones XLSX, cambios masivos)
+    gestor_trabajos.init_app(app)
+
+    # Límite de intentos de inicio de sesión (LOGIN_INTENTOS_USUARIO, LOGIN_INTENTOS_IP, LOGIN_ALMACEN)
+    limitador_login.init_app(app)
+
+    # Comandos de mantenimiento (flask init-db, flask reconstruir-busqueda, ...)
+    registrar_comandos(app)
+
+    return app
 
 # Iniciar el servidor
 if __name__ == '__main__':
+    from werkzeug.serving import is_running_from_reloader
+    # Con debug el proceso vigilante del recargador solo relanza al hijo y nunca atiende
+    # peticiones: la aplicación completa se crea únicamente en el hijo
+    app = create_app() if is_running_from_reloader() else Flask(__name__)
     app.run(
         host='0.0.0.0',
         port=5005,
         debug=True,
         threaded=True
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Valores por defecto, sobrescribibles por variables de entorno
+URI_POR_DEFECTO = 'sqlite:///mensajeria.db'
+SQLITE_BUSY_TIMEOUT_MS = 15000
+
+def _entero_entorno(nombre, default):
+    valor = os.environ.get(nombre)
+    return int(valor) if valor else default
+
+def configurar_base_datos(app):
+    """Define URI y opciones del engine según el entorno (SQLite o servidor, p. ej. Postgres)"""
+    uri = os.environ.get('DATABASE_URL') or app.config.get('SQLALCHEMY_DATABASE_URI') or URI_POR_DEFECTO
+    # Algunos proveedores entregan el esquema antiguo "postgres://"
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri
+
+    opciones = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    if uri.startswith('sqlite'):
+        busy_timeout = _entero_entorno('SQLITE_BUSY_TIMEOUT_MS', SQLITE_BUSY_TIMEOUT_MS)
+        app.config['SQLITE_BUSY_TIMEOUT_MS'] = busy_timeout
+        connect_args = opciones.setdefault('connect_args', {})
+        connect_args.setdefault('timeout', busy_timeout / 1000)
+        connect_args.setdefault('check_same_thread', False)
+    else:
+        opciones.setdefault('pool_size', _entero_entorno('DB_POOL_SIZE', 10))
+        opciones.setdefault('max_overflow', _entero_entorno('DB_MAX_OVERFLOW', 20))
+        opciones.setdefault('pool_timeout', _entero_entorno('DB_POOL_TIMEOUT', 30))
+        opciones.setdefault('pool_recycle', _entero_entorno('DB_POOL_RECYCLE', 1800))
+        opciones.setdefault('pool_pre_ping', True)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones
+
+@event.listens_for(Engine, 'connect')
+def _pragmas_sqlite(conexion_dbapi, registro_conexion):
+    """WAL, busy timeout, synchronous=NORMAL y claves foráneas en cada conexión SQLite"""
+    if not isinstance(conexion_dbapi, sqlite3.Connection):
+        return
+    cursor = conexion_dbapi.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f'PRAGMA busy_timeout={_entero_entorno("SQLITE_BUSY_TIMEOUT_MS", SQLITE_BUSY_TIMEOUT_MS)}')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute('PRAGMA foreign_keys=ON')
+    finally:
+        cursor.close()
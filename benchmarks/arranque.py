@@ -0,0 +1,57 @@
+"""Tiempo de arranque de un proceso (lo que tarda cada worker al escalar o redesplegar)
+
+    python benchmarks/arranque.py [--repeticiones 5]
+
+Cada medición corre en un proceso nuevo para incluir la importación de módulos.
+"Base nueva" crea esquema y semillas; "base al día" es el caso normal de un
+worker, en el que solo se consulta la versión del esquema.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROCESO = '''
+import json, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+sys.path.insert(0, {benchmarks!r})
+from entorno import configuracion_temporal
+configuracion = configuracion_temporal(SQLALCHEMY_DATABASE_URI={uri!r})
+importado = time.perf_counter()
+from app import create_app
+create_app(configuracion)
+fin = time.perf_counter()
+print(json.dumps({{'importacion': importado - inicio, 'total': fin - inicio}}))
+'''
+
+def _medir(uri):
+    codigo = PROCESO.format(raiz=RAIZ, benchmarks=os.path.join(RAIZ, 'benchmarks'), uri=uri)
+    entorno = {clave: valor for clave, valor in os.environ.items() if clave != 'DATABASE_URL'}
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])['total']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    argumentos = parser.parse_args()
+
+    nuevas, al_dia = [], []
+    for _ in range(argumentos.repeticiones):
+        ruta = os.path.join(tempfile.mkdtemp(prefix='publimes-arranque-'), 'publimes.db')
+        uri = f'sqlite:///{ruta}'
+        nuevas.append(_medir(uri))
+        al_dia.append(_medir(uri))
+
+    for etiqueta, tiempos in (('Base nueva (init_db)', nuevas), ('Base al día (worker)', al_dia)):
+        print(f'{etiqueta:<25} mediana {statistics.median(tiempos) * 1000:>8.1f} ms   '
+              f'mín {min(tiempos) * 1000:>8.1f} ms   máx {max(tiempos) * 1000:>8.1f} ms')
+
+if __name__ == '__main__':
+    main()
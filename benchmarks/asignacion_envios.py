@@ -0,0 +1,79 @@
+"""Asignación de un envío de 1M de mensajes sobre 20k chips
+
+    python benchmarks/asignacion_envios.py [--mensajes 1000000] [--chips 20000]
+
+Mide por separado el reparto en memoria (repartir) y la asignación completa
+(lectura de chips elegibles + inserción de los DetalleEnvioChip en un lote).
+"""
+import argparse
+import random
+from datetime import date, datetime, timedelta
+from entorno import crear_app_temporal, cronometro
+
+def poblar(chips, historial):
+    """Chips activos con celular asignado y algo de historial de carga y fallos"""
+    from sqlalchemy import insert
+    from extensions import db
+    from modelo import Celular, CelularChip, Chip, DetalleEnvioChip, EnvioCampania
+
+    hoy = date.today()
+    db.session.execute(insert(Chip.__table__), [
+        {'numero': f'9{i:08d}', 'iccid': f'8951{i:015d}', 'operadora': ('CLARO', 'ENTEL', 'MOVISTAR')[i % 3],
+         'fecha_adquisicion': hoy, 'fecha_registro': hoy, 'fecha_activacion': hoy,
+         'estado_actual': 'ACTIVO', 'tiene_whatsapp': i % 2 == 0}
+        for i in range(chips)
+    ])
+    db.session.execute(insert(Celular.__table__), [
+        {'imei': f'35{i:013d}', 'fecha_adquisicion': hoy, 'fecha_registro': hoy} for i in range(chips)
+    ])
+    db.session.execute(insert(CelularChip.__table__), [
+        {'idCelular': i + 1, 'idChip': i + 1, 'fecha_asignacion': datetime.utcnow()} for i in range(chips)
+    ])
+    anterior = EnvioCampania(cantidad_programada=0, fecha_envio=datetime.utcnow() - timedelta(days=2))
+    db.session.add(anterior)
+    db.session.flush()
+    azar = random.Random(1)
+    db.session.execute(insert(DetalleEnvioChip.__table__), [
+        {'idEnvio': anterior.idEnvio, 'idChip': azar.randint(1, chips), 'cantidad_asignada': 200,
+         'cantidad_enviada': azar.randint(100, 200), 'cantidad_fallida': azar.randint(0, 60),
+         'fecha_inicio': datetime.utcnow() - timedelta(hours=azar.randint(1, 100)), 'estado': 'COMPLETADO'}
+        for _ in range(historial)
+    ])
+    nuevo = EnvioCampania(cantidad_programada=0)
+    db.session.add(nuevo)
+    db.session.commit()
+    return nuevo.idEnvio
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mensajes', type=int, default=1_000_000)
+    parser.add_argument('--chips', type=int, default=20_000)
+    parser.add_argument('--historial', type=int, default=20_000, help='Detalles previos (carga y fallos)')
+    argumentos = parser.parse_args()
+
+    app = crear_app_temporal()
+    from extensions import db
+    from modelo import EnvioCampania
+    from logica.Logica_Campanias.Asignacion_Envios import CAPACIDAD_CHIP, asignar_envio, repartir
+
+    with app.app_context():
+        with cronometro(f'Poblar {argumentos.chips} chips'):
+            id_envio = poblar(argumentos.chips, argumentos.historial)
+
+        azar = random.Random(2)
+        chips = [(i, azar.randint(0, 300), azar.randint(0, 500), azar.randint(0, 50))
+                 for i in range(1, argumentos.chips + 1)]
+        with cronometro(f'repartir {argumentos.mensajes} mensajes (memoria)'):
+            asignaciones = repartir(argumentos.mensajes, chips)
+        assert sum(asignaciones.values()) <= argumentos.mensajes
+        assert all(cantidad <= CAPACIDAD_CHIP for cantidad in asignaciones.values())
+
+        db.session.get(EnvioCampania, id_envio).cantidad_programada = argumentos.mensajes
+        db.session.commit()
+        with cronometro(f'asignar_envio {argumentos.mensajes} mensajes (con base)'):
+            resultado = asignar_envio(id_envio)
+        print(f'{resultado.asignado} mensajes asignados en {resultado.chips} chips '
+              f'(faltan {resultado.faltante})')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Rendimiento (peticiones/s y latencias) de las páginas de inventario según la cantidad de workers
+
+    python benchmarks/carga_workers.py --workers 1,2,4,8 --clientes 32 --duracion 20
+
+Arranca gunicorn con gunicorn.conf.py para cada cantidad de workers, inicia
+sesión con un usuario por cliente y recorre las URLs en bucle durante
+`--duracion` segundos. Usa la base configurada (DATABASE_URL o la de instance/);
+conviene una copia con datos de volumen real.
+"""
+import argparse
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URLS = ['/historial/chips', '/historial/celulares', '/historial/estados', '/dashboard']
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _esperar_puerto(puerto, limite=60):
+    fin = time.monotonic() + limite
+    while time.monotonic() < fin:
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn no respondió en el puerto {puerto}')
+
+def _iniciar_sesion(puerto, usuario, contrasena):
+    conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+    conexion.request('POST', '/', body=urlencode({'usuario': usuario, 'contrasena': contrasena}),
+                     headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    respuesta = conexion.getresponse()
+    respuesta.read()
+    cookie = (respuesta.getheader('Set-Cookie') or '').split(';', 1)[0]
+    if respuesta.status != 302 or not cookie:
+        raise RuntimeError(f'No se pudo iniciar sesión como {usuario} (HTTP {respuesta.status})')
+    return conexion, cookie
+
+def _cliente(puerto, argumentos, fin, latencias, errores):
+    conexion, cookie = _iniciar_sesion(puerto, argumentos.usuario, argumentos.contrasena)
+    indice = 0
+    while time.monotonic() < fin:
+        url = argumentos.urls[indice % len(argumentos.urls)]
+        indice += 1
+        inicio = time.perf_counter()
+        try:
+            conexion.request('GET', url, headers={'Cookie': cookie})
+            respuesta = conexion.getresponse()
+            respuesta.read()
+        except (OSError, http.client.HTTPException) as e:
+            errores.append(type(e).__name__)
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+            continue
+        if respuesta.status != 200:
+            errores.append(respuesta.status)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+
+def medir(workers, argumentos):
+    """Una corrida con `workers` procesos; devuelve peticiones/s, percentiles y errores"""
+    puerto = _puerto_libre()
+    pidfile = os.path.join(tempfile.mkdtemp(), 'gunicorn.pid')
+    entorno = dict(os.environ, WEB_WORKERS=str(workers), GUNICORN_BIND=f'127.0.0.1:{puerto}',
+                   WEB_THREADS=str(argumentos.hilos), LOG_ACCESO='0', GUNICORN_LOGLEVEL='warning')
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-p', pidfile, 'wsgi:app'],
+        cwd=RAIZ, env=entorno
+    )
+    try:
+        _esperar_puerto(puerto)
+        latencias, errores = [], []
+        fin = time.monotonic() + argumentos.duracion
+        hilos = [threading.Thread(target=_cliente, args=(puerto, argumentos, fin, latencias, errores))
+                 for _ in range(argumentos.clientes)]
+        inicio = time.monotonic()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        transcurrido = time.monotonic() - inicio
+    finally:
+        proceso.send_signal(signal.SIGTERM)
+        proceso.wait(60)
+
+    latencias.sort()
+
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0
+
+    return {
+        'workers': workers,
+        'peticiones_s': len(latencias) / transcurrido,
+        'p50_ms': percentil(0.50),
+        'p95_ms': percentil(0.95),
+        'media_ms': statistics.fmean(latencias) * 1000 if latencias else 0,
+        'errores': len(errores),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4', help='Cantidades de workers separadas por comas')
+    parser.add_argument('--hilos', type=int, default=4, help='Hilos por worker (WEB_THREADS)')
+    parser.add_argument('--clientes', type=int, default=16, help='Clientes concurrentes')
+    parser.add_argument('--duracion', type=float, default=15, help='Segundos por medición')
+    parser.add_argument('--usuario', default='admin')
+    parser.add_argument('--contrasena', default='admin123')
+    parser.add_argument('--urls', nargs='+', default=URLS)
+    argumentos = parser.parse_args()
+
+    print(f"{'workers':>7} {'pet/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'media ms':>9} {'errores':>8}")
+    for workers in [int(n) for n in argumentos.workers.split(',')]:
+        r = medir(workers, argumentos)
+        print(f"{r['workers']:>7} {r['peticiones_s']:>9.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['media_ms']:>9.1f} {r['errores']:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Aplicación sobre una base SQLite temporal, compartida por los benchmarks"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+def configuracion_temporal(**extra):
+    directorio = tempfile.mkdtemp(prefix='publimes-bench-')
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.join(directorio, "publimes.db")}',
+        'LOG_DIR': os.path.join(directorio, 'logs'),
+        'LOG_ACCESO': False,
+        'CONSULTA_LENTA_MS': 0,
+        'TRABAJOS_DIR': os.path.join(directorio, 'trabajos'),
+        'WTF_CSRF_ENABLED': False,
+        **extra,
+    }
+
+def crear_app_temporal(**extra):
+    from app import create_app
+    os.environ.pop('DATABASE_URL', None)
+    return create_app(configuracion_temporal(**extra))
+
+@contextmanager
+def cronometro(etiqueta, resultados=None):
+    """Imprime (y guarda en `resultados`) los segundos que tarda el bloque"""
+    inicio = time.perf_counter()
+    yield
+    segundos = time.perf_counter() - inicio
+    if resultados is not None:
+        resultados[etiqueta] = segundos
+    print(f'{etiqueta:<45} {segundos * 1000:>10.1f} ms')
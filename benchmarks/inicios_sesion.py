@@ -0,0 +1,65 @@
+"""Inicios de sesión por segundo y por núcleo según la política de hash de contraseñas
+
+    python benchmarks/inicios_sesion.py [--duracion 5] [--clientes 1,2,4,8]
+
+Para cada método (con su costo por defecto o --costo) verifica contraseñas desde
+`--clientes` hilos concurrentes a través del pool acotado de contrasenas.py,
+el mismo camino que sigue el login. Con los costos por defecto cada núcleo
+atiende del orden de unos pocos inicios por segundo: es el dato para dimensionar
+CONTRASENA_HILOS y los límites de limite_login.py.
+"""
+import argparse
+import os
+import threading
+import time
+
+from entorno import crear_app_temporal
+
+def medir(app, hash_guardado, clientes, duracion):
+    """Verificaciones correctas por segundo con `clientes` hilos pidiendo a la vez"""
+    from contrasenas import verificar_contrasena
+
+    conteos = [0] * clientes
+    fin = time.monotonic() + duracion
+
+    def cliente(indice):
+        with app.app_context():
+            while time.monotonic() < fin:
+                if verificar_contrasena(hash_guardado, 'clave-de-prueba'):
+                    conteos[indice] += 1
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    inicio = time.monotonic()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return sum(conteos) / (time.monotonic() - inicio)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--metodos', default='pbkdf2,scrypt')
+    parser.add_argument('--costo', type=int, default=None, help='Costo a usar en vez del de cada método')
+    parser.add_argument('--clientes', default=None, help='Hilos concurrentes separados por comas')
+    parser.add_argument('--duracion', type=float, default=5, help='Segundos por medición')
+    argumentos = parser.parse_args()
+
+    nucleos = os.cpu_count() or 1
+    clientes = sorted({int(n) for n in (argumentos.clientes or f'1,{nucleos},{nucleos * 2}').split(',')})
+    print(f'{nucleos} núcleos, CONTRASENA_HILOS={nucleos}')
+    print(f"{'método':<22} {'clientes':>8} {'inicios/s':>10} {'por núcleo':>11} {'ms c/u':>8}")
+    for metodo in argumentos.metodos.split(','):
+        app = crear_app_temporal(CONTRASENA_METODO=metodo, CONTRASENA_COSTO=argumentos.costo,
+                                 CONTRASENA_HILOS=nucleos)
+        with app.app_context():
+            from contrasenas import generar_hash, metodo_hash
+            hash_guardado = generar_hash('clave-de-prueba')
+            etiqueta = metodo_hash()
+        for cantidad in clientes:
+            por_segundo = medir(app, hash_guardado, cantidad, argumentos.duracion)
+            en_uso = min(cantidad, nucleos)
+            print(f'{etiqueta:<22} {cantidad:>8} {por_segundo:>10.1f} {por_segundo / en_uso:>11.1f} '
+                  f'{cantidad / por_segundo * 1000:>8.1f}')
+
+if __name__ == '__main__':
+    main()
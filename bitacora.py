@@ -0,0 +1,214 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+    WatchedFileHandler
+)
+from flask import g, has_request_context, request, session
+from flask.logging import default_handler
+
+# Valores por defecto; cada uno se puede sobrescribir con la variable de entorno
+# del mismo nombre o en app.config antes de llamar a configurar_logging
+CONFIGURACION_LOG = {
+    'LOG_DIR': 'logs',
+    'LOG_ARCHIVO': 'publimes.log',
+    'LOG_NIVEL': 'INFO',
+    'LOG_FORMATO': 'json',           # json | texto
+    # tamano | tiempo | externa. Con varios procesos escribiendo el mismo archivo
+    # (workers de gunicorn) solo es segura "externa": logrotate rota y cada
+    # proceso reabre el archivo al notar el cambio
+    'LOG_ROTACION': 'tamano',
+    'LOG_MAX_BYTES': 10 * 1024 * 1024,
+    'LOG_BACKUPS': 10,
+    'LOG_CUANDO': 'midnight',        # para rotación por tiempo
+    'LOG_ACCESO': True,              # una línea por petición
+    'LOG_CONSOLA': False,            # copia en stderr (también desde el hilo escritor)
+    'LOG_COLA_MAX': 10000,
+}
+
+# Atributos estándar de LogRecord; el resto (extra=...) se incluye en el JSON
+_ATRIBUTOS_REGISTRO = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+_CAMPOS_CONTEXTO = ('id_peticion', 'usuario', 'endpoint', 'metodo', 'ruta')
+
+_listener = None
+_handler = None
+
+def _valor_config(app, clave):
+    if clave in app.config:
+        return app.config[clave]
+    defecto = CONFIGURACION_LOG[clave]
+    valor = os.environ.get(clave)
+    if valor is None:
+        return defecto
+    if isinstance(defecto, bool):
+        return valor.lower() in ('1', 'true', 'si', 'sí', 'yes')
+    if isinstance(defecto, int):
+        return int(valor)
+    return valor
+
+class FiltroContexto(logging.Filter):
+    """Copia los datos de la petición al registro en el hilo que lo emite (antes de encolar)"""
+
+    def filter(self, registro):
+        if has_request_context():
+            registro.id_peticion = g.get('id_peticion')
+            registro.usuario = session.get('id_usuario')
+            registro.endpoint = request.endpoint
+            registro.metodo = request.method
+            registro.ruta = request.path
+        return True
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, registro):
+        datos = {
+            'fecha': datetime.fromtimestamp(registro.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': registro.levelname,
+            'logger': registro.name,
+            'mensaje': registro.getMessage(),
+        }
+        for campo, valor in vars(registro).items():
+            if campo not in _ATRIBUTOS_REGISTRO and valor is not None:
+                datos[campo] = valor
+        if registro.exc_info:
+            datos['excepcion'] = self.formatException(registro.exc_info)
+        elif registro.exc_text:
+            datos['excepcion'] = registro.exc_text
+        datos['origen'] = f'{registro.pathname}:{registro.lineno}'
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+class FormateadorTexto(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s [%(id_peticion)s %(endpoint)s]: %(message)s '
+                         '[in %(pathname)s:%(lineno)d]')
+
+    def format(self, registro):
+        for campo in _CAMPOS_CONTEXTO:
+            if not hasattr(registro, campo):
+                setattr(registro, campo, '-')
+        return super().format(registro)
+
+class ManejadorCola(QueueHandler):
+    """Encola el registro sin bloquear; si la cola está llena el registro se descarta"""
+
+    def prepare(self, registro):
+        # Mensaje y traza se resuelven aquí para no retener objetos de la petición en la cola
+        registro = copy.copy(registro)
+        registro.msg = registro.getMessage()
+        registro.args = None
+        if registro.exc_info:
+            registro.exc_text = logging.Formatter().formatException(registro.exc_info)
+            registro.exc_info = None
+        return registro
+
+    def enqueue(self, registro):
+        try:
+            self.queue.put_nowait(registro)
+        except queue.Full:
+            pass
+
+def abrir_archivo_log(app, ruta, max_bytes, backups):
+    """Manejador de archivo según LOG_ROTACION (compartido con el log de consultas lentas)"""
+    os.makedirs(os.path.dirname(ruta) or '.', exist_ok=True)
+    rotacion = _valor_config(app, 'LOG_ROTACION')
+    if rotacion == 'externa':
+        # Sin rotación propia: cada escritura va al final del archivo (O_APPEND) y el
+        # manejador lo reabre si logrotate lo movió, así varios procesos no se pisan
+        return WatchedFileHandler(ruta, encoding='utf-8')
+    if rotacion == 'tiempo':
+        return TimedRotatingFileHandler(ruta, when=_valor_config(app, 'LOG_CUANDO'),
+                                        backupCount=backups, encoding='utf-8')
+    return RotatingFileHandler(ruta, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+
+def _crear_manejador_archivo(app):
+    ruta = os.path.join(_valor_config(app, 'LOG_DIR'), _valor_config(app, 'LOG_ARCHIVO'))
+    manejador = abrir_archivo_log(app, ruta, _valor_config(app, 'LOG_MAX_BYTES'),
+                                  _valor_config(app, 'LOG_BACKUPS'))
+    if _valor_config(app, 'LOG_FORMATO') == 'texto':
+        manejador.setFormatter(FormateadorTexto())
+    else:
+        manejador.setFormatter(FormateadorJSON())
+    return manejador
+
+def crear_manejador_asincrono(manejadores, tamano_cola):
+    """Envuelve `manejadores` en una cola atendida por un hilo escritor; devuelve (handler, listener)"""
+    cola = queue.Queue(maxsize=tamano_cola)
+    handler = ManejadorCola(cola)
+    handler.addFilter(FiltroContexto())
+    listener = QueueListener(cola, *manejadores, respect_handler_level=True)
+    return handler, listener
+
+def configurar_logging(app):
+    """Logging de la app fuera del hilo de la petición, con contexto y línea de acceso"""
+    global _listener, _handler
+    # Una nueva app en el mismo proceso (p. ej. varias create_app en pruebas) reemplaza la anterior
+    if _handler is not None:
+        app.logger.removeHandler(_handler)
+        detener_logging()
+    nivel = getattr(logging, str(_valor_config(app, 'LOG_NIVEL')).upper(), logging.INFO)
+    manejadores = [_crear_manejador_archivo(app)]
+    if _valor_config(app, 'LOG_CONSOLA'):
+        consola = logging.StreamHandler()
+        consola.setFormatter(FormateadorTexto())
+        manejadores.append(consola)
+    _handler, _listener = crear_manejador_asincrono(manejadores, _valor_config(app, 'LOG_COLA_MAX'))
+    _handler.setLevel(nivel)
+    # El manejador de consola por defecto de Flask escribiría en el hilo de la petición
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(_handler)
+    app.logger.setLevel(nivel)
+    _listener.start()
+    atexit.unregister(detener_logging)
+    atexit.register(detener_logging)
+
+    @app.before_request
+    def _iniciar_peticion():
+        g.id_peticion = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+        g.inicio_peticion = time.perf_counter()
+
+    registrar_acceso = _valor_config(app, 'LOG_ACCESO')
+
+    @app.after_request
+    def _finalizar_peticion(respuesta):
+        if registrar_acceso:
+            inicio = g.get('inicio_peticion')
+            app.logger.info('peticion', extra={
+                'estado': respuesta.status_code,
+                'duracion_ms': round((time.perf_counter() - inicio) * 1000, 2) if inicio else None,
+                'bytes': respuesta.calculate_content_length(),
+            })
+        respuesta.headers['X-Request-ID'] = g.get('id_peticion', '')
+        return respuesta
+
+def reiniciar_manejador_asincrono(handler, listener):
+    """Cola nueva y otro hilo escritor para el proceso actual (p. ej. en un worker tras un fork)
+
+    El hilo del padre no existe en el hijo y la cola heredada pudo quedar con su
+    lock tomado en el momento del fork, así que no se reutiliza.
+    """
+    cola = queue.Queue(maxsize=listener.queue.maxsize)
+    handler.queue = cola
+    listener.queue = cola
+    listener._thread = None
+    listener.start()
+
+def reiniciar_logging():
+    """Arranca de nuevo el hilo escritor (p. ej. en cada proceso hijo tras un fork)"""
+    if _listener is not None:
+        reiniciar_manejador_asincrono(_handler, _listener)
+
+def detener_logging():
+    """Escribe lo pendiente y detiene el hilo escritor"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
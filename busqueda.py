@@ -0,0 +1,87 @@
+from sqlalchemy import Integer, or_, text
+from modelo import db, Celular, Chip
+
+# Índices de texto completo (SQLite FTS5, tokenizador trigram) sobre tablas externas.
+# Los triggers los mantienen sincronizados con cualquier INSERT/UPDATE/DELETE,
+# incluso los que no pasan por el ORM (importaciones masivas).
+INDICES_BUSQUEDA = {
+    'chip': {
+        'tabla_fts': 'chip_fts',
+        'clave': 'idChip',
+        'columnas': ['numero', 'iccid', 'operadora', 'tipo_linea'],
+        'modelo': Chip,
+    },
+    'celular': {
+        'tabla_fts': 'celular_fts',
+        'clave': 'idCelular',
+        'columnas': ['imei', 'marca', 'modelo'],
+        'modelo': Celular,
+    },
+}
+
+# El tokenizador trigram necesita al menos 3 caracteres para poder comparar
+LONGITUD_MINIMA_FTS = 3
+
+def _es_sqlite():
+    return db.engine.dialect.name == 'sqlite'
+
+def _ddl_indice(tabla, config):
+    fts = config['tabla_fts']
+    clave = config['clave']
+    columnas = ', '.join(config['columnas'])
+    nuevos = ', '.join(f'new.{c}' for c in config['columnas'])
+    viejos = ', '.join(f'old.{c}' for c in config['columnas'])
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{columnas}, content='{tabla}', content_rowid='{clave}', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.{clave}, {nuevos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.{clave}, {viejos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columnas} ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.{clave}, {viejos}); "
+        f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.{clave}, {nuevos}); END",
+    ]
+
+def crear_indices_busqueda():
+    """Crea las tablas FTS y sus triggers; las que se crean por primera vez se pueblan"""
+    if not _es_sqlite():
+        return
+    with db.engine.begin() as conexion:
+        for tabla, config in INDICES_BUSQUEDA.items():
+            existe = conexion.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nombre"),
+                {'nombre': config['tabla_fts']}
+            ).first()
+            for sentencia in _ddl_indice(tabla, config):
+                conexion.exec_driver_sql(sentencia)
+            if not existe:
+                fts = config['tabla_fts']
+                conexion.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+def reconstruir_indices_busqueda():
+    """Regenera por completo los índices FTS a partir de las tablas de origen"""
+    if not _es_sqlite():
+        return
+    crear_indices_busqueda()
+    with db.engine.begin() as conexion:
+        for config in INDICES_BUSQUEDA.values():
+            fts = config['tabla_fts']
+            conexion.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+def filtro_busqueda(tabla, termino):
+    """Condición de filtrado para `termino` sobre el modelo indexado de `tabla`"""
+    config = INDICES_BUSQUEDA[tabla]
+    modelo = config['modelo']
+    termino = termino.strip()
+
+    if _es_sqlite() and len(termino) >= LONGITUD_MINIMA_FTS:
+        fts = config['tabla_fts']
+        frase = '"' + termino.replace('"', '""') + '"'
+        coincidencias = text(
+            f"SELECT rowid FROM {fts} WHERE {fts} MATCH :frase"
+        ).bindparams(frase=frase).columns(rowid=Integer)
+        return getattr(modelo, config['clave']).in_(coincidencias)
+
+    # Términos cortos o motores sin FTS5: búsqueda por subcadena
+    return or_(*(getattr(modelo, c).contains(termino) for c in config['columnas']))
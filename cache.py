@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import OrderedDict
+
+_SIN_VALOR = object()
+
+class CacheTTL:
+    """Caché en memoria del proceso con expiración por tiempo y desalojo LRU"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, default=None):
+        with self._lock:
+            entrada = self._datos.get(clave, _SIN_VALOR)
+            if entrada is _SIN_VALOR:
+                return default
+            valor, expira = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return default
+            self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def obtener_o_calcular(self, clave, funcion):
+        """Devuelve el valor en caché o lo calcula con `funcion` y lo guarda"""
+        valor = self.obtener(clave, _SIN_VALOR)
+        if valor is _SIN_VALOR:
+            valor = funcion()
+            self.guardar(clave, valor)
+        return valor
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def invalidar_si(self, condicion):
+        """Descarta las entradas cuya clave cumple `condicion`"""
+        with self._lock:
+            for clave in [clave for clave in self._datos if condicion(clave)]:
+                del self._datos[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
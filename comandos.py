@@ -0,0 +1,70 @@
+import click
+from busqueda import reconstruir_indices_busqueda
+from contadores import reconstruir_contadores
+from logica.Logica_Historial.Estados_Historial import reconstruir_estado_actual
+from logica.Logica_Campanias.Asignacion_Envios import asignar_envio, ErrorAsignacion
+from logica.Logica_Campanias.Ingesta_Resultados import purgar_eventos
+from logica.Logica_Campanias.Resumen_Envios import reconstruir_resumen
+from modelo import init_db, VERSION_ESQUEMA
+from trabajos import gestor_trabajos
+
+def registrar_comandos(app):
+    """Registra los comandos de mantenimiento en la CLI de Flask"""
+
+    @app.cli.command('init-db')
+    def inicializar_base_datos():
+        """Crea tablas e índices y carga los datos semilla (idempotente)"""
+        init_db(app)
+        click.echo(f'Base de datos inicializada (versión de esquema {VERSION_ESQUEMA})')
+
+    @app.cli.command('reconstruir-busqueda')
+    def reconstruir_busqueda():
+        """Regenera los índices de búsqueda de chips y celulares"""
+        reconstruir_indices_busqueda()
+        click.echo('Índices de búsqueda reconstruidos')
+
+    @app.cli.command('reconstruir-contadores')
+    def reconstruir_contadores_resumen():
+        """Recalcula los contadores del dashboard desde las tablas"""
+        valores = reconstruir_contadores()
+        for clave, valor in sorted(valores.items()):
+            click.echo(f'{clave}: {valor}')
+
+    @app.cli.command('reconstruir-estados')
+    def reconstruir_estados():
+        """Regenera el estado vigente de cada chip desde su historial"""
+        inicializados = reconstruir_estado_actual()
+        click.echo(f'Estado vigente reconstruido ({inicializados} chips sin historial inicializados)')
+
+    @app.cli.command('reconstruir-resumen')
+    def reconstruir_resumen_envios():
+        """Regenera las series por hora, día y mes desde los resultados de envío"""
+        filas = reconstruir_resumen()
+        click.echo(f'Resumen de envíos reconstruido ({filas} filas)')
+
+    @app.cli.command('asignar-envio')
+    @click.argument('id_envio', type=int)
+    @click.option('--operadora', 'operadoras', multiple=True, help='Limitar a estas operadoras')
+    def asignar_envio_chips(id_envio, operadoras):
+        """Reparte la cantidad programada de un envío entre los chips disponibles"""
+        try:
+            resultado = asignar_envio(id_envio, operadoras=list(operadoras) or None)
+        except ErrorAsignacion as e:
+            raise click.ClickException(str(e))
+        click.echo(f'{resultado.asignado} mensajes asignados en {resultado.chips} chips')
+        if resultado.faltante:
+            click.echo(f'Capacidad insuficiente: faltan {resultado.faltante} mensajes', err=True)
+
+    @app.cli.command('purgar-trabajos')
+    @click.option('--dias', type=int, default=None, help='Antigüedad mínima (por defecto TRABAJOS_RETENCION_DIAS)')
+    def purgar_trabajos(dias):
+        """Elimina los trabajos terminados y sus archivos pasado el periodo de retención"""
+        eliminados = gestor_trabajos.purgar(dias)
+        click.echo(f'{eliminados} trabajos eliminados')
+
+    @app.cli.command('purgar-ingesta')
+    @click.option('--dias', type=int, default=None, help='Antigüedad mínima (por defecto INGESTA_RETENCION_DIAS)')
+    def purgar_ingesta(dias):
+        """Elimina las claves de idempotencia de ingesta pasado el periodo de retención"""
+        eliminados = purgar_eventos(dias)
+        click.echo(f'{eliminados} claves de ingesta eliminadas')
@@ -0,0 +1,153 @@
+import atexit
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import date, datetime
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from bitacora import (
+    FormateadorJSON,
+    abrir_archivo_log,
+    crear_manejador_asincrono,
+    reiniciar_manejador_asincrono
+)
+
+# Valores por defecto; se pueden sobrescribir en app.config o con variables de entorno
+UMBRAL_MS = 250
+ARCHIVO = os.path.join('logs', 'consultas_lentas.log')
+MAX_BYTES = 5 * 1024 * 1024
+BACKUPS = 5
+# Bytes leídos del final del log para la página de administración
+BYTES_LECTURA = 512 * 1024
+# Registros que la página de administración puede pedir como máximo
+MAX_LECTURA = 1000
+MAX_PARAMETROS = 20
+
+logger_consultas = logging.getLogger('publimes.consultas_lentas')
+logger_consultas.propagate = False
+_listener = None
+_handler = None
+_umbral = None
+_archivo = None
+
+def redactar(valor):
+    """Conserva números, fechas y nulos; de los textos solo su longitud"""
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, (str, bytes)):
+        return f'<texto:{len(valor)}>'
+    return f'<{type(valor).__name__}>'
+
+def redactar_parametros(parametros):
+    if isinstance(parametros, dict):
+        return {clave: redactar(valor) for clave, valor in list(parametros.items())[:MAX_PARAMETROS]}
+    if isinstance(parametros, (list, tuple)):
+        return [redactar(valor) for valor in parametros[:MAX_PARAMETROS]]
+    return redactar(parametros)
+
+def _plan(conexion, sentencia, parametros):
+    """Plan de ejecución obtenido con un cursor propio sobre la misma conexión DBAPI"""
+    if not sentencia.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    dialecto = conexion.dialect.name
+    if dialecto == 'sqlite':
+        prefijo = 'EXPLAIN QUERY PLAN '
+    elif dialecto == 'postgresql':
+        prefijo = 'EXPLAIN '
+    else:
+        return None
+    cursor = conexion.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefijo + sentencia, parametros)
+        filas = cursor.fetchall()
+    except Exception as e:
+        return [f'No se pudo obtener el plan: {e}']
+    finally:
+        cursor.close()
+    # SQLite: (id, padre, no_usado, detalle); Postgres: una columna de texto
+    return [fila[-1] for fila in filas]
+
+def _antes(conexion, cursor, sentencia, parametros, contexto, executemany):
+    conexion.info.setdefault('inicio_consulta_lenta', []).append(time.perf_counter())
+
+def _despues(conexion, cursor, sentencia, parametros, contexto, executemany):
+    pila = conexion.info.get('inicio_consulta_lenta')
+    if not pila:
+        return
+    duracion_ms = (time.perf_counter() - pila.pop()) * 1000
+    if duracion_ms < _umbral:
+        return
+    logger_consultas.warning('consulta lenta', extra={
+        'duracion_ms': round(duracion_ms, 2),
+        'sentencia': sentencia,
+        'parametros': None if executemany else redactar_parametros(parametros),
+        'filas_lote': len(parametros) if executemany else None,
+        'endpoint_consulta': request.endpoint if has_request_context() else None,
+        'plan': None if executemany else _plan(conexion, sentencia, parametros),
+    })
+
+def configurar_consultas_lentas(app):
+    """Registra en un log aparte las sentencias que superan CONSULTA_LENTA_MS, con su plan"""
+    global _listener, _handler, _umbral, _archivo
+    if _handler is not None:
+        logger_consultas.removeHandler(_handler)
+        detener_consultas_lentas()
+        _handler = None
+    app.config.setdefault('CONSULTA_LENTA_MS', float(os.environ.get('CONSULTA_LENTA_MS', UMBRAL_MS)))
+    app.config.setdefault('CONSULTAS_LENTAS_LOG', os.environ.get('CONSULTAS_LENTAS_LOG', ARCHIVO))
+    _umbral = app.config['CONSULTA_LENTA_MS']
+    _archivo = app.config['CONSULTAS_LENTAS_LOG']
+    if not _umbral or _umbral < 0:
+        return
+
+    # Misma política de rotación que el log principal (LOG_ROTACION)
+    manejador = abrir_archivo_log(
+        app, _archivo,
+        int(app.config.get('CONSULTAS_LENTAS_MAX_BYTES', MAX_BYTES)),
+        int(app.config.get('CONSULTAS_LENTAS_BACKUPS', BACKUPS))
+    )
+    manejador.setFormatter(FormateadorJSON())
+    _handler, _listener = crear_manejador_asincrono([manejador], 10000)
+    logger_consultas.addHandler(_handler)
+    logger_consultas.setLevel(logging.WARNING)
+    _listener.start()
+    atexit.unregister(detener_consultas_lentas)
+    atexit.register(detener_consultas_lentas)
+
+    if not event.contains(Engine, 'before_cursor_execute', _antes):
+        event.listen(Engine, 'before_cursor_execute', _antes)
+    if not event.contains(Engine, 'after_cursor_execute', _despues):
+        event.listen(Engine, 'after_cursor_execute', _despues)
+
+def reiniciar_consultas_lentas():
+    """Arranca de nuevo el hilo escritor en un proceso hijo tras un fork"""
+    if _listener is not None:
+        reiniciar_manejador_asincrono(_handler, _listener)
+
+def detener_consultas_lentas():
+    """Escribe lo pendiente y detiene el hilo escritor del log de consultas lentas"""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def leer_consultas_lentas(limite=200):
+    """Últimas consultas lentas registradas (más recientes primero), entre 1 y MAX_LECTURA"""
+    limite = max(1, min(limite, MAX_LECTURA))
+    if not _archivo or not os.path.exists(_archivo):
+        return []
+    with open(_archivo, 'rb') as archivo:
+        archivo.seek(0, os.SEEK_END)
+        archivo.seek(max(0, archivo.tell() - BYTES_LECTURA))
+        lineas = archivo.read().decode('utf-8', errors='replace').splitlines()
+    registros = deque(maxlen=limite)
+    for linea in lineas:
+        try:
+            registros.append(json.loads(linea))
+        except ValueError:
+            # Primera línea cortada por la lectura parcial
+            continue
+    return list(reversed(registros))
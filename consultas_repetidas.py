@@ -0,0 +1,135 @@
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Repeticiones de una misma forma de consulta permitidas por petición
+UMBRAL = 5
+MODOS = ('desactivado', 'advertir', 'fallar')
+
+_RAIZ_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+_ESTE_ARCHIVO = os.path.abspath(__file__)
+_local = threading.local()
+
+# Marcadores de parámetro de los drivers: ?, %s, %(nombre)s y :nombre
+_PARAMETRO = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_LISTA_IN = re.compile(rf'\bIN\s*\(\s*{_PARAMETRO}(?:\s*,\s*{_PARAMETRO})*\s*\)', re.IGNORECASE)
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_ESPACIOS = re.compile(r'\s+')
+
+class ConsultasRepetidas(AssertionError):
+    """La misma consulta se repitió más veces que el umbral (modo 'fallar')"""
+
+def normalizar_sql(sentencia):
+    """Forma de la consulta: sin literales y con las listas IN colapsadas"""
+    forma = _CADENAS.sub('?', sentencia)
+    forma = _NUMEROS.sub('?', forma)
+    forma = _LISTA_IN.sub('IN (?)', forma)
+    return _ESPACIOS.sub(' ', forma).strip()
+
+def _origen():
+    """Primera línea del proyecto (plantilla o módulo) en la pila de la consulta"""
+    marco = sys._getframe(2)
+    while marco is not None:
+        plantilla = marco.f_globals.get('__jinja_template__')
+        if plantilla is not None:
+            archivo = os.path.relpath(plantilla.filename, _RAIZ_PROYECTO) if plantilla.filename else plantilla.name
+            return f'{archivo}:{plantilla.get_corresponding_lineno(marco.f_lineno)}'
+        archivo = os.path.abspath(marco.f_code.co_filename)
+        if (archivo.startswith(_RAIZ_PROYECTO) and archivo != _ESTE_ARCHIVO
+                and 'site-packages' not in archivo):
+            return f'{os.path.relpath(archivo, _RAIZ_PROYECTO)}:{marco.f_lineno}'
+        marco = marco.f_back
+    return 'desconocido'
+
+class RastreadorConsultas:
+    """Cuenta las sentencias por forma normalizada"""
+
+    def __init__(self, umbral=UMBRAL):
+        self.umbral = umbral
+        # forma -> [conteo, origen de la primera repetición]
+        self.formas = {}
+
+    def registrar(self, sentencia):
+        forma = normalizar_sql(sentencia)
+        entrada = self.formas.get(forma)
+        if entrada is None:
+            self.formas[forma] = [1, None]
+            return
+        entrada[0] += 1
+        if entrada[1] is None:
+            entrada[1] = _origen()
+
+    def repetidas(self):
+        return [
+            (forma, conteo, origen)
+            for forma, (conteo, origen) in self.formas.items()
+            if conteo > self.umbral
+        ]
+
+    def describir(self):
+        return '; '.join(
+            f'{conteo}x desde {origen}: {forma[:200]}' for forma, conteo, origen in self.repetidas()
+        )
+
+def _al_ejecutar(conexion, cursor, sentencia, parametros, contexto, executemany):
+    rastreador = getattr(_local, 'rastreador', None)
+    if rastreador is not None:
+        rastreador.registrar(sentencia)
+
+@contextmanager
+def vigilar_consultas(umbral=UMBRAL):
+    """Falla si dentro del bloque una misma consulta se repite más de `umbral` veces"""
+    anterior = getattr(_local, 'rastreador', None)
+    rastreador = _local.rastreador = RastreadorConsultas(umbral)
+    try:
+        yield rastreador
+    finally:
+        _local.rastreador = anterior
+    if rastreador.repetidas():
+        raise ConsultasRepetidas(rastreador.describir())
+
+def _modo(app):
+    modo = app.config.get('N1_MODO') or os.environ.get('N1_MODO')
+    if modo in MODOS:
+        return modo
+    if app.testing:
+        return 'fallar'
+    return 'advertir' if app.debug else 'desactivado'
+
+def configurar_detector_n1(app):
+    """Detecta consultas N+1 por petición: advierte en desarrollo y falla en pruebas
+
+    N1_MODO ('desactivado', 'advertir', 'fallar') y N1_UMBRAL se leen de app.config
+    o del entorno; por defecto falla con TESTING, advierte con debug y no hace nada
+    en producción.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _al_ejecutar):
+        event.listen(Engine, 'before_cursor_execute', _al_ejecutar)
+
+    @app.before_request
+    def _iniciar_rastreo():
+        if _modo(app) != 'desactivado':
+            umbral = int(app.config.get('N1_UMBRAL') or os.environ.get('N1_UMBRAL') or UMBRAL)
+            _local.rastreador = RastreadorConsultas(umbral)
+
+    @app.after_request
+    def _revisar_rastreo(respuesta):
+        rastreador = getattr(_local, 'rastreador', None)
+        _local.rastreador = None
+        if rastreador is None or not rastreador.repetidas():
+            return respuesta
+        mensaje = f'Posible N+1 en {request.endpoint}: {rastreador.describir()}'
+        if _modo(app) == 'fallar':
+            raise ConsultasRepetidas(mensaje)
+        app.logger.warning(mensaje)
+        return respuesta
+
+    @app.teardown_request
+    def _limpiar_rastreo(error=None):
+        _local.rastreador = None
@@ -0,0 +1,138 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from modelo import (
+    db,
+    Campania,
+    Celular,
+    Chip,
+    ChipEstadoRelacion,
+    ContadorResumen
+)
+
+# Contadores del dashboard mantenidos en la misma transacción que los cambios,
+# para que mostrarlos sea una lectura directa en lugar de varios COUNT(*).
+
+def clave_estado(id_estado):
+    return f'estado:{id_estado}'
+
+def _aportes_campania(leer):
+    aportes = {'campanias': 1}
+    if (leer('estado') or 'PENDIENTE') == 'PENDIENTE':
+        aportes['campanias_pendientes'] = 1
+    return aportes
+
+def _aportes_estado(leer):
+    # Solo los intervalos abiertos: chips que están actualmente en cada estado
+    if leer('fecha_fin') is not None:
+        return {}
+    return {clave_estado(leer('idEstado')): 1}
+
+# Modelo -> (atributos que afectan los contadores, aportes de una fila)
+APORTES = {
+    Campania: (('estado',), _aportes_campania),
+    Celular: ((), lambda leer: {'celulares': 1}),
+    Chip: ((), lambda leer: {'chips': 1}),
+    ChipEstadoRelacion: (('idEstado', 'fecha_fin'), _aportes_estado),
+}
+
+def _sumar(deltas, aportes, signo):
+    for clave, valor in aportes.items():
+        deltas[clave] = deltas.get(clave, 0) + signo * valor
+
+def _sentencia_incremento(dialecto):
+    """INSERT ... ON CONFLICT que suma al contador existente, o None si el motor no lo soporta"""
+    if dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    elif dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        return None
+    tabla = ContadorResumen.__table__
+    sentencia = insert_dialecto(tabla)
+    return sentencia.on_conflict_do_update(
+        index_elements=[tabla.c.clave],
+        set_={'valor': tabla.c.valor + sentencia.excluded.valor}
+    )
+
+def ajustar_contadores(deltas, conexion=None):
+    """Aplica incrementos {clave: delta} dentro de la transacción en curso
+
+    Con un solo INSERT ... ON CONFLICT: dos workers que crean la misma clave a la
+    vez suman ambos, en lugar de fallar uno con IntegrityError.
+    """
+    filas = [{'clave': clave, 'valor': delta} for clave, delta in deltas.items() if delta]
+    if not filas:
+        return
+    conexion = conexion or db.session.connection()
+    sentencia = _sentencia_incremento(conexion.dialect.name)
+    if sentencia is not None:
+        conexion.execute(sentencia, filas)
+        return
+
+    tabla = ContadorResumen.__table__
+    for fila in filas:
+        resultado = conexion.execute(
+            tabla.update().where(tabla.c.clave == fila['clave']).values(valor=tabla.c.valor + fila['valor'])
+        )
+        if resultado.rowcount == 0:
+            conexion.execute(tabla.insert().values(**fila))
+
+def registrar_insercion_masiva(modelo, cantidad):
+    """Ajuste de contadores para inserciones hechas fuera del ORM (executemany)"""
+    _, aportes = APORTES[modelo]
+    deltas = {}
+    _sumar(deltas, aportes(lambda atributo: None), cantidad)
+    ajustar_contadores(deltas)
+
+@event.listens_for(Session, 'after_flush')
+def _actualizar_contadores(session, contexto_flush):
+    deltas = {}
+    for obj in session.new:
+        if type(obj) in APORTES:
+            _sumar(deltas, APORTES[type(obj)][1](lambda a: getattr(obj, a)), 1)
+
+    for obj in session.deleted:
+        if type(obj) in APORTES:
+            _sumar(deltas, APORTES[type(obj)][1](lambda a: getattr(obj, a)), -1)
+
+    for obj in session.dirty:
+        if type(obj) not in APORTES:
+            continue
+        atributos, aportes = APORTES[type(obj)]
+        estado = inspect(obj)
+        historiales = {a: estado.attrs[a].history for a in atributos}
+        if not any(h.has_changes() for h in historiales.values()):
+            continue
+
+        def anterior(a):
+            h = historiales[a]
+            return h.deleted[0] if h.deleted else getattr(obj, a)
+
+        _sumar(deltas, aportes(anterior), -1)
+        _sumar(deltas, aportes(lambda a: getattr(obj, a)), 1)
+
+    if deltas:
+        ajustar_contadores(deltas, session.connection())
+
+def leer_contadores():
+    """Todos los contadores en una sola lectura: {clave: valor}"""
+    return dict(db.session.query(ContadorResumen.clave, ContadorResumen.valor).all())
+
+def reconstruir_contadores():
+    """Recalcula todos los contadores desde las tablas (reconciliación)"""
+    valores = {
+        'campanias': Campania.query.count(),
+        'campanias_pendientes': Campania.query.filter_by(estado='PENDIENTE').count(),
+        'celulares': Celular.query.count(),
+        'chips': Chip.query.count(),
+    }
+    por_estado = db.session.query(
+        ChipEstadoRelacion.idEstado, db.func.count(ChipEstadoRelacion.id)
+    ).filter(ChipEstadoRelacion.fecha_fin.is_(None)).group_by(ChipEstadoRelacion.idEstado).all()
+    for id_estado, total in por_estado:
+        valores[clave_estado(id_estado)] = total
+
+    ContadorResumen.query.delete()
+    db.session.add_all(ContadorResumen(clave=c, valor=v) for c, v in valores.items())
+    db.session.commit()
+    return valores
@@ -0,0 +1,79 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# Valores por defecto; se pueden sobrescribir en app.config o con variables de entorno
+METODO = 'pbkdf2'                  # pbkdf2 | scrypt
+COSTO_POR_METODO = {
+    'pbkdf2': 600000,              # iteraciones de PBKDF2-SHA256
+    'scrypt': 32768,               # parámetro N de scrypt (r=8, p=1)
+}
+# Segundos que una verificación espera turno antes de rechazarse
+ESPERA_MAXIMA = 5
+
+class VerificacionSaturada(Exception):
+    """Hay demasiadas verificaciones en curso o en espera"""
+
+_lock = threading.Lock()
+_ejecutor = None
+_cupos = None
+_pid = None
+
+def configurar_contrasenas(app):
+    """Política de hash de contraseñas y tamaño del pool de verificación"""
+    app.config.setdefault('CONTRASENA_METODO', os.environ.get('CONTRASENA_METODO', METODO))
+    costo = os.environ.get('CONTRASENA_COSTO')
+    app.config.setdefault('CONTRASENA_COSTO', int(costo) if costo else None)
+    # hashlib libera el GIL al derivar la clave: un hilo por núcleo aprovecha la CPU
+    app.config.setdefault('CONTRASENA_HILOS', int(os.environ.get('CONTRASENA_HILOS', os.cpu_count() or 1)))
+    app.config.setdefault('CONTRASENA_MAX_PENDIENTES', int(os.environ.get(
+        'CONTRASENA_MAX_PENDIENTES', app.config['CONTRASENA_HILOS'] * 4)))
+    app.config.setdefault('CONTRASENA_ESPERA', float(os.environ.get('CONTRASENA_ESPERA', ESPERA_MAXIMA)))
+    if app.config['CONTRASENA_METODO'] not in COSTO_POR_METODO:
+        raise ValueError(f"CONTRASENA_METODO no soportado: {app.config['CONTRASENA_METODO']}")
+
+def metodo_hash():
+    """Método en el formato de werkzeug, tal como queda al inicio del hash"""
+    metodo = current_app.config.get('CONTRASENA_METODO', METODO)
+    costo = current_app.config.get('CONTRASENA_COSTO') or COSTO_POR_METODO[metodo]
+    if metodo == 'scrypt':
+        return f'scrypt:{costo}:8:1'
+    return f'pbkdf2:sha256:{costo}'
+
+def generar_hash(contrasena):
+    return generate_password_hash(contrasena, method=metodo_hash())
+
+def necesita_rehash(hash_guardado):
+    """True si el hash se generó con otro algoritmo o costo que el de la política actual"""
+    return hash_guardado.split('$', 1)[0] != metodo_hash()
+
+def _obtener_pool(app):
+    global _ejecutor, _cupos, _pid
+    # Un pool por proceso: tras un fork el del padre no tiene hilos vivos
+    with _lock:
+        if _ejecutor is None or _pid != os.getpid():
+            hilos = app.config.get('CONTRASENA_HILOS') or 1
+            _ejecutor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='contrasena')
+            _cupos = threading.BoundedSemaphore(app.config.get('CONTRASENA_MAX_PENDIENTES') or hilos * 4)
+            _pid = os.getpid()
+        return _ejecutor, _cupos
+
+def _en_pool(funcion, *args):
+    app = current_app._get_current_object()
+    ejecutor, cupos = _obtener_pool(app)
+    if not cupos.acquire(timeout=app.config.get('CONTRASENA_ESPERA', ESPERA_MAXIMA)):
+        raise VerificacionSaturada('Demasiadas verificaciones de contraseña en curso')
+    try:
+        return ejecutor.submit(funcion, *args).result()
+    finally:
+        cupos.release()
+
+def verificar_contrasena(hash_guardado, contrasena):
+    """Verifica en el pool acotado; lanza VerificacionSaturada si no consigue turno"""
+    return _en_pool(check_password_hash, hash_guardado, contrasena)
+
+def generar_hash_en_pool(contrasena):
+    """Como generar_hash, pero con el mismo límite de concurrencia que la verificación"""
+    return _en_pool(generate_password_hash, contrasena, metodo_hash())
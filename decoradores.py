@@ -1,6 +1,95 @@
+from collections import namedtuple
 from functools import wraps
-from flask import flash, redirect, url_for, session, abort
-from modelo import Usuario
+from flask import flash, redirect, url_for, session, abort, g
+from sqlalchemy.orm import selectinload
+from cache import CacheTTL
+from modelo import db, Rol, Usuario, UsuarioRol, VersionCache
+
+# Roles efectivos por usuario: {idUsuario: frozenset(nombreRol)}
+cache_roles = CacheTTL(maxsize=2048, ttl=300)
+
+# Cada cuántos segundos un proceso compara su caché de roles con la versión en la base:
+# es el tiempo máximo que otro worker tarda en ver un rol revocado o un usuario eliminado
+VERIFICACION_ROLES_SEGUNDOS = 2
+cache_version_roles = CacheTTL(maxsize=1, ttl=VERIFICACION_ROLES_SEGUNDOS)
+_version_roles_local = None
+
+# Catálogo de roles para listados y formularios: tuplas livianas, no instancias de la sesión
+RolCatalogo = namedtuple('RolCatalogo', ('idRol', 'nombreRol', 'descripcion'))
+cache_catalogo_roles = CacheTTL(maxsize=1, ttl=600)
+
+def _version_roles():
+    return db.session.query(VersionCache.version).filter_by(clave='roles').scalar() or 0
+
+def _verificar_version_roles():
+    """Descarta los roles cacheados en este proceso si otro proceso los modificó"""
+    global _version_roles_local
+    version = cache_version_roles.obtener_o_calcular('roles', _version_roles)
+    if version != _version_roles_local:
+        cache_roles.limpiar()
+        cache_catalogo_roles.limpiar()
+        _version_roles_local = version
+
+def _publicar_cambio_roles():
+    """Incrementa la versión de roles en la base para que todos los workers recarguen"""
+    tabla = VersionCache.__table__
+    actualizadas = db.session.execute(
+        tabla.update().where(tabla.c.clave == 'roles').values(version=tabla.c.version + 1)
+    ).rowcount
+    if not actualizadas:
+        db.session.add(VersionCache(clave='roles', version=1))
+    db.session.commit()
+    cache_version_roles.limpiar()
+
+def obtener_roles_usuario(id_usuario):
+    """Devuelve los nombres de rol del usuario, cargados una sola vez y cacheados"""
+    if id_usuario is None:
+        return frozenset()
+    _verificar_version_roles()
+
+    def cargar():
+        filas = db.session.query(Rol.nombreRol).join(
+            UsuarioRol, UsuarioRol.idRol == Rol.idRol
+        ).filter(UsuarioRol.idUsuario == id_usuario).all()
+        return frozenset(nombre for (nombre,) in filas)
+
+    return cache_roles.obtener_o_calcular(id_usuario, cargar)
+
+def invalidar_roles_usuario(id_usuario):
+    """Descarta los roles cacheados de un usuario tras cambiar sus asignaciones (o eliminarlo)"""
+    cache_roles.invalidar(id_usuario)
+    _publicar_cambio_roles()
+
+def obtener_catalogo_roles():
+    """Todos los roles ordenados por id, leídos una sola vez y cacheados"""
+    _verificar_version_roles()
+
+    def cargar():
+        filas = db.session.query(Rol.idRol, Rol.nombreRol, Rol.descripcion).order_by(Rol.idRol).all()
+        return tuple(RolCatalogo(*fila) for fila in filas)
+
+    return cache_catalogo_roles.obtener_o_calcular('roles', cargar)
+
+def invalidar_catalogo_roles():
+    """Descarta el catálogo de roles (p. ej. al crear un rol)"""
+    cache_catalogo_roles.limpiar()
+    _publicar_cambio_roles()
+
+def invalidar_roles():
+    """Descarta todos los roles cacheados (p. ej. al renombrar o eliminar un rol)"""
+    cache_roles.limpiar()
+    cache_catalogo_roles.limpiar()
+    _publicar_cambio_roles()
+
+def obtener_usuario_actual():
+    """Carga una sola vez por petición el usuario en sesión, con sus roles"""
+    if 'usuario_actual' not in g:
+        id_usuario = session.get('id_usuario')
+        g.usuario_actual = None if id_usuario is None else db.session.get(
+            Usuario, id_usuario,
+            options=[selectinload(Usuario.roles).joinedload(UsuarioRol.rol)]
+        )
+    return g.usuario_actual
 
 def requiere_login(f):
     """Decorador para verificar sesión activa"""
@@ -22,11 +111,8 @@ def requiere_rol(*roles_permitidos):
                 flash('Autenticación requerida', 'warning')
                 return redirect(url_for('login.iniciar_sesion'))
             
-            # Obtiene el usuario actual
-            usuario_actual = Usuario.query.get(session['id_usuario'])
-            
             # Verifica si tiene alguno de los roles requeridos
-            roles_usuario = {ur.rol.nombreRol for ur in usuario_actual.roles}
+            roles_usuario = obtener_roles_usuario(session['id_usuario'])
             if not roles_usuario.intersection(roles_permitidos):
                 flash('No tiene permisos suficientes para esta acción', 'danger')
                 return redirect(url_for('login.panel_control'))
@@ -51,11 +137,6 @@ def requiere_permiso(permiso_necesario):
 # Función de apoyo (puede moverse a un servicio aparte)
 def verificar_permiso(id_usuario, permiso):
     """Lógica para verificar permisos específicos"""
-    # Implementación básica - consulta a la base de datos
-    usuario = Usuario.query.get(id_usuario)
-    if not usuario:
-        return False
-        
     # Aquí iría la lógica real de verificación de permisos
     # Por ahora solo verifica si es admin
-    return any(rol.nombreRol == 'Administrador General' for rol in usuario.roles)
\ No newline at end of file
+    return 'Administrador General' in obtener_roles_usuario(id_usuario)
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""Configuración de gunicorn; cada valor se puede sobrescribir con su variable de entorno"""
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5005')
+# Procesos y hilos por proceso (con más de un hilo gunicorn usa el worker gthread)
+workers = int(os.environ.get('WEB_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+# Tiempo que tiene un worker para terminar sus peticiones, el buffer de ingesta y los trabajos en curso
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+# Reciclar workers cada tantas peticiones (0 = nunca), con variación para no reiniciarlos a la vez
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# La app (configuración, esquema, plantillas de rutas) se carga una vez en el maestro
+# y los workers la heredan al hacer fork
+preload_app = True
+
+# Varios workers escriben los mismos archivos de log: que ninguno los rote por su cuenta.
+# La rotación queda a cargo de logrotate (sin copytruncate), p. ej. en /etc/logrotate.d/publimes:
+#   /srv/publimes/logs/*.log { daily rotate 14 compress delaycompress missingok }
+if workers > 1:
+    os.environ.setdefault('LOG_ROTACION', 'externa')
+
+accesslog = os.environ.get('GUNICORN_ACCESSLOG')  # la app ya registra una línea por petición
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOGLEVEL', 'info')
+
+def post_fork(server, worker):
+    """Deja al worker sin recursos compartidos con el maestro"""
+    from wsgi import app
+    from extensions import db
+    from bitacora import reiniciar_logging
+    from consultas_lentas import reiniciar_consultas_lentas
+
+    # Las conexiones del pool abiertas por el maestro no se usan ni se cierran aquí:
+    # el worker abre las suyas
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    reiniciar_logging()
+    reiniciar_consultas_lentas()
+
+def worker_exit(server, worker):
+    """Apagado ordenado: vacía el buffer de resultados y deja terminar los trabajos en curso"""
+    from logica.Logica_Campanias.Ingesta_Resultados import buffer_resultados
+    from trabajos import gestor_trabajos
+    from bitacora import detener_logging
+    from consultas_lentas import detener_consultas_lentas
+
+    buffer_resultados.detener()
+    gestor_trabajos.detener(esperar=True)
+    detener_logging()
+    detener_consultas_lentas()
@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+# Valores por defecto; se pueden sobrescribir en app.config o con variables de entorno
+INTENTOS_USUARIO = 5          # ráfaga permitida por nombre de usuario
+RECARGA_SEGUNDOS = 60         # segundos para recuperar un intento de un usuario
+# Una oficina detrás de un mismo NAT comparte la IP: la cubeta de IP admite la
+# llegada de toda la oficina y recupera más rápido; la de usuario frena la fuerza bruta
+INTENTOS_IP = 100             # ráfaga permitida por IP de origen
+RECARGA_IP_SEGUNDOS = 6       # segundos para recuperar un intento de una IP
+MAXIMO_CLAVES = 100000
+# Cada cuántas operaciones se eliminan las cubetas ya llenas (expiradas)
+INTERVALO_PURGA = 1000
+
+class AlmacenMemoria:
+    """Cubetas del proceso actual: {clave: (fichas, ultima_actualizacion, expira)}"""
+
+    def __init__(self, maximo=MAXIMO_CLAVES):
+        self.maximo = maximo
+        self._cubetas = OrderedDict()
+        self._lock = threading.Lock()
+        self._operaciones = 0
+
+    def consumir(self, clave, capacidad, recarga, ahora):
+        with self._lock:
+            self._operaciones += 1
+            if self._operaciones % INTERVALO_PURGA == 0 or len(self._cubetas) > self.maximo:
+                self._purgar(ahora)
+            fichas, ultima, _ = self._cubetas.get(clave, (capacidad, ahora, ahora))
+            resultado = _consumir_fichas(fichas, ultima, capacidad, recarga, ahora)
+            self._cubetas[clave] = resultado[2]
+            self._cubetas.move_to_end(clave)
+            return resultado[:2]
+
+    def reiniciar(self, clave):
+        with self._lock:
+            self._cubetas.pop(clave, None)
+
+    def _purgar(self, ahora):
+        for clave in [clave for clave, (_, _, expira) in self._cubetas.items() if expira <= ahora]:
+            del self._cubetas[clave]
+        while len(self._cubetas) > self.maximo:
+            self._cubetas.popitem(last=False)
+
+class AlmacenSQLite:
+    """Cubetas compartidas por los workers del mismo equipo en un archivo SQLite propio"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._operaciones = 0
+        with self._conexion() as conexion:
+            conexion.execute(
+                'CREATE TABLE IF NOT EXISTS cubeta_login ('
+                'clave TEXT PRIMARY KEY, fichas REAL NOT NULL, ultima REAL NOT NULL, expira REAL NOT NULL)'
+            )
+
+    def _conexion(self):
+        # Una conexión por hilo y proceso
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid():
+            conexion = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    def consumir(self, clave, capacidad, recarga, ahora):
+        conexion = self._conexion()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            self._operaciones += 1
+            if self._operaciones % INTERVALO_PURGA == 0:
+                conexion.execute('DELETE FROM cubeta_login WHERE expira <= ?', (ahora,))
+            fila = conexion.execute(
+                'SELECT fichas, ultima FROM cubeta_login WHERE clave = ?', (clave,)
+            ).fetchone()
+            fichas, ultima = fila if fila else (capacidad, ahora)
+            permitido, espera, cubeta = _consumir_fichas(fichas, ultima, capacidad, recarga, ahora)
+            conexion.execute(
+                'INSERT OR REPLACE INTO cubeta_login (clave, fichas, ultima, expira) VALUES (?, ?, ?, ?)',
+                (clave, *cubeta)
+            )
+            conexion.execute('COMMIT')
+        except Exception:
+            conexion.execute('ROLLBACK')
+            raise
+        return permitido, espera
+
+    def reiniciar(self, clave):
+        self._conexion().execute('DELETE FROM cubeta_login WHERE clave = ?', (clave,))
+
+def _consumir_fichas(fichas, ultima, capacidad, recarga, ahora):
+    """Cubeta de fichas: devuelve (permitido, segundos de espera, nuevo estado de la cubeta)"""
+    fichas = min(capacidad, fichas + (ahora - ultima) / recarga)
+    if fichas >= 1:
+        fichas -= 1
+        permitido, espera = True, 0.0
+    else:
+        permitido, espera = False, (1 - fichas) * recarga
+    # A partir de `expira` la cubeta vuelve a estar llena y puede olvidarse
+    return permitido, espera, (fichas, ahora, ahora + (capacidad - fichas) * recarga)
+
+class LimitadorLogin:
+    """Limita los intentos de inicio de sesión por usuario y por IP antes de consultar la base"""
+
+    def __init__(self):
+        self.almacen = None
+
+    def init_app(self, app):
+        app.config.setdefault('LOGIN_LIMITE_HABILITADO', os.environ.get(
+            'LOGIN_LIMITE_HABILITADO', '1').lower() in ('1', 'true', 'si', 'sí'))
+        app.config.setdefault('LOGIN_INTENTOS_USUARIO', int(os.environ.get('LOGIN_INTENTOS_USUARIO', INTENTOS_USUARIO)))
+        app.config.setdefault('LOGIN_INTENTOS_IP', int(os.environ.get('LOGIN_INTENTOS_IP', INTENTOS_IP)))
+        app.config.setdefault('LOGIN_RECARGA_SEGUNDOS', float(os.environ.get('LOGIN_RECARGA_SEGUNDOS', RECARGA_SEGUNDOS)))
+        app.config.setdefault('LOGIN_RECARGA_IP_SEGUNDOS', float(os.environ.get(
+            'LOGIN_RECARGA_IP_SEGUNDOS', RECARGA_IP_SEGUNDOS)))
+        # memoria (por proceso) | sqlite (compartido entre los workers del equipo)
+        app.config.setdefault('LOGIN_ALMACEN', os.environ.get('LOGIN_ALMACEN', 'memoria'))
+        app.config.setdefault('LOGIN_ALMACEN_RUTA', os.environ.get(
+            'LOGIN_ALMACEN_RUTA', os.path.join(app.instance_path, 'limite_login.db')))
+        if app.config['LOGIN_ALMACEN'] == 'sqlite':
+            os.makedirs(os.path.dirname(app.config['LOGIN_ALMACEN_RUTA']), exist_ok=True)
+            self.almacen = AlmacenSQLite(app.config['LOGIN_ALMACEN_RUTA'])
+        else:
+            self.almacen = AlmacenMemoria()
+
+    def permitir(self, usuario, ip):
+        """Consume un intento de la IP y del usuario; devuelve 0 o los segundos a esperar"""
+        config = current_app.config
+        if not config['LOGIN_LIMITE_HABILITADO']:
+            return 0
+        ahora = time.time()
+        for clave, capacidad, recarga in (
+            (f'ip:{ip}', config['LOGIN_INTENTOS_IP'], config['LOGIN_RECARGA_IP_SEGUNDOS']),
+            (f'usuario:{(usuario or "").lower()}', config['LOGIN_INTENTOS_USUARIO'], config['LOGIN_RECARGA_SEGUNDOS']),
+        ):
+            permitido, espera = self.almacen.consumir(clave, capacidad, recarga, ahora)
+            if not permitido:
+                return espera
+        return 0
+
+    def exito(self, usuario):
+        """Un inicio correcto devuelve al usuario todos sus intentos (los de la IP no)"""
+        if current_app.config['LOGIN_LIMITE_HABILITADO']:
+            self.almacen.reiniciar(f'usuario:{(usuario or "").lower()}')
+
+limitador_login = LimitadorLogin()
@@ -1,13 +1,23 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, current_app
 from datetime import datetime
-from werkzeug.security import generate_password_hash
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from contrasenas import generar_hash
+from restricciones import columnas_unicas_violadas
 from modelo import (
     Rol,
     Usuario,
     UsuarioRol,
     db
 )
-from decoradores import requiere_login, requiere_rol
+from decoradores import (
+    requiere_login,
+    requiere_rol,
+    invalidar_roles_usuario,
+    invalidar_roles,
+    invalidar_catalogo_roles,
+    obtener_catalogo_roles
+)
 
 class GestorAdministracion:
     def __init__(self):
@@ -27,13 +37,19 @@ class GestorAdministracion:
         self.bp.route('/roles/<int:id>/editar', methods=['GET', 'POST'], endpoint='editar_rol')(self.editar_rol)
         self.bp.route('/roles/<int:id>/eliminar', methods=['POST'], endpoint='eliminar_rol')(self.eliminar_rol)
 
+        # Diagnóstico
+        self.bp.route('/consultas-lentas', endpoint='consultas_lentas')(self.consultas_lentas)
+
     # ============ MÉTODOS PARA USUARIOS ============
     @requiere_login
     @requiere_rol('Administrador General')
     def gestion_usuarios(self):
         """Lista todos los usuarios con paginación"""
         pagina = request.args.get('pagina', 1, type=int)
-        usuarios = Usuario.query.order_by(
+        # Roles de toda la página en una sola consulta adicional
+        usuarios = Usuario.query.options(
+            selectinload(Usuario.roles).joinedload(UsuarioRol.rol)
+        ).order_by(
             Usuario.fecha_creacion.desc()
         ).paginate(page=pagina, per_page=10)
         return render_template('admin/usuarios.html', usuarios=usuarios)
@@ -46,13 +62,7 @@ class GestorAdministracion:
             form_data = self._validar_formulario_usuario()
             if form_data:
                 try:
-                    # Verificar si el nombre de usuario ya existe
-                    if Usuario.query.filter_by(username=form_data['usuario']['username']).first():
-                        flash('El nombre de usuario ya está en uso', 'danger')
-                        return render_template('admin/AgregarAdmin/AgregarUsuario.html', 
-                                             roles=Rol.query.all(), 
-                                             error_username="El nombre de usuario ya está en uso")
-                    
+                    # La restricción UNIQUE de username detecta los duplicados (también entre operadores simultáneos)
                     nuevo_usuario = Usuario(**form_data['usuario'])
                     db.session.add(nuevo_usuario)
                     db.session.flush()  # Para obtener el ID
@@ -68,19 +78,24 @@ class GestorAdministracion:
                     db.session.commit()
                     flash('Usuario registrado exitosamente', 'success')
                     return redirect(url_for('admin.gestion_usuarios'))
+                except IntegrityError as e:
+                    db.session.rollback()
+                    if 'username' in columnas_unicas_violadas(e):
+                        flash('El nombre de usuario ya está en uso', 'danger')
+                        return render_template('admin/AgregarAdmin/AgregarUsuario.html', 
+                                             roles=obtener_catalogo_roles(), 
+                                             error_username="El nombre de usuario ya está en uso")
+                    flash(f'Error al registrar: {str(e)}', 'danger')
                 except Exception as e:
                     db.session.rollback()
                     flash(f'Error al registrar: {str(e)}', 'danger')
             
-        roles = Rol.query.all()
+        roles = obtener_catalogo_roles()
         return render_template('admin/AgregarAdmin/AgregarUsuario.html', roles=roles)
 
     def _validar_formulario_usuario(self):
         """Valida y procesa datos del formulario de usuario"""
         username = request.form.get('username')
-        if Usuario.query.filter_by(username=username).first():
-            return None
-            
         password = request.form.get('password')
         if not password or len(password) < 6:
             flash('La contraseña debe tener al menos 6 caracteres', 'danger')
@@ -90,7 +105,7 @@ class GestorAdministracion:
             'usuario': {
                 'nombre': request.form.get('nombre'),
                 'username': username,
-                'password': generate_password_hash(password),
+                'password': generar_hash(password),
                 'activo': True,
                 'fecha_creacion': datetime.now()
             },
@@ -109,7 +124,7 @@ class GestorAdministracion:
                 usuario.nombre = request.form.get('nombre')
                 nuevo_password = request.form.get('password')
                 if nuevo_password and len(nuevo_password) >= 6:
-                    usuario.password = generate_password_hash(nuevo_password)
+                    usuario.password = generar_hash(nuevo_password)
                 elif nuevo_password:
                     flash('La contraseña debe tener al menos 6 caracteres', 'danger')
                     return redirect(url_for('admin.editar_usuario', id=id))
@@ -133,13 +148,14 @@ class GestorAdministracion:
                         db.session.add(usuario_rol)
                 
                 db.session.commit()
+                invalidar_roles_usuario(usuario.idUsuario)
                 flash('Usuario actualizado exitosamente', 'success')
                 return redirect(url_for('admin.gestion_usuarios'))
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al actualizar: {str(e)}', 'danger')
         
-        roles = Rol.query.all()
+        roles = obtener_catalogo_roles()
         return render_template('admin/EditarAdmin/EditarUsuario.html', 
                             usuario=usuario, 
                             roles=roles)
@@ -159,6 +175,7 @@ class GestorAdministracion:
                 # Luego eliminar el usuario
                 db.session.delete(usuario)
                 db.session.commit()
+                invalidar_roles_usuario(id)
                 flash('Usuario eliminado exitosamente', 'success')
             except Exception as e:
                 db.session.rollback()
@@ -171,8 +188,7 @@ class GestorAdministracion:
     @requiere_rol('Administrador General')
     def gestion_roles(self):
         """Lista todos los roles"""
-        roles = Rol.query.order_by(Rol.idRol).all()
-        return render_template('admin/roles.html', roles=roles)
+        return render_template('admin/roles.html', roles=obtener_catalogo_roles())
 
     @requiere_login
     @requiere_rol('Administrador General')
@@ -191,6 +207,7 @@ class GestorAdministracion:
                     )
                     db.session.add(nuevo_rol)
                     db.session.commit()
+                    invalidar_catalogo_roles()
                     flash('Rol creado exitosamente', 'success')
                     return redirect(url_for('admin.gestion_roles'))
                 except Exception as e:
@@ -210,6 +227,7 @@ class GestorAdministracion:
                 rol.nombreRol = request.form.get('nombre')
                 rol.descripcion = request.form.get('descripcion')
                 db.session.commit()
+                invalidar_roles()
                 flash('Rol actualizado exitosamente', 'success')
                 return redirect(url_for('admin.gestion_roles'))
             except Exception as e:
@@ -232,6 +250,7 @@ class GestorAdministracion:
             try:
                 db.session.delete(rol)
                 db.session.commit()
+                invalidar_roles()
                 flash('Rol eliminado exitosamente', 'success')
             except Exception as e:
                 db.session.rollback()
@@ -239,6 +258,17 @@ class GestorAdministracion:
         
         return redirect(url_for('admin.gestion_roles'))
 
+    # ============ DIAGNÓSTICO ============
+    @requiere_login
+    @requiere_rol('Administrador General')
+    def consultas_lentas(self):
+        """Últimas sentencias que superaron el umbral de CONSULTA_LENTA_MS"""
+        from consultas_lentas import MAX_LECTURA, leer_consultas_lentas
+        limite = max(1, min(request.args.get('limite', 100, type=int), MAX_LECTURA))
+        consultas = leer_consultas_lentas(limite)
+        return render_template('admin/consultas_lentas.html', consultas=consultas,
+                               umbral=current_app.config.get('CONSULTA_LENTA_MS'))
+
 # Instanciar y registrar el Blueprint
 gestor_admin = GestorAdministracion()
 bp_admin = gestor_admin.bp
\ No newline at end of file
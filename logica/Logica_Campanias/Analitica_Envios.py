@@ -0,0 +1,265 @@
+from datetime import timedelta
+from sqlalchemy import and_, func, or_, select
+from cache import CacheTTL
+from modelo import (
+    db,
+    Campania,
+    Chip,
+    Cliente,
+    DetalleEnvioChip,
+    EnvioCampania,
+    ResultadoEnvio,
+    ResumenEnvio,
+    Usuario
+)
+from logica.Logica_Campanias.Resumen_Envios import fecha_detalle, truncar
+
+# Agregados calculados sobre el detalle, por (tipo, desde, hasta, ...); la ingesta
+# descarta solo los que cubren las fechas que modificó
+cache_analitica = CacheTTL(maxsize=512, ttl=300)
+
+# Filas devueltas por defecto (las de mayor volumen)
+LIMITE_FILAS = 200
+
+class FilaRendimiento:
+    def __init__(self, clave, etiqueta, enviados, fallidos):
+        self.clave = clave
+        self.etiqueta = etiqueta
+        self.enviados = enviados or 0
+        self.fallidos = fallidos or 0
+
+    @property
+    def total(self):
+        return self.enviados + self.fallidos
+
+    @property
+    def tasa_exito(self):
+        return self.enviados / self.total if self.total else None
+
+    @property
+    def tasa_fallo(self):
+        return self.fallidos / self.total if self.total else None
+
+def _en_rango(consulta, columna, desde, hasta):
+    """Filtra el intervalo semiabierto [desde, hasta)"""
+    if desde is not None:
+        consulta = consulta.where(columna >= desde)
+    if hasta is not None:
+        consulta = consulta.where(columna < hasta)
+    return consulta
+
+def _detalle_por(columna, desde, hasta):
+    # Los contadores por chip son acumulados: el rango se aplica a fecha_detalle(), como en el resumen
+    consulta = select(
+        columna.label('clave'),
+        func.sum(DetalleEnvioChip.cantidad_enviada).label('enviados'),
+        func.sum(DetalleEnvioChip.cantidad_fallida).label('fallidos')
+    ).select_from(DetalleEnvioChip).join(
+        EnvioCampania, EnvioCampania.idEnvio == DetalleEnvioChip.idEnvio
+    )
+    return _en_rango(consulta, fecha_detalle(), desde, hasta)
+
+def _resultados_por(columna, desde, hasta):
+    # Se agrega primero por envío (recorriendo solo el índice por fecha) y luego se
+    # unen los pocos envíos resultantes, en vez de unir cada fila de resultado
+    por_envio = _en_rango(select(
+        ResultadoEnvio.idEnvio,
+        func.sum(ResultadoEnvio.enviados).label('enviados'),
+        func.sum(ResultadoEnvio.fallidos).label('fallidos')
+    ), ResultadoEnvio.fecha_registro, desde, hasta).group_by(ResultadoEnvio.idEnvio).subquery()
+    return select(
+        columna.label('clave'),
+        func.sum(por_envio.c.enviados).label('enviados'),
+        func.sum(por_envio.c.fallidos).label('fallidos')
+    ).select_from(por_envio).join(
+        EnvioCampania, EnvioCampania.idEnvio == por_envio.c.idEnvio
+    )
+
+def _con_etiqueta(agregado, columna_clave, columna_etiqueta):
+    """Agrupa primero por id y luego une el catálogo solo para las filas resultantes"""
+    sub = agregado.group_by(agregado.selected_columns.clave).subquery()
+    return select(
+        sub.c.clave, columna_etiqueta, sub.c.enviados, sub.c.fallidos
+    ).select_from(sub).outerjoin(
+        columna_clave.class_, columna_clave == sub.c.clave
+    )
+
+def _por_chip(desde, hasta):
+    return _con_etiqueta(_detalle_por(DetalleEnvioChip.idChip, desde, hasta), Chip.idChip, Chip.numero)
+
+def _por_operadora(desde, hasta):
+    agregado = _detalle_por(Chip.operadora, desde, hasta).join(
+        Chip, Chip.idChip == DetalleEnvioChip.idChip
+    ).group_by(Chip.operadora).subquery()
+    return select(agregado.c.clave, agregado.c.clave.label('etiqueta'), agregado.c.enviados, agregado.c.fallidos)
+
+def _por_campania(desde, hasta):
+    return _con_etiqueta(
+        _resultados_por(EnvioCampania.idCampania, desde, hasta), Campania.idCampania, Campania.nombre
+    )
+
+def _por_cliente(desde, hasta):
+    agregado = _resultados_por(Campania.idCliente, desde, hasta).join(
+        Campania, Campania.idCampania == EnvioCampania.idCampania
+    )
+    return _con_etiqueta(agregado, Cliente.idCliente, Cliente.nombreCliente)
+
+def _por_operador(desde, hasta):
+    return _con_etiqueta(
+        _resultados_por(EnvioCampania.idUsuario, desde, hasta), Usuario.idUsuario, Usuario.nombre
+    )
+
+DIMENSIONES = {
+    'chip': ('Chip', _por_chip),
+    'operadora': ('Operadora', _por_operadora),
+    'campania': ('Campaña', _por_campania),
+    'cliente': ('Cliente', _por_cliente),
+    'operador': ('Operador', _por_operador),
+}
+
+# ==================================================
+# LECTURA DESDE EL RESUMEN PRE-AGREGADO
+# ==================================================
+def _alineado(fecha):
+    return fecha is None or fecha == truncar(fecha, 'dia')
+
+def _siguiente_mes(fecha):
+    return (fecha.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _tramos(desde, hasta):
+    """Divide [desde, hasta) en meses completos y días sueltos (None = sin límite)"""
+    if desde is None or desde == truncar(desde, 'mes'):
+        inicio_meses = desde
+    else:
+        inicio_meses = _siguiente_mes(truncar(desde, 'mes'))
+    fin_meses = None if hasta is None else truncar(hasta, 'mes')
+    if inicio_meses is not None and fin_meses is not None and inicio_meses >= fin_meses:
+        return [('dia', desde, hasta)]
+    tramos = [('mes', inicio_meses, fin_meses)]
+    if desde is not None and desde < inicio_meses:
+        tramos.append(('dia', desde, inicio_meses))
+    if hasta is not None and fin_meses < hasta:
+        tramos.append(('dia', fin_meses, hasta))
+    return tramos
+
+def _en_tramos(consulta, dimension, desde, hasta):
+    condiciones = []
+    for grano, inicio, fin in _tramos(desde, hasta):
+        condicion = [ResumenEnvio.grano == grano]
+        if inicio is not None:
+            condicion.append(ResumenEnvio.periodo >= inicio)
+        if fin is not None:
+            condicion.append(ResumenEnvio.periodo < fin)
+        condiciones.append(and_(*condicion))
+    return consulta.where(ResumenEnvio.dimension == dimension, or_(*condiciones))
+
+def _sumar_resumen(dimension, desde, hasta):
+    consulta = _en_tramos(select(
+        func.coalesce(func.sum(ResumenEnvio.enviados), 0),
+        func.coalesce(func.sum(ResumenEnvio.fallidos), 0)
+    ), dimension, desde, hasta)
+    return db.session.execute(consulta).one()
+
+def _resumen_por(dimension, desde, hasta):
+    return _en_tramos(select(
+        ResumenEnvio.clave.label('clave'),
+        func.sum(ResumenEnvio.enviados).label('enviados'),
+        func.sum(ResumenEnvio.fallidos).label('fallidos')
+    ), dimension, desde, hasta).group_by(ResumenEnvio.clave).subquery()
+
+def _resumen_con_etiqueta(agregado, columna_clave, columna_etiqueta):
+    # Las claves del resumen son texto: se convierten para usar la clave primaria del catálogo
+    clave = db.cast(agregado.c.clave, db.Integer)
+    return select(
+        clave.label('clave'), columna_etiqueta, agregado.c.enviados, agregado.c.fallidos
+    ).select_from(agregado).outerjoin(columna_clave.class_, columna_clave == clave)
+
+def _resumen_por_chip(desde, hasta):
+    return _resumen_con_etiqueta(_resumen_por('chip', desde, hasta), Chip.idChip, Chip.numero)
+
+def _resumen_por_operadora(desde, hasta):
+    agregado = _resumen_por('operadora', desde, hasta)
+    return select(agregado.c.clave, agregado.c.clave.label('etiqueta'), agregado.c.enviados, agregado.c.fallidos)
+
+def _resumen_por_campania(desde, hasta):
+    return _resumen_con_etiqueta(_resumen_por('campania', desde, hasta), Campania.idCampania, Campania.nombre)
+
+def _resumen_por_cliente(desde, hasta):
+    agregado = _resumen_por('campania', desde, hasta)
+    por_cliente = select(
+        Campania.idCliente.label('clave'),
+        func.sum(agregado.c.enviados).label('enviados'),
+        func.sum(agregado.c.fallidos).label('fallidos')
+    ).select_from(agregado).join(
+        Campania, Campania.idCampania == db.cast(agregado.c.clave, db.Integer)
+    ).group_by(Campania.idCliente).subquery()
+    return select(
+        por_cliente.c.clave, Cliente.nombreCliente, por_cliente.c.enviados, por_cliente.c.fallidos
+    ).select_from(por_cliente).outerjoin(Cliente, Cliente.idCliente == por_cliente.c.clave)
+
+def _sin_campania(desde, hasta):
+    """Fila de los envíos sin campaña: el resumen por campaña no los incluye"""
+    total = _sumar_resumen('total', desde, hasta)
+    campanias = _sumar_resumen('campania', desde, hasta)
+    enviados, fallidos = total[0] - campanias[0], total[1] - campanias[1]
+    return FilaRendimiento(None, None, enviados, fallidos) if enviados or fallidos else None
+
+# Dimensiones que el resumen cubre; las demás (operador) se calculan sobre el detalle
+DIMENSIONES_RESUMIDAS = {
+    'chip': _resumen_por_chip,
+    'operadora': _resumen_por_operadora,
+    'campania': _resumen_por_campania,
+    'cliente': _resumen_por_cliente,
+}
+
+def _desde_resumen(desde, hasta):
+    """El resumen tiene periodos de días completos: solo sirve para rangos alineados a días"""
+    return _alineado(desde) and _alineado(hasta)
+
+def _ordenar(consulta, limite):
+    consulta = consulta.subquery()
+    volumen = func.coalesce(consulta.c.enviados, 0) + func.coalesce(consulta.c.fallidos, 0)
+    filas = db.session.execute(select(consulta).order_by(volumen.desc()).limit(limite)).tuples()
+    return [FilaRendimiento(*fila) for fila in filas]
+
+def rendimiento(dimension, desde=None, hasta=None, limite=LIMITE_FILAS):
+    """Enviados, fallidos y tasas por `dimension` en [desde, hasta), de mayor a menor volumen
+
+    Con rangos de días completos (o abiertos) las dimensiones resumidas se leen del
+    resumen pre-agregado, siempre al día; el resto se calcula sobre el detalle y se cachea.
+    """
+    if dimension in DIMENSIONES_RESUMIDAS and _desde_resumen(desde, hasta):
+        filas = _ordenar(DIMENSIONES_RESUMIDAS[dimension](desde, hasta), limite)
+        if dimension == 'campania':
+            sin_campania = _sin_campania(desde, hasta)
+            if sin_campania is not None:
+                filas = sorted(filas + [sin_campania], key=lambda fila: fila.total, reverse=True)[:limite]
+        return filas
+
+    _, consulta_dimension = DIMENSIONES[dimension]
+    return cache_analitica.obtener_o_calcular(
+        ('rendimiento', desde, hasta, dimension, limite),
+        lambda: _ordenar(consulta_dimension(desde, hasta), limite)
+    )
+
+def totales(desde=None, hasta=None):
+    """Totales de resultados reportados en [desde, hasta)"""
+    if _desde_resumen(desde, hasta):
+        return FilaRendimiento(None, 'Total', *_sumar_resumen('total', desde, hasta))
+
+    def calcular():
+        consulta = _en_rango(select(
+            func.sum(ResultadoEnvio.enviados), func.sum(ResultadoEnvio.fallidos)
+        ), ResultadoEnvio.fecha_registro, desde, hasta)
+        enviados, fallidos = db.session.execute(consulta).one()
+        return FilaRendimiento(None, 'Total', enviados, fallidos)
+
+    return cache_analitica.obtener_o_calcular(('totales', desde, hasta), calcular)
+
+def invalidar_analitica(desde=None):
+    """Descarta los agregados cacheados cuyo rango llega a `desde` (todos si es None)"""
+    if desde is None:
+        cache_analitica.limpiar()
+        return
+    # Claves (tipo, desde, hasta, ...): un rango que termina antes de `desde` no cambió
+    cache_analitica.invalidar_si(lambda clave: clave[2] is None or clave[2] > desde)
@@ -0,0 +1,155 @@
+import heapq
+import math
+from datetime import datetime, timedelta
+from sqlalchemy import exists, insert, select
+from modelo import (
+    db,
+    CelularChip,
+    Chip,
+    DetalleEnvioChip,
+    EnvioCampania
+)
+
+# Estados de chip que pueden enviar mensajes
+ESTADOS_HABILITADOS = ('ACTIVO', 'WHATSAPP ACTIVO')
+# Mensajes que un chip puede enviar en la ventana de carga
+CAPACIDAD_CHIP = 1000
+VENTANA_CARGA = timedelta(hours=24)
+# Historial usado para estimar la tasa de fallos de cada chip
+VENTANA_FALLOS = timedelta(days=7)
+# Chips con una tasa de fallos mayor no reciben envíos
+TASA_FALLOS_MAXIMA = 0.5
+# Cada chip recibe su cuota en varios bloques para repartir la carga de forma pareja
+BLOQUES_POR_CHIP = 4
+
+class ErrorAsignacion(Exception):
+    """El envío no se puede asignar"""
+
+class ResultadoAsignacion:
+    def __init__(self, programado):
+        self.programado = programado
+        self.asignado = 0
+        self.chips = 0
+
+    @property
+    def faltante(self):
+        return self.programado - self.asignado
+
+def _chips_elegibles(solo_whatsapp, operadoras, ahora):
+    """Filas (idChip, carga_reciente, enviados, fallidos) de los chips que pueden enviar"""
+    carga = select(
+        DetalleEnvioChip.idChip,
+        db.func.sum(DetalleEnvioChip.cantidad_asignada).label('carga')
+    ).where(
+        DetalleEnvioChip.fecha_inicio >= ahora - VENTANA_CARGA
+    ).group_by(DetalleEnvioChip.idChip).subquery()
+
+    historial = select(
+        DetalleEnvioChip.idChip,
+        db.func.sum(DetalleEnvioChip.cantidad_enviada).label('enviados'),
+        db.func.sum(DetalleEnvioChip.cantidad_fallida).label('fallidos')
+    ).where(
+        DetalleEnvioChip.fecha_inicio >= ahora - VENTANA_FALLOS
+    ).group_by(DetalleEnvioChip.idChip).subquery()
+
+    con_celular = exists().where(
+        CelularChip.idChip == Chip.idChip,
+        CelularChip.fecha_remocion.is_(None)
+    )
+
+    consulta = select(
+        Chip.idChip,
+        db.func.coalesce(carga.c.carga, 0),
+        db.func.coalesce(historial.c.enviados, 0),
+        db.func.coalesce(historial.c.fallidos, 0)
+    ).outerjoin(carga, carga.c.idChip == Chip.idChip).outerjoin(
+        historial, historial.c.idChip == Chip.idChip
+    ).where(
+        Chip.estado_actual.in_(ESTADOS_HABILITADOS),
+        con_celular
+    )
+    if solo_whatsapp:
+        consulta = consulta.where(Chip.tiene_whatsapp.is_(True))
+    if operadoras:
+        consulta = consulta.where(Chip.operadora.in_(operadoras))
+    return db.session.execute(consulta)
+
+def repartir(cantidad, chips, capacidad=CAPACIDAD_CHIP):
+    """Reparte `cantidad` entre chips [(idChip, carga, enviados, fallidos)].
+
+    Usa un heap por carga normalizada (carga / confiabilidad): siempre recibe el
+    siguiente bloque el chip menos cargado en proporción a su tasa de éxito.
+    Devuelve {idChip: cantidad_asignada}.
+    """
+    heap = []
+    for id_chip, carga, enviados, fallidos in chips:
+        intentos = enviados + fallidos
+        tasa_fallos = fallidos / intentos if intentos else 0.0
+        disponible = capacidad - carga
+        if tasa_fallos > TASA_FALLOS_MAXIMA or disponible <= 0:
+            continue
+        confiabilidad = 1.0 - tasa_fallos
+        heap.append((carga / confiabilidad, id_chip, carga, disponible, confiabilidad))
+
+    if not heap:
+        return {}
+    heapq.heapify(heap)
+
+    bloque = max(1, math.ceil(cantidad / (len(heap) * BLOQUES_POR_CHIP)))
+    asignaciones = {}
+    restante = cantidad
+    while restante > 0 and heap:
+        _, id_chip, carga, disponible, confiabilidad = heapq.heappop(heap)
+        parte = min(bloque, disponible, restante)
+        asignaciones[id_chip] = asignaciones.get(id_chip, 0) + parte
+        restante -= parte
+        if disponible > parte:
+            carga += parte
+            heapq.heappush(heap, (carga / confiabilidad, id_chip, carga, disponible - parte, confiabilidad))
+    return asignaciones
+
+def asignar_envio(id_envio, operadoras=None, capacidad=CAPACIDAD_CHIP):
+    """Crea los DetalleEnvioChip que reparten la cantidad programada del envío"""
+    envio = EnvioCampania.query.get(id_envio)
+    if envio is None:
+        raise ErrorAsignacion(f'No existe el envío {id_envio}')
+    if not envio.cantidad_programada:
+        raise ErrorAsignacion('El envío no tiene cantidad programada')
+    if DetalleEnvioChip.query.filter_by(idEnvio=id_envio).first():
+        raise ErrorAsignacion('El envío ya tiene chips asignados')
+
+    campania = envio.campania
+    solo_whatsapp = bool(campania and campania.tipo_envio and 'WHATSAPP' in campania.tipo_envio.upper())
+    ahora = datetime.utcnow()
+
+    asignaciones = repartir(
+        envio.cantidad_programada,
+        _chips_elegibles(solo_whatsapp, operadoras, ahora),
+        capacidad
+    )
+
+    resultado = ResultadoAsignacion(envio.cantidad_programada)
+    if not asignaciones:
+        return resultado
+
+    try:
+        db.session.execute(insert(DetalleEnvioChip.__table__), [
+            {
+                'idEnvio': id_envio,
+                'idChip': id_chip,
+                'cantidad_asignada': cantidad,
+                'cantidad_enviada': 0,
+                'cantidad_fallida': 0,
+                'fecha_inicio': ahora,
+                'estado': 'PENDIENTE'
+            }
+            for id_chip, cantidad in asignaciones.items()
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    resultado.asignado = sum(asignaciones.values())
+    resultado.chips = len(asignaciones)
+    return resultado
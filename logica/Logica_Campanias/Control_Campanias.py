@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, render_template, request, flash, jsonify
+from decoradores import requiere_login, requiere_rol
+from logica.Logica_Campanias.Analitica_Envios import DIMENSIONES, rendimiento, totales
+from logica.Logica_Campanias.Resumen_Envios import DIMENSIONES_RESUMEN, serie_envios
+
+# Rango de la serie cuando no se indica uno
+DIAS_SERIE = 30
+
+def _leer_fecha(nombre):
+    valor = request.args.get(nombre, '')
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d')
+    except ValueError:
+        flash(f'Fecha inválida en "{nombre}", use el formato AAAA-MM-DD', 'warning')
+        return None
+
+class ControlAnalitica:
+    def __init__(self, bp):
+        self.bp = bp
+        self._registrar_rutas()
+
+    def _registrar_rutas(self):
+        self.bp.route('/analitica', endpoint='analitica')(self.analitica)
+        self.bp.route('/analitica/serie', endpoint='analitica_serie')(self.serie)
+
+    @requiere_login
+    @requiere_rol('Administrador General', 'Supervisor Operaciones')
+    def analitica(self):
+        dimension = request.args.get('dimension', 'campania')
+        if dimension not in DIMENSIONES:
+            dimension = 'campania'
+        desde = _leer_fecha('desde')
+        hasta = _leer_fecha('hasta')
+        # "hasta" es inclusivo en el formulario
+        hasta_exclusivo = hasta + timedelta(days=1) if hasta else None
+
+        return render_template('campanias/Analitica.html',
+                            dimensiones=DIMENSIONES,
+                            dimension=dimension,
+                            filas=rendimiento(dimension, desde, hasta_exclusivo),
+                            total=totales(desde, hasta_exclusivo),
+                            desde=desde.strftime('%Y-%m-%d') if desde else '',
+                            hasta=hasta.strftime('%Y-%m-%d') if hasta else '')
+
+    @requiere_login
+    @requiere_rol('Administrador General', 'Supervisor Operaciones')
+    def serie(self):
+        """Serie de enviados/fallidos desde las tablas de resumen (JSON para los gráficos)"""
+        dimension = request.args.get('dimension', 'total')
+        if dimension not in DIMENSIONES_RESUMEN:
+            return jsonify({'error': f'Dimensión no válida: {dimension}'}), 400
+        clave = request.args.get('clave', '') if dimension != 'total' else ''
+        hasta = (_leer_fecha('hasta') or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)) \
+            + timedelta(days=1)
+        desde = _leer_fecha('desde') or hasta - timedelta(days=DIAS_SERIE)
+        if desde >= hasta:
+            return jsonify({'error': 'El rango de fechas está vacío'}), 400
+
+        grano, filas = serie_envios(desde, hasta, dimension, clave)
+        return jsonify({
+            'grano': grano,
+            'puntos': [
+                {'periodo': periodo.isoformat(), 'enviados': enviados, 'fallidos': fallidos}
+                for periodo, enviados, fallidos in filas
+            ],
+        })
+
+# ==================================================
+# CONTROLADOR PRINCIPAL DE CAMPAÑAS
+# ==================================================
+class ControlCampanias:
+    def __init__(self):
+        self.bp = Blueprint('campanias', __name__, url_prefix='/campanias')
+        self.control_analitica = ControlAnalitica(self.bp)
+
+# ==================================================
+# INSTANCIA PRINCIPAL
+# ==================================================
+gestor_campanias = ControlCampanias()
+bp_campanias = gestor_campanias.bp
@@ -0,0 +1,420 @@
+import atexit
+import hmac
+import json
+import os
+import queue
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.exc import DataError, DBAPIError, IntegrityError, StatementError
+from modelo import (
+    db,
+    Chip,
+    DetalleEnvioChip,
+    EnvioCampania,
+    EventoIngesta,
+    EventoRechazado,
+    ResultadoEnvio,
+    Usuario
+)
+from restricciones import insert_omitiendo_duplicados
+from logica.Logica_Campanias.Analitica_Envios import invalidar_analitica
+from logica.Logica_Campanias.Resumen_Envios import acumular_resumen
+
+# Valores por defecto; se pueden sobrescribir en app.config
+TAMANO_LOTE = 500            # INGESTA_TAMANO_LOTE: eventos por transacción
+INTERVALO_FLUSH = 1.0        # INGESTA_INTERVALO: segundos máximos antes de escribir
+MAX_PENDIENTES = 20000       # INGESTA_MAX_PENDIENTES: tamaño del buffer (backpressure)
+TAMANO_BLOQUE = 500          # parámetros por sentencia IN
+REINTENTOS = 3               # intentos de un lote ante errores no atribuibles a un evento
+RETENCION_DIAS = 30          # INGESTA_RETENCION_DIAS: antigüedad de las claves de idempotencia
+INTERVALO_PURGA = 3600       # segundos entre purgas de claves vencidas
+# Mayor entero que cabe en un INTEGER de SQLite o un BIGINT de Postgres
+MAX_ENTERO = 2 ** 63 - 1
+
+# Columna de cada evento y tabla a la que debe existir su referencia
+REFERENCIAS = (
+    ('idEnvio', EnvioCampania.idEnvio),
+    ('idChip', Chip.idChip),
+    ('idUsuario', Usuario.idUsuario),
+)
+
+class EventoInvalido(ValueError):
+    pass
+
+# Eventos aplicados y fecha más antigua de los agregados que cambiaron (None si ninguno)
+LoteAplicado = namedtuple('LoteAplicado', ('aplicados', 'desde'))
+LOTE_VACIO = LoteAplicado(0, None)
+
+def _sumar_lotes(*lotes):
+    fechas = [lote.desde for lote in lotes if lote.desde is not None]
+    return LoteAplicado(sum(lote.aplicados for lote in lotes), min(fechas) if fechas else None)
+
+def validar_evento(datos):
+    """Normaliza un reporte recibido; lanza EventoInvalido si está incompleto"""
+    if not isinstance(datos, dict):
+        raise EventoInvalido('Cada evento debe ser un objeto JSON')
+    clave = datos.get('clave')
+    if not isinstance(clave, str) or not 0 < len(clave) <= 64:
+        raise EventoInvalido('El evento requiere una "clave" de idempotencia (máx. 64 caracteres)')
+    try:
+        evento = {
+            'clave': clave,
+            'idEnvio': int(datos['idEnvio']),
+            'idChip': int(datos['idChip']),
+            'idUsuario': int(datos['idUsuario']) if datos.get('idUsuario') is not None else None,
+            'enviados': int(datos.get('enviados', 0)),
+            'fallidos': int(datos.get('fallidos', 0)),
+        }
+    except (KeyError, TypeError, ValueError):
+        raise EventoInvalido(f'Evento {clave}: idEnvio, idChip, enviados y fallidos deben ser enteros')
+    for campo in ('idEnvio', 'idChip', 'idUsuario'):
+        if evento[campo] is not None and not 1 <= evento[campo] <= MAX_ENTERO:
+            raise EventoInvalido(f'Evento {clave}: {campo} fuera de rango')
+    if evento['enviados'] < 0 or evento['fallidos'] < 0:
+        raise EventoInvalido(f'Evento {clave}: las cantidades no pueden ser negativas')
+    if evento['enviados'] > MAX_ENTERO or evento['fallidos'] > MAX_ENTERO:
+        raise EventoInvalido(f'Evento {clave}: cantidades fuera de rango')
+    return evento
+
+def _error_de_evento(error):
+    """True si el error lo provoca el contenido de algún evento y no la base de datos
+
+    Restricciones y tipos rechazados por el motor, o valores que el driver no
+    pudo convertir (p. ej. OverflowError); un StatementError que no viene del
+    driver también es de conversión de parámetros.
+    """
+    if isinstance(error, (IntegrityError, DataError, OverflowError, ValueError)):
+        return True
+    return isinstance(error, StatementError) and not isinstance(error, DBAPIError)
+
+def _bloques(valores, tamano=TAMANO_BLOQUE):
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+def _referencias_invalidas(eventos):
+    """{clave: motivo} de los eventos que apuntan a un envío, chip o usuario inexistente"""
+    motivos = {}
+    for campo, columna in REFERENCIAS:
+        valores = list({evento[campo] for evento in eventos if evento[campo] is not None})
+        existentes = set()
+        for bloque in _bloques(valores):
+            existentes.update(db.session.execute(select(columna).where(columna.in_(bloque))).scalars())
+        for evento in eventos:
+            if evento[campo] is not None and evento[campo] not in existentes:
+                motivos.setdefault(evento['clave'], f'{campo} {evento[campo]} no existe')
+    return motivos
+
+def registrar_rechazos(rechazos):
+    """Guarda en evento_rechazado los pares (evento, motivo) para revisarlos o reenviarlos"""
+    ahora = datetime.utcnow()
+    db.session.execute(insert(EventoRechazado.__table__), [
+        {'clave': evento.get('clave'), 'datos': json.dumps(evento),
+         'motivo': motivo[:500], 'fecha_registro': ahora}
+        for evento, motivo in rechazos
+    ])
+
+def _reclamar_claves(claves, ahora):
+    """Registra las claves de idempotencia y devuelve las que este lote insertó
+
+    Con ON CONFLICT DO NOTHING otro worker que aplique la misma clave a la vez
+    la encuentra registrada y la omite, en lugar de hacer fallar todo el lote.
+    """
+    filas = [{'clave': clave, 'fecha_registro': ahora} for clave in claves]
+    sentencia = insert_omitiendo_duplicados(EventoIngesta.__table__)
+    if sentencia is None:
+        for bloque in _bloques(claves):
+            ya_aplicadas = set(db.session.execute(
+                select(EventoIngesta.clave).where(EventoIngesta.clave.in_(bloque))
+            ).scalars())
+            filas = [fila for fila in filas if fila['clave'] not in ya_aplicadas]
+        if filas:
+            db.session.execute(insert(EventoIngesta.__table__), filas)
+        return {fila['clave'] for fila in filas}
+    return set(db.session.execute(sentencia.returning(EventoIngesta.clave), filas).scalars())
+
+def escribir_lote(eventos):
+    """Aplica un lote de eventos en una transacción, agregando por (idEnvio, idChip)
+
+    Los eventos con referencias inexistentes pasan a evento_rechazado en la misma
+    transacción; los duplicados (del lote o ya aplicados) se omiten. Devuelve un
+    LoteAplicado.
+    """
+    unicos = {}
+    for evento in eventos:
+        unicos.setdefault(evento['clave'], evento)
+    motivos = _referencias_invalidas(list(unicos.values()))
+    if motivos:
+        registrar_rechazos([(unicos.pop(clave), motivo) for clave, motivo in motivos.items()])
+    if not unicos:
+        return LOTE_VACIO
+
+    ahora = datetime.utcnow()
+    reclamadas = _reclamar_claves(list(unicos), ahora)
+    unicos = {clave: evento for clave, evento in unicos.items() if clave in reclamadas}
+    if not unicos:
+        return LOTE_VACIO
+
+    por_chip = {}
+    por_usuario = {}
+    for evento in unicos.values():
+        clave_chip = (evento['idEnvio'], evento['idChip'])
+        enviados, fallidos = por_chip.get(clave_chip, (0, 0))
+        por_chip[clave_chip] = (enviados + evento['enviados'], fallidos + evento['fallidos'])
+
+        clave_usuario = (evento['idEnvio'], evento['idUsuario'])
+        enviados, fallidos = por_usuario.get(clave_usuario, (0, 0))
+        por_usuario[clave_usuario] = (enviados + evento['enviados'], fallidos + evento['fallidos'])
+
+    pares = list(por_chip)
+    existentes = set()
+    for bloque in _bloques(pares):
+        existentes.update(db.session.execute(
+            select(DetalleEnvioChip.idEnvio, DetalleEnvioChip.idChip).where(
+                tuple_(DetalleEnvioChip.idEnvio, DetalleEnvioChip.idChip).in_(bloque)
+            )
+        ).tuples())
+
+    detalle = DetalleEnvioChip.__table__
+    actualizaciones = [
+        {'p_envio': envio, 'p_chip': chip, 'p_enviados': enviados, 'p_fallidos': fallidos}
+        for (envio, chip), (enviados, fallidos) in por_chip.items()
+        if (envio, chip) in existentes
+    ]
+    if actualizaciones:
+        db.session.execute(
+            update(detalle).where(
+                detalle.c.idEnvio == db.bindparam('p_envio'),
+                detalle.c.idChip == db.bindparam('p_chip')
+            ).values(
+                cantidad_enviada=db.func.coalesce(detalle.c.cantidad_enviada, 0) + db.bindparam('p_enviados'),
+                cantidad_fallida=db.func.coalesce(detalle.c.cantidad_fallida, 0) + db.bindparam('p_fallidos')
+            ),
+            actualizaciones
+        )
+
+    nuevos = [
+        {'idEnvio': envio, 'idChip': chip, 'cantidad_asignada': 0,
+         'cantidad_enviada': enviados, 'cantidad_fallida': fallidos,
+         'fecha_inicio': ahora, 'estado': 'EN PROCESO'}
+        for (envio, chip), (enviados, fallidos) in por_chip.items()
+        if (envio, chip) not in existentes
+    ]
+    if nuevos:
+        db.session.execute(insert(detalle), nuevos)
+
+    db.session.execute(insert(ResultadoEnvio.__table__), [
+        {'idEnvio': envio, 'idUsuario': usuario, 'enviados': enviados,
+         'fallidos': fallidos, 'fecha_registro': ahora}
+        for (envio, usuario), (enviados, fallidos) in por_usuario.items()
+    ])
+    desde = acumular_resumen(por_chip, ahora)
+    return LoteAplicado(len(unicos), desde)
+
+class BufferResultados:
+    """Buffer en memoria con escritura diferida por lotes (tamaño o tiempo)"""
+
+    def __init__(self):
+        self.app = None
+        self._cola = None
+        self._hilo = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.tamano_lote = app.config.get('INGESTA_TAMANO_LOTE', TAMANO_LOTE)
+        self.intervalo = app.config.get('INGESTA_INTERVALO', INTERVALO_FLUSH)
+        self._cola = queue.Queue(maxsize=app.config.get('INGESTA_MAX_PENDIENTES', MAX_PENDIENTES))
+        app.config.setdefault('INGESTA_RETENCION_DIAS',
+                              int(os.environ.get('INGESTA_RETENCION_DIAS', RETENCION_DIAS)))
+        self._proxima_purga = time.monotonic() + INTERVALO_PURGA
+        atexit.register(self.detener)
+
+    def _asegurar_hilo(self):
+        # El hilo se crea al primer uso para que cada proceso (p. ej. tras un fork) tenga el suyo
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._detener.clear()
+                self._hilo = threading.Thread(target=self._ejecutar, name='ingesta-resultados', daemon=True)
+                self._hilo.start()
+
+    def encolar(self, eventos):
+        """Encola eventos sin bloquear; devuelve cuántos entraron antes de llenarse el buffer"""
+        self._asegurar_hilo()
+        aceptados = 0
+        for evento in eventos:
+            try:
+                self._cola.put_nowait(evento)
+            except queue.Full:
+                break
+            aceptados += 1
+        return aceptados
+
+    def _tomar_lote(self):
+        lote = []
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tamano_lote:
+            espera = limite - time.monotonic()
+            if espera <= 0:
+                break
+            try:
+                lote.append(self._cola.get(timeout=espera))
+            except queue.Empty:
+                break
+        return lote
+
+    def _ejecutar(self):
+        while not self._detener.is_set():
+            lote = self._tomar_lote()
+            if lote:
+                self._escribir(lote)
+            if time.monotonic() >= self._proxima_purga:
+                self._proxima_purga = time.monotonic() + INTERVALO_PURGA
+                self._purgar()
+
+    def _escribir(self, lote):
+        with self.app.app_context():
+            resultado = self._aplicar(lote)
+            if resultado.aplicados:
+                # Solo los agregados cacheados cuyo rango llega a las fechas modificadas
+                invalidar_analitica(resultado.desde)
+            if resultado.aplicados < len(lote):
+                self.app.logger.info(f'Ingesta: {len(lote) - resultado.aplicados} eventos duplicados o rechazados')
+
+    def _aplicar(self, lote, intento=1):
+        """Escribe el lote; si un evento lo hace fallar, reintenta por mitades hasta aislarlo
+
+        Ningún evento aceptado se descarta: el que no se puede aplicar queda en
+        evento_rechazado con el error.
+        """
+        try:
+            resultado = escribir_lote(lote)
+            db.session.commit()
+            return resultado
+        except Exception as e:
+            db.session.rollback()
+            motivo = str(getattr(e, 'orig', None) or f'{type(e).__name__}: {e}')
+            if _error_de_evento(e):
+                if len(lote) == 1:
+                    self._rechazar(lote, motivo)
+                    return LOTE_VACIO
+                self.app.logger.warning(f'Ingesta: lote de {len(lote)} eventos rechazado ({motivo}); se reintenta por mitades')
+                mitad = len(lote) // 2
+                return _sumar_lotes(self._aplicar(lote[:mitad]), self._aplicar(lote[mitad:]))
+            # Base bloqueada o caída: no es culpa de un evento, se reintenta el lote completo
+            if intento < REINTENTOS:
+                time.sleep(intento)
+                return self._aplicar(lote, intento + 1)
+            self.app.logger.exception(f'Ingesta: error al escribir un lote de {len(lote)} eventos')
+            self._rechazar(lote, motivo)
+            return LOTE_VACIO
+
+    def _rechazar(self, lote, motivo):
+        try:
+            registrar_rechazos([(evento, motivo) for evento in lote])
+            db.session.commit()
+            self.app.logger.warning(f'Ingesta: {len(lote)} eventos enviados a evento_rechazado: {motivo}')
+        except Exception:
+            db.session.rollback()
+            # Último recurso: los eventos quedan completos en el log para reenviarlos a mano
+            self.app.logger.exception(f'Ingesta: no se pudieron guardar eventos rechazados: {json.dumps(lote)}')
+
+    def _purgar(self):
+        with self.app.app_context():
+            try:
+                eliminados = purgar_eventos()
+                if eliminados:
+                    self.app.logger.info(f'Ingesta: {eliminados} claves de idempotencia vencidas eliminadas')
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Ingesta: error al purgar claves de idempotencia')
+
+    def vaciar(self):
+        """Escribe de inmediato todo lo pendiente (en el hilo que llama)"""
+        while True:
+            lote = []
+            while len(lote) < self.tamano_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if not lote:
+                return
+            self._escribir(lote)
+
+    def detener(self, timeout=10):
+        """Detiene el hilo y vacía el buffer (apagado ordenado)"""
+        if self._cola is None:
+            return
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout)
+        self.vaciar()
+
+    def pendientes(self):
+        return self._cola.qsize() if self._cola is not None else 0
+
+buffer_resultados = BufferResultados()
+
+def purgar_eventos(dias=None):
+    """Elimina las claves de idempotencia más antiguas que `dias` (INGESTA_RETENCION_DIAS)
+
+    Un reporte reenviado después de ese plazo se volvería a aplicar: la retención
+    debe superar el tiempo máximo de reintento de los clientes.
+    """
+    if dias is None:
+        dias = current_app.config['INGESTA_RETENCION_DIAS']
+    limite = datetime.utcnow() - timedelta(days=dias)
+    eliminados = db.session.execute(
+        delete(EventoIngesta).where(EventoIngesta.fecha_registro < limite)
+    ).rowcount
+    db.session.commit()
+    return eliminados
+
+# ==================================================
+# ENDPOINT DE INGESTA
+# ==================================================
+class GestorIngesta:
+    def __init__(self):
+        self.bp = Blueprint('ingesta', __name__, url_prefix='/api')
+        self.bp.route('/resultados', methods=['POST'], endpoint='resultados')(self.recibir_resultados)
+
+    @staticmethod
+    def _token_valido():
+        cabecera = request.headers.get('Authorization', '')
+        if not cabecera.startswith('Bearer '):
+            return False
+        token = cabecera[len('Bearer '):].strip()
+        # Se comparan bytes: compare_digest con textos no ASCII lanza TypeError
+        return any(
+            hmac.compare_digest(token.encode(), valido.encode())
+            for valido in current_app.config.get('INGESTA_TOKENS', [])
+        )
+
+    def recibir_resultados(self):
+        if not self._token_valido():
+            return jsonify({'error': 'Token inválido'}), 401
+
+        datos = request.get_json(silent=True)
+        if datos is None:
+            return jsonify({'error': 'Se esperaba un cuerpo JSON'}), 400
+        try:
+            eventos = [validar_evento(e) for e in (datos if isinstance(datos, list) else [datos])]
+        except EventoInvalido as e:
+            return jsonify({'error': str(e)}), 400
+
+        aceptados = buffer_resultados.encolar(eventos)
+        if aceptados < len(eventos):
+            current_app.logger.warning(f'Ingesta: buffer lleno, {len(eventos) - aceptados} eventos rechazados')
+            respuesta = jsonify({'aceptados': aceptados, 'rechazados': len(eventos) - aceptados})
+            return respuesta, 503, {'Retry-After': '1'}
+        return jsonify({'aceptados': aceptados}), 202
+
+gestor_ingesta = GestorIngesta()
+bp_ingesta = gestor_ingesta.bp
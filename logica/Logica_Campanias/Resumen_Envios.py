@@ -0,0 +1,230 @@
+from datetime import timedelta
+from sqlalchemy import func, insert, literal, select, tuple_
+from modelo import (
+    db,
+    Chip,
+    DetalleEnvioChip,
+    EnvioCampania,
+    ResultadoEnvio,
+    ResumenEnvio
+)
+
+# Del más fino al más grueso
+GRANOS = ('hora', 'dia', 'mes')
+DIMENSIONES_RESUMEN = ('total', 'campania', 'chip', 'operadora')
+# Una serie usa el grano más fino que no supere esta cantidad de puntos
+MAX_PUNTOS = 200
+TAMANO_BLOQUE = 500
+
+DURACION_GRANO = {
+    'hora': timedelta(hours=1),
+    'dia': timedelta(days=1),
+    'mes': timedelta(days=30),
+}
+
+# Mismo texto que SQLAlchemy guarda para un DateTime en SQLite, para que los periodos
+# reconstruidos en SQL y los acumulados desde Python coincidan en la clave primaria
+FORMATO_SQLITE = {
+    'hora': '%Y-%m-%d %H:00:00.000000',
+    'dia': '%Y-%m-%d 00:00:00.000000',
+    'mes': '%Y-%m-01 00:00:00.000000',
+}
+UNIDAD_POSTGRES = {'hora': 'hour', 'dia': 'day', 'mes': 'month'}
+
+def truncar(fecha, grano):
+    """Inicio del periodo de `grano` que contiene `fecha`"""
+    fecha = fecha.replace(minute=0, second=0, microsecond=0)
+    if grano in ('dia', 'mes'):
+        fecha = fecha.replace(hour=0)
+    if grano == 'mes':
+        fecha = fecha.replace(day=1)
+    return fecha
+
+def _truncar_sql(columna, grano):
+    dialecto = db.engine.dialect.name
+    if dialecto == 'sqlite':
+        return func.strftime(FORMATO_SQLITE[grano], columna)
+    if dialecto == 'postgresql':
+        return func.date_trunc(UNIDAD_POSTGRES[grano], columna)
+    raise ValueError(f'El resumen de envíos no soporta el motor {dialecto}')
+
+def _bloques(valores, tamano=TAMANO_BLOQUE):
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+def _sentencia_upsert():
+    """INSERT ... ON CONFLICT que suma sobre la fila existente, o None si el motor no lo soporta"""
+    dialecto = db.engine.dialect.name
+    if dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    elif dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        return None
+    tabla = ResumenEnvio.__table__
+    sentencia = insert_dialecto(tabla)
+    return sentencia.on_conflict_do_update(
+        index_elements=[tabla.c.grano, tabla.c.dimension, tabla.c.clave, tabla.c.periodo],
+        set_={
+            'enviados': tabla.c.enviados + sentencia.excluded.enviados,
+            'fallidos': tabla.c.fallidos + sentencia.excluded.fallidos,
+        }
+    )
+
+def _aplicar(deltas):
+    tabla = ResumenEnvio.__table__
+    filas = [
+        {'grano': grano, 'dimension': dimension, 'clave': clave, 'periodo': periodo,
+         'enviados': enviados, 'fallidos': fallidos}
+        for (grano, dimension, clave, periodo), (enviados, fallidos) in deltas.items()
+    ]
+    sentencia = _sentencia_upsert()
+    if sentencia is not None:
+        db.session.execute(sentencia, filas)
+        return
+
+    conexion = db.session.connection()
+    for fila in filas:
+        resultado = conexion.execute(tabla.update().where(
+            tabla.c.grano == fila['grano'],
+            tabla.c.dimension == fila['dimension'],
+            tabla.c.clave == fila['clave'],
+            tabla.c.periodo == fila['periodo']
+        ).values(
+            enviados=tabla.c.enviados + fila['enviados'],
+            fallidos=tabla.c.fallidos + fila['fallidos']
+        ))
+        if resultado.rowcount == 0:
+            conexion.execute(tabla.insert().values(**fila))
+
+def fecha_detalle():
+    """Fecha a la que se asigna el volumen de un detalle por chip (acumulado, sin fecha por evento)
+
+    Regla única para el resumen incremental, su reconstrucción y la analítica:
+    el inicio del detalle o, si no lo tiene, la fecha del envío.
+    """
+    return func.coalesce(DetalleEnvioChip.fecha_inicio, EnvioCampania.fecha_envio)
+
+def acumular_resumen(por_chip, fecha):
+    """Suma al resumen los totales {(idEnvio, idChip): (enviados, fallidos)} reportados en `fecha`
+
+    Total y campaña se asignan a `fecha` (la del ResultadoEnvio); chip y operadora
+    al periodo de fecha_detalle(), igual que en reconstruir_resumen. Se ejecuta
+    en la transacción de la ingesta, después de escribir los detalles; no confirma.
+    Devuelve la fecha más antigua a la que se sumó volumen.
+    """
+    if not por_chip:
+        return None
+    envios = list({envio for envio, _ in por_chip})
+    chips = list({chip for _, chip in por_chip})
+    campania_envio = {}
+    for bloque in _bloques(envios):
+        campania_envio.update(db.session.execute(
+            select(EnvioCampania.idEnvio, EnvioCampania.idCampania).where(EnvioCampania.idEnvio.in_(bloque))
+        ).tuples().all())
+    operadora_chip = {}
+    for bloque in _bloques(chips):
+        operadora_chip.update(db.session.execute(
+            select(Chip.idChip, Chip.operadora).where(Chip.idChip.in_(bloque))
+        ).tuples().all())
+    fecha_chip = {}
+    for bloque in _bloques(list(por_chip)):
+        for envio, chip, inicio in db.session.execute(
+            select(DetalleEnvioChip.idEnvio, DetalleEnvioChip.idChip, fecha_detalle()).join(
+                EnvioCampania, EnvioCampania.idEnvio == DetalleEnvioChip.idEnvio
+            ).where(tuple_(DetalleEnvioChip.idEnvio, DetalleEnvioChip.idChip).in_(bloque))
+        ):
+            fecha_chip[(envio, chip)] = inicio
+
+    deltas = {}
+
+    def sumar(grano, dimension, clave, periodo, enviados, fallidos):
+        llave = (grano, dimension, clave, periodo)
+        acumulado = deltas.get(llave, (0, 0))
+        deltas[llave] = (acumulado[0] + enviados, acumulado[1] + fallidos)
+
+    for (envio, chip), (enviados, fallidos) in por_chip.items():
+        por_reporte = [('total', '')]
+        if campania_envio.get(envio) is not None:
+            por_reporte.append(('campania', str(campania_envio[envio])))
+        por_detalle = [('chip', str(chip))]
+        if operadora_chip.get(chip) is not None:
+            por_detalle.append(('operadora', operadora_chip[chip]))
+        inicio = fecha_chip.get((envio, chip))
+        for grano in GRANOS:
+            for dimension, clave in por_reporte:
+                sumar(grano, dimension, clave, truncar(fecha, grano), enviados, fallidos)
+            # Como en la reconstrucción: un detalle sin fecha no entra en las series por chip
+            if inicio is not None:
+                for dimension, clave in por_detalle:
+                    sumar(grano, dimension, clave, truncar(inicio, grano), enviados, fallidos)
+    _aplicar(deltas)
+    return min([fecha, *(inicio for inicio in fecha_chip.values() if inicio is not None)])
+
+def reconstruir_resumen():
+    """Regenera el resumen desde el historial
+
+    Totales y campañas salen de ResultadoEnvio (fecha exacta del reporte). Chips y
+    operadoras salen de DetalleEnvioChip, que es acumulado: todo su volumen se
+    asigna al periodo de fecha_detalle(), igual que en acumular_resumen.
+    """
+    tabla = ResumenEnvio.__table__
+    columnas = ['grano', 'dimension', 'clave', 'periodo', 'enviados', 'fallidos']
+    fecha_detalle_chip = fecha_detalle()
+    try:
+        db.session.execute(tabla.delete())
+        for grano in GRANOS:
+            periodo_resultado = _truncar_sql(ResultadoEnvio.fecha_registro, grano)
+            periodo_detalle = _truncar_sql(fecha_detalle_chip, grano)
+            origenes = [
+                (literal('total'), literal(''), periodo_resultado, ResultadoEnvio.enviados,
+                 ResultadoEnvio.fallidos, select().select_from(ResultadoEnvio).where(
+                     ResultadoEnvio.fecha_registro.isnot(None))),
+                (literal('campania'), db.cast(EnvioCampania.idCampania, db.String), periodo_resultado,
+                 ResultadoEnvio.enviados, ResultadoEnvio.fallidos,
+                 select().select_from(ResultadoEnvio).join(
+                     EnvioCampania, EnvioCampania.idEnvio == ResultadoEnvio.idEnvio
+                 ).where(ResultadoEnvio.fecha_registro.isnot(None), EnvioCampania.idCampania.isnot(None))),
+                (literal('chip'), db.cast(DetalleEnvioChip.idChip, db.String), periodo_detalle,
+                 DetalleEnvioChip.cantidad_enviada, DetalleEnvioChip.cantidad_fallida,
+                 select().select_from(DetalleEnvioChip).join(
+                     EnvioCampania, EnvioCampania.idEnvio == DetalleEnvioChip.idEnvio
+                 ).where(fecha_detalle_chip.isnot(None), DetalleEnvioChip.idChip.isnot(None))),
+                (literal('operadora'), Chip.operadora, periodo_detalle,
+                 DetalleEnvioChip.cantidad_enviada, DetalleEnvioChip.cantidad_fallida,
+                 select().select_from(DetalleEnvioChip).join(
+                     EnvioCampania, EnvioCampania.idEnvio == DetalleEnvioChip.idEnvio
+                 ).join(Chip, Chip.idChip == DetalleEnvioChip.idChip).where(fecha_detalle_chip.isnot(None))),
+            ]
+            for dimension, clave, periodo, enviados, fallidos, base in origenes:
+                consulta = base.add_columns(
+                    literal(grano), dimension, clave, periodo,
+                    func.coalesce(func.sum(enviados), 0), func.coalesce(func.sum(fallidos), 0)
+                ).group_by(clave, periodo)
+                db.session.execute(insert(tabla).from_select(columnas, consulta))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return db.session.query(func.count()).select_from(ResumenEnvio).scalar()
+
+def elegir_grano(desde, hasta):
+    """Grano más fino cuya serie no supera MAX_PUNTOS en el rango"""
+    for grano in GRANOS:
+        if (hasta - desde) / DURACION_GRANO[grano] <= MAX_PUNTOS:
+            return grano
+    return GRANOS[-1]
+
+def serie_envios(desde, hasta, dimension='total', clave='', grano=None):
+    """Filas (periodo, enviados, fallidos) en [desde, hasta) leídas del resumen"""
+    grano = grano or elegir_grano(desde, hasta)
+    filas = db.session.execute(
+        select(ResumenEnvio.periodo, ResumenEnvio.enviados, ResumenEnvio.fallidos).where(
+            ResumenEnvio.grano == grano,
+            ResumenEnvio.dimension == dimension,
+            ResumenEnvio.clave == str(clave),
+            ResumenEnvio.periodo >= truncar(desde, grano),
+            ResumenEnvio.periodo < hasta
+        ).order_by(ResumenEnvio.periodo)
+    ).tuples().all()
+    return grano, filas
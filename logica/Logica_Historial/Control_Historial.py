@@ -1,21 +1,34 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, session
+from flask import (
+    Blueprint,
+    Response,
+    render_template,
+    request,
+    flash,
+    redirect,
+    url_for,
+    session,
+    stream_with_context
+)
 from flask_login import current_user
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired, FileAllowed
 from wtforms import (
     StringField, 
     DateField, 
     SubmitField, 
     SelectField, 
-    BooleanField
+    BooleanField,
+    TextAreaField
 )
 from wtforms.validators import (
     DataRequired, 
     Length, 
     Regexp, 
-    ValidationError, 
     Optional
 )
+import os
 from datetime import datetime, timezone
+from sqlalchemy.exc import IntegrityError
 
 # Importación de modelos
 from modelo import (
@@ -24,12 +37,51 @@ from modelo import (
     Chip,
     ChipEstado,
     CelularChip,
-    ChipEstadoRelacion,
-    Usuario
+    ChipEstadoRelacion
 )
 
 # Importación de decoradores personalizados
 from decoradores import requiere_login, requiere_rol
+from restricciones import errores_de_unicidad
+from paginacion import ClaveOrden, paginar_keyset
+from busqueda import filtro_busqueda
+from contadores import leer_contadores, clave_estado
+from logica.Logica_Historial.Estados_Historial import (
+    cambiar_estado_chip,
+    distribucion_estados_en,
+    inicializar_estados_pendientes,
+    transicion_masiva
+)
+from logica.Logica_Historial.Importacion_Historial import ImportadorInventario
+from logica.Logica_Historial.Exportacion_Historial import exportar_csv, exportar_xlsx
+from trabajos import gestor_trabajos, tarea
+
+def respuesta_exportacion(tipo):
+    """Descarga del inventario filtrado igual que su listado (CSV en streaming, XLSX en segundo plano)"""
+    formato = request.args.get('formato', 'csv')
+    busqueda = request.args.get('busqueda', '')
+    nombre = f'{tipo}s_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+
+    if formato == 'xlsx':
+        trabajo = gestor_trabajos.encolar(
+            'exportar_inventario',
+            {'tipo': tipo, 'busqueda': busqueda, 'nombre': f'{nombre}.xlsx'},
+            id_usuario=session.get('id_usuario'),
+            descripcion=f'Exportación XLSX de {tipo}s'
+        )
+        flash('La exportación se está generando; podrá descargarla al finalizar', 'info')
+        return redirect(url_for('trabajos.detalle', id=trabajo.id))
+
+    return Response(stream_with_context(exportar_csv(tipo, busqueda)),
+                    mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={nombre}.csv'})
+
+@tarea('exportar_inventario')
+def tarea_exportar_inventario(contexto, tipo, busqueda, nombre):
+    exportar_xlsx(tipo, busqueda,
+                  destino=contexto.ruta_archivo('xlsx'),
+                  al_avanzar=lambda filas: contexto.avanzar(filas, mensaje=f'{filas} filas escritas'))
+    return {'nombre_descarga': nombre}
 
 # ==================================================
 # CONTROLADOR PARA CELULARES
@@ -46,15 +98,8 @@ class CelularForm(FlaskForm):
     fecha_registro = DateField('Fecha de Registro', validators=[DataRequired()])
     submit = SubmitField('Guardar Celular')
 
-    def __init__(self, *args, **kwargs):
-        self.original_imei = kwargs.pop('original_imei', None)
-        super(CelularForm, self).__init__(*args, **kwargs)
-
-    def validate_imei(self, field):
-        if field.data != self.original_imei:
-            celular_existente = Celular.query.filter_by(imei=field.data).first()
-            if celular_existente:
-                raise ValidationError('Este IMEI ya está registrado. Debe ser único.')
+    # La unicidad la garantiza la base: el IntegrityError se traduce a estos mensajes
+    MENSAJES_UNICOS = {'imei': 'Este IMEI ya está registrado. Debe ser único.'}
 
     def validate(self, extra_validators=None):
         if not super().validate(extra_validators=extra_validators):
@@ -83,34 +128,37 @@ class ControlCelular:
         self.bp.route('/celulares/nuevo', methods=['GET', 'POST'], endpoint='celulares_nuevo')(self.nuevo)
         self.bp.route('/celulares/<int:id>/editar', methods=['GET', 'POST'], endpoint='celulares_editar')(self.editar)
         self.bp.route('/celulares/<int:id>/eliminar', methods=['POST'], endpoint='celulares_eliminar')(self.eliminar)
+        self.bp.route('/celulares/exportar', endpoint='celulares_exportar')(self.exportar)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def index(self):
-        pagina = request.args.get('pagina', 1, type=int)
-        celulares = Celular.query.order_by(
-            Celular.fecha_registro.desc(), Celular.marca, Celular.modelo
-        ).paginate(page=pagina, per_page=10)
+        cursor = request.args.get('cursor')
+        busqueda = request.args.get('busqueda', '')
+        
+        query = Celular.query
+        
+        if busqueda:
+            query = query.filter(filtro_busqueda('celular', busqueda))
+            
+        celulares = paginar_keyset(query, [
+            ClaveOrden(Celular.fecha_registro, lambda c: c.fecha_registro, descendente=True),
+            ClaveOrden(db.func.coalesce(Celular.marca, ''), lambda c: c.marca or ''),
+            ClaveOrden(db.func.coalesce(Celular.modelo, ''), lambda c: c.modelo or ''),
+            ClaveOrden(Celular.idCelular, lambda c: c.idCelular),
+        ], cursor=cursor, per_page=10, clave_total=('celular', busqueda))
         
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         return render_template('historial/Control_Historial/Control_Celular.html', 
                             celulares=celulares,
-                            usuario_actual=usuario_actual)
+                            busqueda=busqueda)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def nuevo(self):
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         form = CelularForm()
         
         if form.validate_on_submit():
             try:
-                if Celular.query.filter_by(imei=form.imei.data).first():
-                    flash('Este IMEI ya está registrado. Debe ser único.', 'danger')
-                    return render_template('historial/Control_Historial/Agregar_ControlHistorial/Agregar_Celular.html',
-                                        form=form,
-                                        usuario_actual=usuario_actual)
-
                 celular = Celular(
                     imei=form.imei.data,
                     marca=form.marca.data,
@@ -122,30 +170,25 @@ class ControlCelular:
                 db.session.commit()
                 flash('Celular registrado exitosamente', 'success')
                 return redirect(url_for('historial.celulares_index'))
+            except IntegrityError as e:
+                db.session.rollback()
+                if not errores_de_unicidad(e, form, CelularForm.MENSAJES_UNICOS, Celular):
+                    flash(f'Error al registrar celular: {str(e)}', 'danger')
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al registrar celular: {str(e)}', 'danger')
         
         return render_template('historial/Control_Historial/Agregar_ControlHistorial/Agregar_Celular.html',
-                            form=form,
-                            usuario_actual=usuario_actual)
+                            form=form)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def editar(self, id):
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         celular = Celular.query.get_or_404(id)
-        form = CelularForm(obj=celular, original_imei=celular.imei)
+        form = CelularForm(obj=celular)
         
         if form.validate_on_submit():
             try:
-                if form.imei.data != celular.imei and Celular.query.filter_by(imei=form.imei.data).first():
-                    flash('Este IMEI ya está registrado. Debe ser único.', 'danger')
-                    return render_template('historial/Control_Historial/Editar_ControlHistorial/Editar_Celular.html', 
-                                        form=form,
-                                        celular=celular,
-                                        usuario_actual=usuario_actual)
-
                 celular.imei = form.imei.data
                 celular.marca = form.marca.data
                 celular.modelo = form.modelo.data
@@ -154,14 +197,17 @@ class ControlCelular:
                 db.session.commit()
                 flash('Celular actualizado exitosamente', 'success')
                 return redirect(url_for('historial.celulares_index'))
+            except IntegrityError as e:
+                db.session.rollback()
+                if not errores_de_unicidad(e, form, CelularForm.MENSAJES_UNICOS, Celular, id):
+                    flash(f'Error al actualizar celular: {str(e)}', 'danger')
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al actualizar celular: {str(e)}', 'danger')
         
         return render_template('historial/Control_Historial/Editar_ControlHistorial/Editar_Celular.html', 
                             form=form,
-                            celular=celular,
-                            usuario_actual=usuario_actual)
+                            celular=celular)
 
     @requiere_login
     @requiere_rol('Administrador General')
@@ -175,6 +221,11 @@ class ControlCelular:
             db.session.rollback()
             flash(f'Error al eliminar celular: {str(e)}', 'danger')
         return redirect(url_for('historial.celulares_index'))
+
+    @requiere_login
+    @requiere_rol('Administrador General', 'Supervisor Historial')
+    def exportar(self):
+        return respuesta_exportacion('celular')
 # ==================================================
 # CONTROLADOR PARA CHIPS
 # ==================================================
@@ -208,15 +259,11 @@ class ChipForm(FlaskForm):
     
     submit = SubmitField('Guardar')
 
-    def validate_numero(self, field):
-        chip_existente = Chip.query.filter_by(numero=field.data).first()
-        if chip_existente and (not hasattr(self, 'chip') or chip_existente.idChip != self.chip.idChip):
-            raise ValidationError('Este número ya está registrado')
-
-    def validate_iccid(self, field):
-        chip_existente = Chip.query.filter_by(iccid=field.data).first()
-        if chip_existente and (not hasattr(self, 'chip') or chip_existente.idChip != self.chip.idChip):
-            raise ValidationError('Este ICCID ya está registrado')
+    # La unicidad la garantiza la base: el IntegrityError se traduce a estos mensajes
+    MENSAJES_UNICOS = {
+        'numero': 'Este número ya está registrado',
+        'iccid': 'Este ICCID ya está registrado',
+    }
 
     def validate(self, extra_validators=None):
         if not super().validate(extra_validators=extra_validators):
@@ -252,38 +299,32 @@ class ControlChip:
         self.bp.route('/chips/nuevo', methods=['GET', 'POST'], endpoint='chips_nuevo')(self.nuevo)
         self.bp.route('/chips/<int:id>/editar', methods=['GET', 'POST'], endpoint='chips_editar')(self.editar)
         self.bp.route('/chips/<int:id>/eliminar', methods=['POST'], endpoint='chips_eliminar')(self.eliminar)
+        self.bp.route('/chips/exportar', endpoint='chips_exportar')(self.exportar)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def index(self):
-        pagina = request.args.get('pagina', 1, type=int)
+        cursor = request.args.get('cursor')
         busqueda = request.args.get('busqueda', '')
         
         query = Chip.query
         
         if busqueda:
-            query = query.filter(
-                (Chip.numero.contains(busqueda)) | 
-                (Chip.iccid.contains(busqueda)) | 
-                (Chip.operadora.contains(busqueda))
-            )
+            query = query.filter(filtro_busqueda('chip', busqueda))
             
-        chips = query.order_by(
-            Chip.fecha_registro.desc(), 
-            Chip.operadora, 
-            Chip.numero
-        ).paginate(page=pagina, per_page=10)
+        chips = paginar_keyset(query, [
+            ClaveOrden(Chip.fecha_registro, lambda c: c.fecha_registro, descendente=True),
+            ClaveOrden(Chip.operadora, lambda c: c.operadora),
+            ClaveOrden(Chip.numero, lambda c: c.numero),
+        ], cursor=cursor, per_page=10, clave_total=('chip', busqueda))
 
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         return render_template('historial/Control_Historial/Control_Chip.html',
                             chips=chips,
-                            busqueda=busqueda,
-                            usuario_actual=usuario_actual)
+                            busqueda=busqueda)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def nuevo(self):
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         form = ChipForm()
         
         if form.validate_on_submit():
@@ -299,26 +340,30 @@ class ControlChip:
                 )
                 
                 db.session.add(chip)
+                estado_inicial = ChipEstado.query.filter_by(nombre=chip.estado_actual or 'ACTIVO').first()
+                if estado_inicial:
+                    cambiar_estado_chip(chip, estado_inicial)
                 db.session.commit()
                 
                 flash('Chip registrado exitosamente', 'success')
                 return redirect(url_for('historial.chips_index'))
                 
+            except IntegrityError as e:
+                db.session.rollback()
+                if not errores_de_unicidad(e, form, ChipForm.MENSAJES_UNICOS, Chip):
+                    flash(f'Error al registrar chip: {str(e)}', 'danger')
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al registrar chip: {str(e)}', 'danger')
 
         return render_template('historial/Control_Historial/Agregar_ControlHistorial/Agregar_Chip.html',
-                             form=form,
-                             usuario_actual=usuario_actual)
+                             form=form)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def editar(self, id):
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         chip = Chip.query.get_or_404(id)
         form = ChipForm(obj=chip)
-        form.chip = chip
         
         if form.validate_on_submit():
             try:
@@ -334,14 +379,17 @@ class ControlChip:
                 flash('Chip actualizado exitosamente', 'success')
                 return redirect(url_for('historial.chips_index'))
                 
+            except IntegrityError as e:
+                db.session.rollback()
+                if not errores_de_unicidad(e, form, ChipForm.MENSAJES_UNICOS, Chip, id):
+                    flash(f'Error al actualizar chip: {str(e)}', 'danger')
             except Exception as e:
                 db.session.rollback()
                 flash(f'Error al actualizar chip: {str(e)}', 'danger')
 
         return render_template('historial/Control_Historial/Editar_ControlHistorial/Editar_Chip.html',
                              form=form,
-                             chip=chip,
-                             usuario_actual=usuario_actual)
+                             chip=chip)
 
     @requiere_login
     @requiere_rol('Administrador General')
@@ -360,6 +408,11 @@ class ControlChip:
             
         return redirect(url_for('historial.chips_index'))
 
+    @requiere_login
+    @requiere_rol('Administrador General', 'Supervisor Historial')
+    def exportar(self):
+        return respuesta_exportacion('chip')
+
 # ==================================================
 # CONTROLADOR PARA ESTADOS DE CHIPS
 # ==================================================
@@ -370,6 +423,27 @@ class EstadoForm(FlaskForm):
     ])
     submit = SubmitField('Guardar')
 
+class TransicionMasivaForm(FlaskForm):
+    estado = SelectField('Nuevo Estado', coerce=int, validators=[DataRequired()])
+    numeros = TextAreaField('Números de Chip', validators=[Optional()])
+    busqueda = StringField('Filtro de Búsqueda', validators=[Optional()])
+    submit = SubmitField('Aplicar')
+
+    def lista_numeros(self):
+        """Números separados por comas, espacios o saltos de línea (sin separadores sueltos)"""
+        return (self.numeros.data or '').replace(',', ' ').split()
+
+    def validate(self, extra_validators=None):
+        if not super().validate(extra_validators=extra_validators):
+            return False
+
+        # Se valida la lista ya separada: un "," solo no debe caer en el filtro vacío (todos los chips)
+        if not self.lista_numeros() and not (self.busqueda.data or '').strip():
+            self.numeros.errors.append('Ingrese los números de chip o un filtro de búsqueda')
+            return False
+
+        return True
+
 class ControlEstado:
     def __init__(self, bp):
         self.bp = bp
@@ -380,20 +454,18 @@ class ControlEstado:
         self.bp.route('/estados/nuevo', methods=['GET', 'POST'], endpoint='estados_nuevo')(self.nuevo)
         self.bp.route('/estados/<int:id>/editar', methods=['GET', 'POST'], endpoint='estados_editar')(self.editar)
         self.bp.route('/estados/<int:id>/eliminar', methods=['POST'], endpoint='estados_eliminar')(self.eliminar)
+        self.bp.route('/estados/transicion', methods=['GET', 'POST'], endpoint='estados_transicion')(self.transicion)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def index(self):
         estados = ChipEstado.query.order_by(ChipEstado.nombre).all()
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         return render_template('historial/Control_Historial/Control_Estado.html',
-                            estados=estados,
-                            usuario_actual=usuario_actual)
+                            estados=estados)
 
     @requiere_login
     @requiere_rol('Administrador General')
     def nuevo(self):
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         form = EstadoForm()
         
         if form.validate_on_submit():
@@ -408,13 +480,11 @@ class ControlEstado:
                 flash(f'Error al crear estado: {str(e)}', 'danger')
         
         return render_template('historial/Control_Historial/Agregar_ControlHistorial/Agregar_Estado.html',
-                            form=form,
-                            usuario_actual=usuario_actual)
+                            form=form)
 
     @requiere_login
     @requiere_rol('Administrador General')
     def editar(self, id):
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         estado = ChipEstado.query.get_or_404(id)
         form = EstadoForm(obj=estado)
         
@@ -430,8 +500,7 @@ class ControlEstado:
         
         return render_template('historial/Control_Historial/Editar_ControlHistorial/Editar_Estado.html',
                             form=form,
-                            estado=estado,
-                            usuario_actual=usuario_actual)
+                            estado=estado)
 
     @requiere_login
     @requiere_rol('Administrador General')
@@ -449,6 +518,120 @@ class ControlEstado:
             flash(f'Error al eliminar estado: {str(e)}', 'danger')
         return redirect(url_for('historial.estados_index'))
 
+    @requiere_login
+    @requiere_rol('Administrador General', 'Supervisor Historial')
+    def transicion(self):
+        form = TransicionMasivaForm()
+        form.estado.choices = [
+            (estado.idEstado, estado.nombre)
+            for estado in ChipEstado.query.order_by(ChipEstado.nombre).all()
+        ]
+        
+        if form.validate_on_submit():
+            estado = ChipEstado.query.get_or_404(form.estado.data)
+            numeros = form.lista_numeros()
+            trabajo = gestor_trabajos.encolar(
+                'transicion_estados',
+                {'id_estado': estado.idEstado,
+                 'numeros': numeros or None,
+                 'busqueda': '' if numeros else form.busqueda.data.strip()},
+                id_usuario=session.get('id_usuario'),
+                descripcion=f'Cambio masivo a {estado.nombre}'
+            )
+            flash('El cambio de estado se está aplicando en segundo plano', 'info')
+            return redirect(url_for('trabajos.detalle', id=trabajo.id))
+        
+        return render_template('historial/Control_Historial/Transicion_Estados.html',
+                            form=form)
+
+@tarea('transicion_estados')
+def tarea_transicion_estados(contexto, id_estado, numeros, busqueda):
+    estado = db.session.get(ChipEstado, id_estado)
+    if estado is None:
+        raise ValueError('El estado seleccionado ya no existe')
+    resultado = transicion_masiva(
+        estado, numeros=numeros, busqueda=busqueda,
+        al_avanzar=lambda procesados, total: contexto.avanzar(
+            procesados, total, mensaje=f'{procesados} de {total} chips actualizados'
+        )
+    )
+    return {'actualizados': resultado.actualizados, 'omitidos': resultado.omitidos}
+
+# ==================================================
+# CONTROLADOR PARA IMPORTACIÓN MASIVA
+# ==================================================
+class ImportacionForm(FlaskForm):
+    tipo = SelectField('Tipo de Inventario', choices=[
+        ('chip', 'Chips'),
+        ('celular', 'Celulares'),
+    ], validators=[DataRequired()])
+    archivo = FileField('Archivo', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'xlsx'], 'Solo se permiten archivos CSV o XLSX')
+    ])
+    submit = SubmitField('Importar')
+
+class ControlImportacion:
+    IMPORTADORES = {
+        'chip': lambda: ImportadorInventario(
+            Chip, ChipForm,
+            ['numero', 'iccid', 'operadora', 'tipo_linea',
+             'fecha_adquisicion', 'fecha_registro', 'fecha_activacion'],
+            ['numero', 'iccid'],
+            al_insertar=lambda numeros: inicializar_estados_pendientes(numeros=numeros)
+        ),
+        'celular': lambda: ImportadorInventario(
+            Celular, CelularForm,
+            ['imei', 'marca', 'modelo', 'fecha_adquisicion', 'fecha_registro'],
+            ['imei']
+        ),
+    }
+
+    def __init__(self, bp):
+        self.bp = bp
+        self._registrar_rutas()
+
+    def _registrar_rutas(self):
+        self.bp.route('/importar', methods=['GET', 'POST'], endpoint='importar')(self.importar)
+
+    @requiere_login
+    @requiere_rol('Administrador General', 'Supervisor Historial')
+    def importar(self):
+        form = ImportacionForm()
+
+        if form.validate_on_submit():
+            archivo = form.archivo.data
+            extension = archivo.filename.rsplit('.', 1)[-1].lower()
+            # El archivo se guarda para que el trabajo lo procese fuera de la petición
+            ruta = gestor_trabajos.ruta_entrada(extension)
+            archivo.save(ruta)
+            trabajo = gestor_trabajos.encolar(
+                'importar_inventario',
+                {'tipo': form.tipo.data, 'ruta': ruta, 'nombre_archivo': archivo.filename},
+                id_usuario=session.get('id_usuario'),
+                descripcion=f'Importación de {archivo.filename}'
+            )
+            flash('El archivo se está importando en segundo plano', 'info')
+            return redirect(url_for('trabajos.detalle', id=trabajo.id))
+
+        return render_template('historial/Control_Historial/Importar_Inventario.html',
+                            form=form)
+
+@tarea('importar_inventario')
+def tarea_importar_inventario(contexto, tipo, ruta, nombre_archivo):
+    importador = ControlImportacion.IMPORTADORES[tipo]()
+    try:
+        with open(ruta, 'rb') as archivo:
+            reporte = importador.importar(
+                archivo, nombre_archivo,
+                al_avanzar=lambda r: contexto.avanzar(
+                    r.total_filas, mensaje=f'{r.insertados} insertados, {r.total_errores} con errores'
+                )
+            )
+    finally:
+        os.remove(ruta)
+    return reporte.como_dict()
+
 # ==================================================
 # CONTROLADOR PRINCIPAL DE HISTORIAL
 # ==================================================
@@ -458,25 +641,38 @@ class ControlHistorial:
         self.control_celular = ControlCelular(self.bp)
         self.control_chip = ControlChip(self.bp)
         self.control_estado = ControlEstado(self.bp)
+        self.control_importacion = ControlImportacion(self.bp)
         
         self.bp.route('', endpoint='dashboard')(self.dashboard)
 
     @requiere_login
     @requiere_rol('Administrador General', 'Supervisor Historial')
     def dashboard(self):
-        total_celulares = Celular.query.count()
-        total_chips = Chip.query.count()
-        estados_chips = db.session.query(
-            ChipEstado.nombre,
-            db.func.count(ChipEstadoRelacion.idChip)
-        ).join(ChipEstadoRelacion).group_by(ChipEstado.nombre).all()
+        contadores = leer_contadores()
+        total_celulares = contadores.get('celulares', 0)
+        total_chips = contadores.get('chips', 0)
+        
+        # Distribución en una fecha pasada o, por defecto, la vigente (contadores)
+        fecha = request.args.get('fecha', '')
+        try:
+            fecha_consulta = datetime.strptime(fecha, '%Y-%m-%d') if fecha else None
+        except ValueError:
+            flash('Fecha inválida, use el formato AAAA-MM-DD', 'warning')
+            fecha_consulta = None
+        
+        if fecha_consulta:
+            estados_chips = distribucion_estados_en(fecha_consulta)
+        else:
+            estados_chips = [
+                (estado.nombre, contadores.get(clave_estado(estado.idEstado), 0))
+                for estado in ChipEstado.query.order_by(ChipEstado.nombre).all()
+            ]
         
-        usuario_actual = Usuario.query.get(session['id_usuario'])
         return render_template('historial/Control_Historial/dashboard.html',
                             total_celulares=total_celulares,
                             total_chips=total_chips,
                             estados_chips=estados_chips,
-                            usuario_actual=usuario_actual)
+                            fecha=fecha if fecha_consulta else '')
 
 # ==================================================
 # INSTANCIA PRINCIPAL
@@ -0,0 +1,279 @@
+from datetime import datetime
+from sqlalchemy import exists, select, union_all
+from modelo import (
+    db,
+    Chip,
+    ChipEstado,
+    ChipEstadoActual,
+    ChipEstadoRelacion
+)
+from contadores import ajustar_contadores, clave_estado, reconstruir_contadores
+from busqueda import filtro_busqueda
+
+# Estados que determinan si el chip tiene WhatsApp; el resto no lo modifica
+WHATSAPP_POR_ESTADO = {
+    'WHATSAPP ACTIVO': True,
+    'WHATSAPP INACTIVO': False,
+}
+
+# Parámetros por sentencia IN (límite de variables de SQLite)
+TAMANO_BLOQUE = 500
+
+def _bloques(valores, tamano=TAMANO_BLOQUE):
+    for inicio in range(0, len(valores), tamano):
+        yield valores[inicio:inicio + tamano]
+
+# ==================================================
+# TRANSICIONES INDIVIDUALES
+# ==================================================
+def cambiar_estado_chip(chip, estado, fecha=None):
+    """Cierra el intervalo abierto del chip y abre uno nuevo en `estado` (sin commit)"""
+    fecha = fecha or datetime.utcnow()
+    vigente = chip.estado_vigente
+
+    if vigente is not None:
+        if vigente.idEstado == estado.idEstado:
+            return vigente
+        db.session.get(ChipEstadoRelacion, vigente.idRelacion).fecha_fin = fecha
+
+    relacion = ChipEstadoRelacion(chip=chip, estado=estado, fecha_inicio=fecha)
+    db.session.add(relacion)
+    db.session.flush()
+
+    if vigente is None:
+        vigente = ChipEstadoActual(chip=chip)
+        db.session.add(vigente)
+    vigente.idEstado = estado.idEstado
+    vigente.idRelacion = relacion.id
+    vigente.fecha_inicio = fecha
+    chip.estado_actual = estado.nombre
+    if estado.nombre in WHATSAPP_POR_ESTADO:
+        chip.tiene_whatsapp = WHATSAPP_POR_ESTADO[estado.nombre]
+    return vigente
+
+# ==================================================
+# TRANSICIONES MASIVAS
+# ==================================================
+class ResultadoTransicion:
+    def __init__(self):
+        self.actualizados = 0
+        self.omitidos = []
+
+    def omitir(self, numero, motivo):
+        self.omitidos.append({'numero': numero, 'motivo': motivo})
+
+def _candidatos(numeros, busqueda):
+    """Filas (idChip, numero, idEstado vigente) de los chips seleccionados"""
+    columnas = select(Chip.idChip, Chip.numero, ChipEstadoActual.idEstado).outerjoin(
+        ChipEstadoActual, ChipEstadoActual.idChip == Chip.idChip
+    )
+    if numeros is not None:
+        for bloque in _bloques(numeros):
+            yield from db.session.execute(columnas.where(Chip.numero.in_(bloque)))
+    else:
+        yield from db.session.execute(columnas.where(filtro_busqueda('chip', busqueda)))
+
+def transicion_masiva(estado, numeros=None, busqueda='', fecha=None, al_avanzar=None):
+    """Mueve los chips indicados (por número o por filtro) a `estado` en una transacción
+
+    Con `al_avanzar(procesados, total)` se confirma cada bloque y se llama después,
+    como en la importación: si lanza una excepción (p. ej. TrabajoCancelado) quedan
+    aplicados los bloques ya confirmados. Lanza ValueError si no se indicó ningún
+    número ni filtro: un filtro vacío seleccionaría todo el inventario.
+    """
+    fecha = fecha or datetime.utcnow()
+    resultado = ResultadoTransicion()
+    if numeros is not None:
+        numeros = list(dict.fromkeys(n.strip() for n in numeros if n.strip())) or None
+    busqueda = (busqueda or '').strip()
+    if not numeros and not busqueda:
+        raise ValueError('Indique los números de chip o un filtro de búsqueda')
+
+    ids = []
+    estado_previo = {}
+    encontrados = set()
+    for id_chip, numero, id_estado in _candidatos(numeros, busqueda):
+        encontrados.add(numero)
+        if id_estado == estado.idEstado:
+            resultado.omitir(numero, 'Ya se encuentra en el estado indicado')
+            continue
+        ids.append(id_chip)
+        estado_previo[id_chip] = id_estado
+
+    if numeros is not None:
+        for numero in numeros:
+            if numero not in encontrados:
+                resultado.omitir(numero, 'Chip no registrado')
+
+    if not ids:
+        return resultado
+
+    relacion = ChipEstadoRelacion.__table__
+    actual = ChipEstadoActual.__table__
+    valores_chip = {'estado_actual': estado.nombre}
+    if estado.nombre in WHATSAPP_POR_ESTADO:
+        valores_chip['tiene_whatsapp'] = WHATSAPP_POR_ESTADO[estado.nombre]
+
+    try:
+        for bloque in _bloques(ids):
+            db.session.execute(
+                relacion.update().where(
+                    relacion.c.idChip.in_(bloque), relacion.c.fecha_fin.is_(None)
+                ).values(fecha_fin=fecha)
+            )
+            db.session.execute(relacion.insert(), [
+                {'idChip': id_chip, 'idEstado': estado.idEstado, 'fecha_inicio': fecha}
+                for id_chip in bloque
+            ])
+            db.session.execute(actual.delete().where(actual.c.idChip.in_(bloque)))
+            db.session.execute(actual.insert().from_select(
+                ['idChip', 'idEstado', 'idRelacion', 'fecha_inicio'],
+                select(
+                    relacion.c.idChip, relacion.c.idEstado, relacion.c.id, relacion.c.fecha_inicio
+                ).where(relacion.c.idChip.in_(bloque), relacion.c.fecha_fin.is_(None))
+            ))
+            db.session.execute(
+                Chip.__table__.update().where(Chip.idChip.in_(bloque)).values(**valores_chip)
+            )
+
+            salidas = {clave_estado(estado.idEstado): len(bloque)}
+            for id_chip in bloque:
+                if estado_previo[id_chip] is not None:
+                    clave = clave_estado(estado_previo[id_chip])
+                    salidas[clave] = salidas.get(clave, 0) - 1
+            ajustar_contadores(salidas)
+            resultado.actualizados += len(bloque)
+            if al_avanzar:
+                db.session.commit()
+                al_avanzar(resultado.actualizados, len(ids))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return resultado
+
+# ==================================================
+# CONSULTAS POR INTERVALO
+# ==================================================
+def distribucion_actual():
+    """[(nombre_estado, chips)] según el puntero de estado vigente"""
+    return db.session.query(
+        ChipEstado.nombre,
+        db.func.count(ChipEstadoActual.idChip)
+    ).outerjoin(
+        ChipEstadoActual, ChipEstadoActual.idEstado == ChipEstado.idEstado
+    ).group_by(ChipEstado.idEstado, ChipEstado.nombre).order_by(ChipEstado.nombre).all()
+
+def distribucion_estados_en(fecha):
+    """[(nombre_estado, chips)] con los intervalos que contienen `fecha`
+
+    Dos rangos sobre el índice (fecha_fin, fecha_inicio, idEstado) unidos con
+    UNION ALL, en vez de un OR que no puede usarlo: los intervalos abiertos
+    que empezaron antes de `fecha` y los cerrados que terminaron después. Se
+    recorren solo los intervalos posteriores a `fecha`, no toda la historia.
+    """
+    relacion = ChipEstadoRelacion.__table__
+    vigentes = union_all(
+        select(relacion.c.idEstado).where(
+            relacion.c.fecha_fin.is_(None), relacion.c.fecha_inicio <= fecha
+        ),
+        select(relacion.c.idEstado).where(
+            relacion.c.fecha_fin > fecha, relacion.c.fecha_inicio <= fecha
+        )
+    ).subquery()
+    por_estado = select(
+        vigentes.c.idEstado, db.func.count().label('chips')
+    ).group_by(vigentes.c.idEstado).subquery()
+    return db.session.execute(
+        select(ChipEstado.nombre, db.func.coalesce(por_estado.c.chips, 0)).outerjoin(
+            por_estado, por_estado.c.idEstado == ChipEstado.idEstado
+        ).order_by(ChipEstado.nombre)
+    ).all()
+
+def chips_que_entraron(id_estado, desde, hasta):
+    """Consulta de chips que entraron en `id_estado` dentro de [desde, hasta)"""
+    return db.session.query(
+        Chip, ChipEstadoRelacion.fecha_inicio
+    ).join(
+        ChipEstadoRelacion, ChipEstadoRelacion.idChip == Chip.idChip
+    ).filter(
+        ChipEstadoRelacion.idEstado == id_estado,
+        ChipEstadoRelacion.fecha_inicio >= desde,
+        ChipEstadoRelacion.fecha_inicio < hasta
+    ).order_by(ChipEstadoRelacion.fecha_inicio)
+
+# ==================================================
+# MANTENIMIENTO DEL PUNTERO
+# ==================================================
+def inicializar_estados_pendientes(fecha=None, numeros=None):
+    """Abre el intervalo inicial (según Chip.estado_actual) de los chips sin estado vigente
+
+    Con `numeros` solo se consideran esos chips (p. ej. los recién importados).
+    No confirma la transacción.
+    """
+    fecha = fecha or datetime.utcnow()
+    relacion = ChipEstadoRelacion.__table__
+
+    sin_intervalo = ~exists().where(
+        relacion.c.idChip == Chip.idChip,
+        relacion.c.fecha_fin.is_(None)
+    )
+    pendientes = select(Chip.idChip, ChipEstado.idEstado, db.literal(fecha)).join(
+        ChipEstado, ChipEstado.nombre == Chip.estado_actual
+    ).where(sin_intervalo)
+    if numeros is not None:
+        pendientes = pendientes.where(Chip.numero.in_(numeros))
+
+    subconsulta = pendientes.subquery()
+    por_estado = db.session.execute(
+        select(subconsulta.c.idEstado, db.func.count()).group_by(subconsulta.c.idEstado)
+    ).all()
+    if not por_estado:
+        return 0
+
+    db.session.execute(relacion.insert().from_select(
+        ['idChip', 'idEstado', 'fecha_inicio'], pendientes
+    ))
+    _insertar_punteros_faltantes(numeros)
+    ajustar_contadores({clave_estado(id_estado): total for id_estado, total in por_estado})
+    return sum(total for _, total in por_estado)
+
+def _insertar_punteros_faltantes(numeros=None):
+    relacion = ChipEstadoRelacion.__table__
+    actual = ChipEstadoActual.__table__
+    # Si hubiera más de un intervalo abierto por chip, el más reciente es el vigente
+    ultima = select(
+        relacion.c.idChip, db.func.max(relacion.c.id).label('id')
+    ).where(relacion.c.fecha_fin.is_(None))
+    if numeros is not None:
+        ultima = ultima.where(relacion.c.idChip.in_(select(Chip.idChip).where(Chip.numero.in_(numeros))))
+    ultima = ultima.group_by(relacion.c.idChip).subquery()
+
+    db.session.execute(actual.insert().from_select(
+        ['idChip', 'idEstado', 'idRelacion', 'fecha_inicio'],
+        select(
+            relacion.c.idChip, relacion.c.idEstado, relacion.c.id, relacion.c.fecha_inicio
+        ).join(ultima, ultima.c.id == relacion.c.id).where(
+            ~exists().where(actual.c.idChip == relacion.c.idChip)
+        )
+    ))
+
+def reconstruir_estado_actual():
+    """Regenera el puntero desde los intervalos abiertos y sincroniza Chip.estado_actual"""
+    actual = ChipEstadoActual.__table__
+    db.session.execute(actual.delete())
+    _insertar_punteros_faltantes()
+
+    nombre_vigente = select(ChipEstado.nombre).join(
+        actual, actual.c.idEstado == ChipEstado.idEstado
+    ).where(actual.c.idChip == Chip.idChip).scalar_subquery()
+    db.session.execute(
+        Chip.__table__.update().where(
+            exists().where(actual.c.idChip == Chip.idChip)
+        ).values(estado_actual=nombre_vigente)
+    )
+    inicializados = inicializar_estados_pendientes()
+    db.session.commit()
+    reconstruir_contadores()
+    return inicializados
@@ -0,0 +1,123 @@
+import csv
+import io
+import tempfile
+from sqlalchemy import select
+from modelo import (
+    db,
+    Celular,
+    Chip,
+    ChipEstado,
+    CelularChip,
+    ChipEstadoRelacion
+)
+from busqueda import filtro_busqueda
+
+# Filas leídas por viaje al servidor; el resultado nunca se materializa completo
+FILAS_POR_LOTE = 1000
+
+class ErrorExportacion(Exception):
+    """Formato de exportación no disponible"""
+
+def _consulta_chips(busqueda=''):
+    # Asignación vigente y último estado por chip como subconsultas correlacionadas
+    celular_actual = select(Celular.imei).join(
+        CelularChip, CelularChip.idCelular == Celular.idCelular
+    ).where(
+        CelularChip.idChip == Chip.idChip,
+        CelularChip.fecha_remocion.is_(None)
+    ).order_by(CelularChip.fecha_asignacion.desc()).limit(1).scalar_subquery()
+
+    ultimo_estado = select(ChipEstado.nombre).join(
+        ChipEstadoRelacion, ChipEstadoRelacion.idEstado == ChipEstado.idEstado
+    ).where(
+        ChipEstadoRelacion.idChip == Chip.idChip
+    ).order_by(
+        ChipEstadoRelacion.fecha_inicio.desc(), ChipEstadoRelacion.id.desc()
+    ).limit(1).scalar_subquery()
+
+    consulta = select(
+        Chip.numero,
+        Chip.iccid,
+        Chip.operadora,
+        Chip.tipo_linea,
+        Chip.fecha_adquisicion,
+        Chip.fecha_registro,
+        Chip.fecha_activacion,
+        Chip.estado_actual,
+        Chip.tiene_whatsapp,
+        ultimo_estado.label('ultimo_estado'),
+        celular_actual.label('imei_celular')
+    )
+    if busqueda:
+        consulta = consulta.where(filtro_busqueda('chip', busqueda))
+    return consulta.order_by(Chip.fecha_registro.desc(), Chip.operadora, Chip.numero)
+
+def _consulta_celulares(busqueda=''):
+    chip_actual = select(Chip.numero).join(
+        CelularChip, CelularChip.idChip == Chip.idChip
+    ).where(
+        CelularChip.idCelular == Celular.idCelular,
+        CelularChip.fecha_remocion.is_(None)
+    ).order_by(CelularChip.fecha_asignacion.desc()).limit(1).scalar_subquery()
+
+    consulta = select(
+        Celular.imei,
+        Celular.marca,
+        Celular.modelo,
+        Celular.fecha_adquisicion,
+        Celular.fecha_registro,
+        Celular.estado,
+        chip_actual.label('numero_chip')
+    )
+    if busqueda:
+        consulta = consulta.where(filtro_busqueda('celular', busqueda))
+    return consulta.order_by(Celular.fecha_registro.desc(), Celular.marca, Celular.modelo)
+
+CONSULTAS = {
+    'chip': _consulta_chips,
+    'celular': _consulta_celulares,
+}
+
+def _filas(tipo, busqueda):
+    consulta = CONSULTAS[tipo](busqueda).execution_options(yield_per=FILAS_POR_LOTE)
+    resultado = db.session.execute(consulta)
+    yield list(resultado.keys())
+    for fila in resultado:
+        yield fila
+
+def exportar_csv(tipo, busqueda=''):
+    """Generador de líneas CSV para una respuesta en streaming"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for numero, fila in enumerate(_filas(tipo, busqueda)):
+        escritor.writerow(fila)
+        if numero % 100 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def exportar_xlsx(tipo, busqueda='', destino=None, al_avanzar=None):
+    """Escribe el libro en modo solo-escritura en `destino` (ruta) o en un archivo temporal
+
+    `al_avanzar(filas)` se llama cada FILAS_POR_LOTE filas escritas.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ErrorExportacion('La exportación a XLSX requiere el paquete openpyxl')
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(tipo)
+    for numero, fila in enumerate(_filas(tipo, busqueda)):
+        hoja.append(list(fila))
+        if al_avanzar and numero and numero % FILAS_POR_LOTE == 0:
+            al_avanzar(numero)
+
+    if destino is not None:
+        libro.save(destino)
+        return destino
+    archivo = tempfile.TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,207 @@
+import csv
+import io
+from datetime import date, datetime
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+from modelo import db
+from contadores import registrar_insercion_masiva
+from restricciones import insert_omitiendo_duplicados
+
+# Límite de parámetros por sentencia IN/INSERT para SQLite y tamaño de transacción
+TAMANO_LOTE = 500
+# Filas con error que se conservan en el reporte (el resto solo se cuenta)
+MAX_ERRORES_REPORTE = 5000
+
+class ErrorImportacion(Exception):
+    """Archivo que no se puede leer o no tiene las columnas esperadas"""
+
+class ReporteImportacion:
+    def __init__(self):
+        self.total_filas = 0
+        self.insertados = 0
+        self.total_errores = 0
+        self.errores = []
+
+    def agregar_error(self, fila, mensajes):
+        self.total_errores += 1
+        if len(self.errores) < MAX_ERRORES_REPORTE:
+            self.errores.append({'fila': fila, 'errores': mensajes})
+
+    def como_dict(self):
+        return {
+            'total_filas': self.total_filas,
+            'insertados': self.insertados,
+            'total_errores': self.total_errores,
+            'errores': self.errores,
+        }
+
+def _normalizar_celda(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return str(valor).strip()
+
+def _filas_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = texto.read(4096)
+    texto.seek(0)
+    try:
+        dialecto = csv.Sniffer().sniff(muestra, delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel
+    yield from csv.reader(texto, dialecto)
+
+def _filas_xlsx(archivo):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ErrorImportacion('La importación de archivos XLSX requiere el paquete openpyxl')
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        yield from libro.active.iter_rows(values_only=True)
+    finally:
+        libro.close()
+
+def leer_filas(archivo, nombre_archivo):
+    """Itera el archivo como diccionarios por fila sin cargarlo completo en memoria"""
+    if nombre_archivo.lower().endswith('.xlsx'):
+        filas = _filas_xlsx(archivo)
+    elif nombre_archivo.lower().endswith('.csv'):
+        filas = _filas_csv(archivo)
+    else:
+        raise ErrorImportacion('Formato no soportado: use un archivo .csv o .xlsx')
+
+    encabezado = next(filas, None)
+    if not encabezado:
+        raise ErrorImportacion('El archivo está vacío')
+    columnas = [_normalizar_celda(c).lower() for c in encabezado]
+
+    for fila in filas:
+        valores = [_normalizar_celda(v) for v in fila]
+        if any(valores):
+            yield dict(zip(columnas, valores))
+
+class ImportadorInventario:
+    """Importa filas validándolas con el formulario del modelo e insertándolas por lotes"""
+
+    def __init__(self, modelo, formulario, columnas, campos_unicos, tamano_lote=TAMANO_LOTE,
+                 al_insertar=None):
+        self.modelo = modelo
+        # al_insertar(valores): recibe los valores del primer campo único de las filas
+        # insertadas y corre en la misma transacción que el lote (p. ej. datos derivados)
+        self.al_insertar = al_insertar
+        self.columnas = columnas
+        self.campos_unicos = campos_unicos
+        self.tamano_lote = tamano_lote
+        # Misma validación del formulario; la unicidad se resuelve por lote al insertar
+        self.formulario = formulario
+
+    def importar(self, archivo, nombre_archivo, al_avanzar=None):
+        """Procesa el archivo; `al_avanzar(reporte)` se llama tras cada lote confirmado"""
+        reporte = ReporteImportacion()
+        filas = leer_filas(archivo, nombre_archivo)
+        # Una sola instancia del formulario, reprocesada en cada fila
+        form = self.formulario(formdata=None, meta={'csrf': False})
+        lote = []
+        # La fila 1 es el encabezado
+        for numero_fila, datos in enumerate(filas, start=2):
+            reporte.total_filas += 1
+            faltantes = [c for c in self.columnas if c not in datos]
+            if faltantes:
+                raise ErrorImportacion(f'Faltan columnas: {", ".join(faltantes)}')
+
+            registro = self._validar_fila(form, datos, numero_fila, reporte)
+            if registro is not None:
+                lote.append((numero_fila, registro))
+            if len(lote) >= self.tamano_lote:
+                self._insertar_lote(lote, reporte)
+                lote = []
+                if al_avanzar:
+                    al_avanzar(reporte)
+
+        if lote:
+            self._insertar_lote(lote, reporte)
+        return reporte
+
+    def _validar_fila(self, form, datos, numero_fila, reporte):
+        form.process(MultiDict(datos))
+        if not form.validate():
+            mensajes = [f'{campo}: {", ".join(errores)}' for campo, errores in form.errors.items()]
+            reporte.agregar_error(numero_fila, mensajes)
+            return None
+        return {c: getattr(form, c).data for c in self.columnas}
+
+    def _insertar_lote(self, lote, reporte):
+        # Repetidos dentro del lote se detectan aquí; los ya registrados, con la restricción UNIQUE
+        vistos = {campo: set() for campo in self.campos_unicos}
+        candidatos = []
+        for numero_fila, registro in lote:
+            repetidos = [campo for campo in self.campos_unicos if registro[campo] in vistos[campo]]
+            if repetidos:
+                reporte.agregar_error(numero_fila, [f'{campo}: está repetido en el archivo' for campo in repetidos])
+                continue
+            for campo in self.campos_unicos:
+                vistos[campo].add(registro[campo])
+            candidatos.append((numero_fila, registro))
+
+        if not candidatos:
+            return
+        try:
+            insertados = self._insertar_sin_duplicados(candidatos, reporte)
+            if insertados:
+                registrar_insercion_masiva(self.modelo, len(insertados))
+                if self.al_insertar:
+                    self.al_insertar(insertados)
+            db.session.commit()
+            reporte.insertados += len(insertados)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _insertar_sin_duplicados(self, candidatos, reporte):
+        """Inserta el lote en una sentencia que omite las filas ya registradas
+
+        Devuelve los valores del primer campo único de las filas que entraron.
+        """
+        tabla = self.modelo.__table__
+        sentencia = insert_omitiendo_duplicados(tabla)
+        clave = self.campos_unicos[0] if self.campos_unicos else None
+        if sentencia is None or clave is None:
+            candidatos = self._descartar_existentes(candidatos, reporte)
+            if candidatos:
+                db.session.execute(insert(tabla), [registro for _, registro in candidatos])
+            return [registro[clave] if clave else None for _, registro in candidatos]
+
+        insertadas = set(db.session.execute(
+            sentencia.returning(tabla.c[clave]), [registro for _, registro in candidatos]
+        ).scalars())
+        rechazados = [(fila, registro) for fila, registro in candidatos if registro[clave] not in insertadas]
+        if rechazados:
+            # Solo cuando hubo conflictos: qué campo coincidió con un registro existente
+            self._descartar_existentes(rechazados, reporte)
+        return list(insertadas)
+
+    def _descartar_existentes(self, candidatos, reporte):
+        """Reporta las filas cuyos campos únicos ya están registrados y devuelve el resto"""
+        existentes = {}
+        for campo in self.campos_unicos:
+            columna = getattr(self.modelo, campo)
+            valores = {registro[campo] for _, registro in candidatos}
+            existentes[campo] = {
+                v for (v,) in db.session.query(columna).filter(columna.in_(valores))
+            }
+
+        validos = []
+        for numero_fila, registro in candidatos:
+            mensajes = [f'{campo}: ya está registrado'
+                        for campo in self.campos_unicos if registro[campo] in existentes[campo]]
+            if mensajes:
+                reporte.agregar_error(numero_fila, mensajes)
+            else:
+                validos.append((numero_fila, registro))
+        return validos
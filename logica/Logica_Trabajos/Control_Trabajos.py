@@ -0,0 +1,96 @@
+import os
+from flask import (
+    Blueprint,
+    render_template,
+    flash,
+    redirect,
+    url_for,
+    session,
+    abort,
+    jsonify,
+    send_file
+)
+from modelo import db, Trabajo
+from decoradores import requiere_login, obtener_roles_usuario
+from trabajos import gestor_trabajos
+
+# Trabajos más recientes que se muestran en el listado
+LIMITE_LISTADO = 50
+
+class ControlTrabajos:
+    def __init__(self):
+        self.bp = Blueprint('trabajos', __name__, url_prefix='/trabajos')
+        self._registrar_rutas()
+
+    def _registrar_rutas(self):
+        self.bp.route('', endpoint='index')(self.index)
+        self.bp.route('/<int:id>', endpoint='detalle')(self.detalle)
+        self.bp.route('/<int:id>/estado', endpoint='estado')(self.estado)
+        self.bp.route('/<int:id>/cancelar', methods=['POST'], endpoint='cancelar')(self.cancelar)
+        self.bp.route('/<int:id>/descargar', endpoint='descargar')(self.descargar)
+
+    @staticmethod
+    def _es_administrador():
+        return 'Administrador General' in obtener_roles_usuario(session.get('id_usuario'))
+
+    def _obtener_trabajo(self, id):
+        """Cada usuario ve sus trabajos; el administrador, todos"""
+        trabajo = db.session.get(Trabajo, id) or abort(404)
+        if trabajo.idUsuario != session.get('id_usuario') and not self._es_administrador():
+            abort(403)
+        return trabajo
+
+    @requiere_login
+    def index(self):
+        consulta = Trabajo.query
+        if not self._es_administrador():
+            consulta = consulta.filter_by(idUsuario=session.get('id_usuario'))
+        trabajos = consulta.order_by(Trabajo.fecha_creacion.desc()).limit(LIMITE_LISTADO).all()
+        return render_template('trabajos/Trabajos.html', trabajos=trabajos)
+
+    @requiere_login
+    def detalle(self, id):
+        trabajo = self._obtener_trabajo(id)
+        return render_template('trabajos/Detalle_Trabajo.html',
+                            trabajo=trabajo,
+                            resultado=trabajo.datos_resultado)
+
+    @requiere_login
+    def estado(self, id):
+        trabajo = self._obtener_trabajo(id)
+        return jsonify({
+            'id': trabajo.id,
+            'tipo': trabajo.tipo,
+            'estado': trabajo.estado,
+            'progreso': trabajo.progreso,
+            'total': trabajo.total,
+            'porcentaje': trabajo.porcentaje,
+            'mensaje': trabajo.mensaje,
+            'resultado': trabajo.datos_resultado if trabajo.terminado else None,
+            'descarga': url_for('trabajos.descargar', id=trabajo.id) if trabajo.archivo else None,
+        })
+
+    @requiere_login
+    def cancelar(self, id):
+        trabajo = self._obtener_trabajo(id)
+        if gestor_trabajos.cancelar(trabajo):
+            flash('Se solicitó la cancelación del trabajo', 'info')
+        else:
+            flash('El trabajo ya finalizó', 'warning')
+        return redirect(url_for('trabajos.detalle', id=id))
+
+    @requiere_login
+    def descargar(self, id):
+        trabajo = self._obtener_trabajo(id)
+        ruta = os.path.join(gestor_trabajos.directorio, trabajo.archivo or '')
+        if not trabajo.archivo or not os.path.isfile(ruta):
+            flash('El archivo del trabajo ya no está disponible', 'warning')
+            return redirect(url_for('trabajos.detalle', id=id))
+        nombre = trabajo.datos_resultado.get('nombre_descarga', trabajo.archivo)
+        return send_file(ruta, as_attachment=True, download_name=nombre)
+
+# ==================================================
+# INSTANCIA PRINCIPAL
+# ==================================================
+control_trabajos = ControlTrabajos()
+bp_trabajos = control_trabajos.bp
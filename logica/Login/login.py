@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from werkzeug.security import check_password_hash
-from modelo import Usuario
-from decoradores import requiere_login
+from modelo import Usuario, db
+from limite_login import limitador_login
+from contrasenas import verificar_contrasena, necesita_rehash, generar_hash_en_pool, VerificacionSaturada
+from decoradores import requiere_login, obtener_usuario_actual
+from contadores import leer_contadores
 from flask import current_app
 
 bp_login = Blueprint('login', __name__, template_folder='templates')
@@ -12,9 +14,33 @@ def iniciar_sesion():
         usuario = request.form.get('usuario')
         contrasena = request.form.get('contrasena')
         
+        # Antes de cualquier consulta o hash: intentos por IP y por usuario
+        espera = limitador_login.permitir(usuario, request.remote_addr)
+        if espera:
+            current_app.logger.warning(f'Inicio de sesión bloqueado por exceso de intentos para el usuario: {usuario}',
+                                       extra={'ip': request.remote_addr, 'espera_segundos': round(espera)})
+            flash(f'Demasiados intentos. Intente de nuevo en {int(espera) + 1} segundos', 'danger')
+            return render_template('login/login.html'), 429
+        
         usuario_db = Usuario.query.filter_by(username=usuario).first()
         
-        if usuario_db and check_password_hash(usuario_db.password, contrasena):
+        try:
+            valida = usuario_db is not None and verificar_contrasena(usuario_db.password, contrasena)
+        except VerificacionSaturada:
+            current_app.logger.warning(f'Verificación de contraseña rechazada por saturación: {usuario}')
+            flash('Hay muchos inicios de sesión en curso, intente de nuevo en unos segundos', 'warning')
+            return render_template('login/login.html'), 503
+        
+        if valida:
+            # Hashes de algoritmos o costos anteriores se actualizan con la contraseña en claro
+            if necesita_rehash(usuario_db.password):
+                try:
+                    usuario_db.password = generar_hash_en_pool(contrasena)
+                    db.session.commit()
+                except VerificacionSaturada:
+                    pass
+            
+            limitador_login.exito(usuario)
             session['id_usuario'] = usuario_db.idUsuario
             session['usuario'] = usuario_db.username
             session['nombre'] = usuario_db.nombre
@@ -32,7 +58,7 @@ def iniciar_sesion():
 @bp_login.route('/logout', endpoint='logout')
 @requiere_login
 def cerrar_sesion():
-    usuario_actual = Usuario.query.get(session['id_usuario'])
+    usuario_actual = obtener_usuario_actual()
     current_app.logger.info(f"Usuario {usuario_actual.username} cerró sesión")
     session.clear()
     flash('Ha cerrado sesión correctamente', 'info')
@@ -41,9 +67,7 @@ def cerrar_sesion():
 @bp_login.route('/dashboard', endpoint='panel_control')
 @requiere_login
 def panel_control():
-    from modelo import Campania, Celular, Chip
-    
-    usuario_actual = Usuario.query.get(session['id_usuario'])
+    usuario_actual = obtener_usuario_actual()
     current_app.logger.info(f"Usuario {usuario_actual.username} accedió al panel de control")
     
     contexto = {
@@ -51,13 +75,15 @@ def panel_control():
         'roles': session['roles']
     }
     
+    contadores = leer_contadores()
+    
     if any(rol in ['Administrador General', 'Supervisor Operaciones'] for rol in session['roles']):
-        contexto['total_campanias'] = Campania.query.count()
-        contexto['campanias_pendientes'] = Campania.query.filter_by(estado='PENDIENTE').count()
+        contexto['total_campanias'] = contadores.get('campanias', 0)
+        contexto['campanias_pendientes'] = contadores.get('campanias_pendientes', 0)
     
     if any(rol in ['Administrador General', 'Supervisor Historial'] for rol in session['roles']):
-        contexto['total_celulares'] = Celular.query.count()
-        contexto['total_chips'] = Chip.query.count()
+        contexto['total_celulares'] = contadores.get('celulares', 0)
+        contexto['total_chips'] = contadores.get('chips', 0)
     
     return render_template('dashboard.html', **contexto)
 
@@ -66,6 +92,6 @@ def panel_control():
 @bp_login.route('/perfil', endpoint='ver_perfil')
 @requiere_login
 def ver_perfil():
-    usuario = Usuario.query.get(session['id_usuario'])
+    usuario = obtener_usuario_actual()
     current_app.logger.info(f"Usuario {usuario.username} accedió a su perfil")
     return render_template('login/perfil.html', usuario=usuario)
\ No newline at end of file
@@ -0,0 +1,189 @@
+import hmac
+import os
+import threading
+import time
+from flask import Response, abort, g, has_request_context, request, session, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites de los histogramas
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+BUCKETS_BYTES = (1024, 10240, 102400, 1048576, 10485760)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _etiquetas(nombres, valores, extra=None):
+    pares = list(zip(nombres, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares) + '}'
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def sumar(self, valores, cantidad=1):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + cantidad
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} counter']
+        with self._lock:
+            for valores, total in sorted(self._valores.items()):
+                lineas.append(f'{self.nombre}{_etiquetas(self.etiquetas, valores)} {total}')
+        return lineas
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas, buckets):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = etiquetas
+        self.buckets = buckets
+        # {valores_etiqueta: [conteos por bucket..., suma, total]}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valores, medida):
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [0] * (len(self.buckets) + 2)
+            for i, limite in enumerate(self.buckets):
+                if medida <= limite:
+                    serie[i] += 1
+            serie[-2] += medida
+            serie[-1] += 1
+
+    def exponer(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} histogram']
+        with self._lock:
+            for valores, serie in sorted(self._series.items()):
+                for limite, conteo in zip(self.buckets, serie):
+                    lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, ("le", limite))} {conteo}')
+                lineas.append(f'{self.nombre}_bucket{_etiquetas(self.etiquetas, valores, ("le", "+Inf"))} {serie[-1]}')
+                lineas.append(f'{self.nombre}_sum{_etiquetas(self.etiquetas, valores)} {serie[-2]}')
+                lineas.append(f'{self.nombre}_count{_etiquetas(self.etiquetas, valores)} {serie[-1]}')
+        return lineas
+
+class RegistroMetricas:
+    """Métricas por endpoint del proceso actual (cada worker expone las suyas)"""
+
+    def __init__(self):
+        self.peticiones = Contador(
+            'publimes_peticiones_total', 'Peticiones atendidas', ('endpoint', 'metodo', 'estado'))
+        self.latencia = Histograma(
+            'publimes_peticion_segundos', 'Latencia de la petición', ('endpoint',), BUCKETS_LATENCIA)
+        self.consultas = Histograma(
+            'publimes_sql_consultas', 'Sentencias SQL por petición', ('endpoint',), BUCKETS_CONSULTAS)
+        self.tiempo_sql = Contador(
+            'publimes_sql_segundos_total', 'Tiempo total en sentencias SQL', ('endpoint',))
+        self.tiempo_plantillas = Contador(
+            'publimes_plantilla_segundos_total', 'Tiempo total renderizando plantillas', ('endpoint',))
+        self.bytes_respuesta = Histograma(
+            'publimes_respuesta_bytes', 'Tamaño de la respuesta', ('endpoint',), BUCKETS_BYTES)
+
+    def exponer(self):
+        lineas = []
+        for metrica in (self.peticiones, self.latencia, self.consultas,
+                        self.tiempo_sql, self.tiempo_plantillas, self.bytes_respuesta):
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+registro_metricas = RegistroMetricas()
+
+class MedicionPeticion:
+    __slots__ = ('inicio', 'consultas', 'tiempo_sql', 'tiempo_plantillas', 'inicio_plantilla')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_plantillas = 0.0
+        self.inicio_plantilla = []
+
+def _medicion_actual():
+    return g.get('medicion_peticion') if has_request_context() else None
+
+def _antes_de_sentencia(conexion, cursor, sentencia, parametros, contexto, executemany):
+    conexion.info.setdefault('inicio_sentencia', []).append(time.perf_counter())
+
+def _despues_de_sentencia(conexion, cursor, sentencia, parametros, contexto, executemany):
+    pila = conexion.info.get('inicio_sentencia')
+    if not pila:
+        return
+    duracion = time.perf_counter() - pila.pop()
+    medicion = _medicion_actual()
+    if medicion is not None:
+        medicion.consultas += 1
+        medicion.tiempo_sql += duracion
+
+def _antes_de_plantilla(app, template, context, **extra):
+    medicion = _medicion_actual()
+    if medicion is not None:
+        medicion.inicio_plantilla.append(time.perf_counter())
+
+def _despues_de_plantilla(app, template, context, **extra):
+    medicion = _medicion_actual()
+    if medicion is not None and medicion.inicio_plantilla:
+        medicion.tiempo_plantillas += time.perf_counter() - medicion.inicio_plantilla.pop()
+
+def _autorizado(app):
+    token = app.config.get('METRICAS_TOKEN')
+    cabecera = request.headers.get('Authorization', '')
+    if token and cabecera.startswith('Bearer '):
+        return hmac.compare_digest(cabecera[len('Bearer '):].strip().encode(), token.encode())
+    # Sin token: solo un administrador con sesión iniciada
+    from decoradores import obtener_roles_usuario
+    return 'Administrador General' in obtener_roles_usuario(session.get('id_usuario'))
+
+def configurar_metricas(app):
+    """Instrumenta peticiones, SQL y plantillas y expone /metrics (solo si están habilitadas)"""
+    app.config.setdefault('METRICAS_HABILITADAS',
+                          os.environ.get('METRICAS_HABILITADAS', '').lower() in ('1', 'true', 'si', 'sí'))
+    app.config.setdefault('METRICAS_TOKEN', os.environ.get('METRICAS_TOKEN'))
+    if not app.config['METRICAS_HABILITADAS']:
+        # Deshabilitadas no se registra ningún hook: costo cero por petición
+        return
+
+    if not event.contains(Engine, 'before_cursor_execute', _antes_de_sentencia):
+        event.listen(Engine, 'before_cursor_execute', _antes_de_sentencia)
+    if not event.contains(Engine, 'after_cursor_execute', _despues_de_sentencia):
+        event.listen(Engine, 'after_cursor_execute', _despues_de_sentencia)
+    before_render_template.connect(_antes_de_plantilla, app)
+    template_rendered.connect(_despues_de_plantilla, app)
+
+    @app.before_request
+    def _iniciar_medicion():
+        g.medicion_peticion = MedicionPeticion()
+
+    @app.after_request
+    def _registrar_medicion(respuesta):
+        medicion = g.pop('medicion_peticion', None)
+        if medicion is None:
+            return respuesta
+        endpoint = (request.endpoint or 'sin_ruta',)
+        registro_metricas.peticiones.sumar(
+            (endpoint[0], request.method, str(respuesta.status_code)))
+        registro_metricas.latencia.observar(endpoint, time.perf_counter() - medicion.inicio)
+        registro_metricas.consultas.observar(endpoint, medicion.consultas)
+        registro_metricas.tiempo_sql.sumar(endpoint, medicion.tiempo_sql)
+        registro_metricas.tiempo_plantillas.sumar(endpoint, medicion.tiempo_plantillas)
+        tamano = respuesta.calculate_content_length()
+        if tamano is not None:
+            registro_metricas.bytes_respuesta.observar(endpoint, tamano)
+        return respuesta
+
+    def exponer_metricas():
+        if not _autorizado(app):
+            abort(401)
+        return Response(registro_metricas.exponer(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metricas', exponer_metricas)
@@ -1,6 +1,10 @@
+import json
 from extensions import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash
+
+# Súbase al agregar tablas, columnas, índices o datos semilla: el próximo arranque
+# (o `flask init-db`) vuelve a ejecutar init_db una sola vez
+VERSION_ESQUEMA = 5
 
 class Rol(db.Model):
     __tablename__ = 'rol'
@@ -76,11 +80,17 @@ class EnvioCampania(db.Model):
     detalles_chip = db.relationship('DetalleEnvioChip', back_populates='envio')
     resultados = db.relationship('ResultadoEnvio', back_populates='envio')
 
+    __table_args__ = (
+        db.Index('ix_envio_campania_fecha', 'fecha_envio'),
+        db.Index('ix_envio_campania_campania', 'idCampania'),
+    )
+
 class DetalleEnvioChip(db.Model):
     __tablename__ = 'detalle_envio_chip'
     idDetalle = db.Column(db.Integer, primary_key=True)
     idEnvio = db.Column(db.Integer, db.ForeignKey('envio_campania.idEnvio'))
     idChip = db.Column(db.Integer, db.ForeignKey('chip.idChip'))
+    cantidad_asignada = db.Column(db.Integer, default=0)
     cantidad_enviada = db.Column(db.Integer, default=0)
     cantidad_fallida = db.Column(db.Integer, default=0)
     fecha_inicio = db.Column(db.DateTime)
@@ -90,6 +100,12 @@ class DetalleEnvioChip(db.Model):
     envio = db.relationship('EnvioCampania', back_populates='detalles_chip')
     chip = db.relationship('Chip', back_populates='envios')
 
+    # Cubren las agregaciones por envío/chip sin leer la tabla
+    __table_args__ = (
+        db.Index('ix_detalle_envio_chip_envio', 'idEnvio', 'idChip', 'cantidad_enviada', 'cantidad_fallida'),
+        db.Index('ix_detalle_envio_chip_chip', 'idChip'),
+    )
+
 class ResultadoEnvio(db.Model):
     __tablename__ = 'resultado_envio'
     idResultado = db.Column(db.Integer, primary_key=True)
@@ -102,6 +118,30 @@ class ResultadoEnvio(db.Model):
     envio = db.relationship('EnvioCampania', back_populates='resultados')
     usuario = db.relationship('Usuario')
 
+    __table_args__ = (
+        db.Index('ix_resultado_envio_fecha', 'fecha_registro', 'idEnvio', 'enviados', 'fallidos'),
+    )
+
+class EventoIngesta(db.Model):
+    """Claves de idempotencia de los reportes de envío ya aplicados"""
+    __tablename__ = 'evento_ingesta'
+    clave = db.Column(db.String(64), primary_key=True)
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Para la purga por antigüedad (INGESTA_RETENCION_DIAS)
+    __table_args__ = (
+        db.Index('ix_evento_ingesta_fecha', 'fecha_registro'),
+    )
+
+class EventoRechazado(db.Model):
+    """Eventos aceptados por /api/resultados que no se pudieron aplicar (para revisión)"""
+    __tablename__ = 'evento_rechazado'
+    idRechazo = db.Column(db.Integer, primary_key=True)
+    clave = db.Column(db.String(64), index=True)
+    datos = db.Column(db.Text, nullable=False)
+    motivo = db.Column(db.String(500), nullable=False)
+    fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+
 class Celular(db.Model):
     __tablename__ = 'celular'
     idCelular = db.Column(db.Integer, primary_key=True)
@@ -131,7 +171,8 @@ class Chip(db.Model):
     tiene_whatsapp = db.Column(db.Boolean, default=False)
 
     celulares = db.relationship('CelularChip', back_populates='chip')
-    estados = db.relationship('ChipEstadoRelacion', back_populates='chip')
+    estados = db.relationship('ChipEstadoRelacion', back_populates='chip', cascade='all, delete-orphan')
+    estado_vigente = db.relationship('ChipEstadoActual', back_populates='chip', uselist=False, cascade='all, delete-orphan')
     envios = db.relationship('DetalleEnvioChip', back_populates='chip')
     
 class CelularChip(db.Model):
@@ -146,6 +187,12 @@ class CelularChip(db.Model):
     chip = db.relationship('Chip', back_populates='celulares')
     usuario = db.relationship('Usuario')
 
+    # La clave primaria empieza por idCelular: sin este índice, buscar la asignación
+    # vigente de un chip (p. ej. al elegir chips para un envío) recorre toda la tabla
+    __table_args__ = (
+        db.Index('ix_celular_chip_chip', 'idChip', 'fecha_remocion'),
+    )
+
 class ChipEstado(db.Model):
     __tablename__ = 'chip_estado'
     idEstado = db.Column(db.Integer, primary_key=True)
@@ -164,6 +211,24 @@ class ChipEstadoRelacion(db.Model):
     chip = db.relationship('Chip', back_populates='estados')
     estado = db.relationship('ChipEstado', back_populates='chips')
 
+    __table_args__ = (
+        db.Index('ix_chip_estado_relacion_chip_fin', 'idChip', 'fecha_fin'),
+        db.Index('ix_chip_estado_relacion_estado_inicio', 'idEstado', 'fecha_inicio'),
+        # Distribución en una fecha: rangos por fecha_fin (NULL = abierto) sin leer la tabla
+        db.Index('ix_chip_estado_relacion_fin_inicio', 'fecha_fin', 'fecha_inicio', 'idEstado'),
+    )
+
+class ChipEstadoActual(db.Model):
+    """Puntero al intervalo abierto de ChipEstadoRelacion de cada chip"""
+    __tablename__ = 'chip_estado_actual'
+    idChip = db.Column(db.Integer, db.ForeignKey('chip.idChip'), primary_key=True)
+    idEstado = db.Column(db.Integer, db.ForeignKey('chip_estado.idEstado'), nullable=False, index=True)
+    idRelacion = db.Column(db.Integer, db.ForeignKey('chip_estado_relacion.id'), nullable=False)
+    fecha_inicio = db.Column(db.DateTime, nullable=False)
+    
+    chip = db.relationship('Chip', back_populates='estado_vigente')
+    estado = db.relationship('ChipEstado')
+
 class TransferenciaTelefono(db.Model):
     __tablename__ = 'transferencia_telefono'
     idTransferencia = db.Column(db.Integer, primary_key=True)
@@ -176,10 +241,116 @@ class TransferenciaTelefono(db.Model):
     supervisor_historial = db.relationship('Usuario', foreign_keys=[idSupervisorHistorial], back_populates='transferencias_supervisor')
     operador_publimes = db.relationship('Usuario', foreign_keys=[idOperadorPublimes], back_populates='transferencias_origen')
 
+class ContadorResumen(db.Model):
+    __tablename__ = 'contador_resumen'
+    clave = db.Column(db.String(100), primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+class VersionCache(db.Model):
+    """Versión de datos cacheados en memoria por cada proceso (p. ej. roles)
+
+    Quien modifica los datos incrementa la versión; los demás workers la
+    comparan con la suya y descartan su caché local al ver que cambió.
+    """
+    __tablename__ = 'version_cache'
+    clave = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class ResumenEnvio(db.Model):
+    """Enviados/fallidos pre-agregados por grano (hora, día, mes), dimensión y periodo"""
+    __tablename__ = 'resumen_envio'
+    grano = db.Column(db.String(5), primary_key=True)
+    # 'total' (clave vacía), 'campania', 'chip' u 'operadora'
+    dimension = db.Column(db.String(10), primary_key=True)
+    clave = db.Column(db.String(50), primary_key=True)
+    periodo = db.Column(db.DateTime, primary_key=True)
+    enviados = db.Column(db.Integer, nullable=False, default=0)
+    fallidos = db.Column(db.Integer, nullable=False, default=0)
+
+class Trabajo(db.Model):
+    """Tarea en segundo plano (importaciones, exportaciones, cambios masivos)"""
+    __tablename__ = 'trabajo'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    descripcion = db.Column(db.String(200))
+    estado = db.Column(db.String(20), nullable=False, default='PENDIENTE', index=True)
+    parametros = db.Column(db.Text)
+    progreso = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer)
+    mensaje = db.Column(db.String(500))
+    resultado = db.Column(db.Text)
+    archivo = db.Column(db.String(255))
+    cancelar = db.Column(db.Boolean, nullable=False, default=False)
+    # host:pid del proceso que lo ejecuta, para detectar trabajos huérfanos
+    proceso = db.Column(db.String(100))
+    idUsuario = db.Column(db.Integer, db.ForeignKey('usuario.idUsuario', ondelete='SET NULL'))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+
+    usuario = db.relationship('Usuario')
+
+    @property
+    def terminado(self):
+        return self.estado not in ('PENDIENTE', 'EN CURSO')
+
+    @property
+    def porcentaje(self):
+        if not self.total:
+            return 100 if self.estado == 'COMPLETADO' else None
+        return min(100, int(self.progreso * 100 / self.total))
+
+    @property
+    def datos_resultado(self):
+        return json.loads(self.resultado) if self.resultado else {}
+
+class VersionEsquema(db.Model):
+    """Versión de esquema y semillas aplicada por init_db (una sola fila)"""
+    __tablename__ = 'version_esquema'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    fecha_aplicacion = db.Column(db.DateTime, default=datetime.utcnow)
+
+def _agregar_columnas_faltantes():
+    """create_all no altera tablas existentes: agrega las columnas nuevas del modelo"""
+    inspector = db.inspect(db.engine)
+    for tabla in db.metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue
+        existentes = {columna['name'] for columna in inspector.get_columns(tabla.name)}
+        for columna in tabla.columns:
+            if columna.name not in existentes:
+                tipo = columna.type.compile(db.engine.dialect)
+                with db.engine.begin() as conexion:
+                    conexion.exec_driver_sql(
+                        f'ALTER TABLE {tabla.name} ADD COLUMN "{columna.name}" {tipo}'
+                    )
+
 def init_db(app):
-    """Función para inicializar la base de datos"""
+    """Crea tablas e índices, reconstruye derivados vacíos y carga los datos semilla
+
+    Es idempotente pero costosa; en el arranque se usa asegurar_base_datos.
+    """
+    from busqueda import crear_indices_busqueda
+    from contadores import reconstruir_contadores
+    from logica.Logica_Historial.Estados_Historial import reconstruir_estado_actual
+    from logica.Logica_Campanias.Resumen_Envios import reconstruir_resumen
+    from contrasenas import generar_hash
+
     with app.app_context():
         db.create_all()
+        _agregar_columnas_faltantes()
+        # create_all no agrega índices nuevos a tablas ya existentes
+        for tabla in db.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.create(db.engine, checkfirst=True)
+        crear_indices_busqueda()
+        if not ContadorResumen.query.first():
+            reconstruir_contadores()
+        if not ChipEstadoActual.query.first():
+            reconstruir_estado_actual()
+        if not ResumenEnvio.query.first():
+            reconstruir_resumen()
         
         # Crear roles básicos si no existen
         if not Rol.query.first():
@@ -199,7 +370,7 @@ def init_db(app):
             admin = Usuario(
                 nombre='Administrador',
                 username='admin',
-                password=generate_password_hash('admin123', method='sha256'),
+                password=generar_hash('admin123'),
                 activo=True
             )
             db.session.add(admin)
@@ -230,3 +401,29 @@ def init_db(app):
             db.session.add_all(estados)
             db.session.commit()
 
+        if not db.session.get(VersionCache, 'roles'):
+            db.session.add(VersionCache(clave='roles', version=0))
+            db.session.commit()
+
+        # Registrar la versión aplicada para que los próximos arranques no repitan esto
+        registro = db.session.get(VersionEsquema, 1)
+        if registro is None:
+            db.session.add(VersionEsquema(id=1, version=VERSION_ESQUEMA))
+        else:
+            registro.version = VERSION_ESQUEMA
+            registro.fecha_aplicacion = datetime.utcnow()
+        db.session.commit()
+
+def version_aplicada():
+    """Versión registrada por el último init_db, o None si nunca se ejecutó"""
+    if not db.inspect(db.engine).has_table(VersionEsquema.__tablename__):
+        return None
+    return db.session.query(VersionEsquema.version).filter_by(id=1).scalar()
+
+def asegurar_base_datos(app):
+    """Ejecuta init_db solo si la base no está en VERSION_ESQUEMA; devuelve si lo hizo"""
+    with app.app_context():
+        if version_aplicada() == VERSION_ESQUEMA:
+            return False
+    init_db(app)
+    return True
@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+from cache import CacheTTL
+
+# Totales aproximados por listado/filtro: evita un COUNT(*) en cada página
+cache_totales = CacheTTL(maxsize=256, ttl=60)
+
+class ClaveOrden:
+    """Columna de ordenamiento usada como clave de búsqueda (seek)"""
+
+    def __init__(self, expresion, valor, descendente=False):
+        self.expresion = expresion
+        self.valor = valor
+        self.descendente = descendente
+
+class PaginaKeyset:
+    """Página obtenida por cursor; expone la misma interfaz básica que `paginate`"""
+
+    def __init__(self, items, next_cursor, prev_cursor, total):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return {'dt': valor.isoformat()}
+    if isinstance(valor, date):
+        return {'d': valor.isoformat()}
+    return valor
+
+def _deserializar(valor):
+    if isinstance(valor, dict):
+        if 'dt' in valor:
+            return datetime.fromisoformat(valor['dt'])
+        return date.fromisoformat(valor['d'])
+    return valor
+
+def codificar_cursor(valores, avanzar=True):
+    datos = {'a': avanzar, 'k': [_serializar(v) for v in valores]}
+    crudo = json.dumps(datos, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+def decodificar_cursor(cursor):
+    """Devuelve (valores, avanzar) o None si el cursor no es válido"""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return [_deserializar(v) for v in datos['k']], bool(datos['a'])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def _condicion_seek(claves, valores, avanzar):
+    condiciones = []
+    for i, clave in enumerate(claves):
+        iguales = [claves[j].expresion == valores[j] for j in range(i)]
+        if clave.descendente == avanzar:
+            comparacion = clave.expresion < valores[i]
+        else:
+            comparacion = clave.expresion > valores[i]
+        condiciones.append(and_(*iguales, comparacion))
+    return or_(*condiciones)
+
+def contar_cacheado(clave, query):
+    """Total aproximado del listado, recalculado como máximo una vez por TTL"""
+    return cache_totales.obtener_o_calcular(clave, lambda: query.order_by(None).count())
+
+def paginar_keyset(query, claves, cursor=None, per_page=10, clave_total=None):
+    """Pagina `query` por las `claves` dadas sin OFFSET: cada página cuesta lo mismo"""
+    avanzar = True
+    decodificado = decodificar_cursor(cursor) if cursor else None
+    consulta = query
+    if decodificado and len(decodificado[0]) == len(claves):
+        valores, avanzar = decodificado
+        consulta = consulta.filter(_condicion_seek(claves, valores, avanzar))
+    else:
+        decodificado = None
+
+    orden = []
+    for clave in claves:
+        descendente = clave.descendente == avanzar
+        orden.append(clave.expresion.desc() if descendente else clave.expresion.asc())
+
+    filas = consulta.order_by(*orden).limit(per_page + 1).all()
+    hay_mas = len(filas) > per_page
+    items = filas[:per_page]
+    if not avanzar:
+        items.reverse()
+
+    def cursor_de(item, hacia_adelante):
+        return codificar_cursor([clave.valor(item) for clave in claves], hacia_adelante)
+
+    if avanzar:
+        tiene_siguiente = hay_mas
+        tiene_anterior = decodificado is not None
+    else:
+        tiene_siguiente = True
+        tiene_anterior = hay_mas
+
+    next_cursor = cursor_de(items[-1], True) if items and tiene_siguiente else None
+    prev_cursor = cursor_de(items[0], False) if items and tiene_anterior else None
+
+    total = contar_cacheado(clave_total, query) if clave_total is not None else None
+    return PaginaKeyset(items, next_cursor, prev_cursor, total)
@@ -0,0 +1,63 @@
+import re
+from sqlalchemy import inspect, select
+from extensions import db
+
+# Formato del mensaje de cada motor al violar una restricción UNIQUE
+_SQLITE = re.compile(r'UNIQUE constraint failed: ([^\n]+)')
+_POSTGRES = re.compile(r'Key \((.+?)\)=')
+_MYSQL = re.compile(r"Duplicate entry .* for key '(?:\w+\.)?(\w+)'")
+
+def columnas_unicas_violadas(error):
+    """Columnas cuya restricción UNIQUE provocó el IntegrityError (vacío si fue otra restricción)"""
+    mensaje = str(getattr(error, 'orig', error))
+    coincidencia = _SQLITE.search(mensaje)
+    if coincidencia:
+        # "tabla.columna" o, para índices compuestos, "tabla.a, tabla.b"
+        return [parte.strip().rsplit('.', 1)[-1] for parte in coincidencia.group(1).split(',')]
+    coincidencia = _POSTGRES.search(mensaje)
+    if coincidencia:
+        return [parte.strip().strip('"') for parte in coincidencia.group(1).split(',')]
+    coincidencia = _MYSQL.search(mensaje)
+    if coincidencia:
+        return [coincidencia.group(1)]
+    return []
+
+def _otros_duplicados(modelo, form, columnas, id_actual):
+    """Columnas de `columnas` cuyo valor del formulario ya usa otra fila de `modelo`"""
+    clave = inspect(modelo).primary_key[0]
+    duplicadas = []
+    for columna in columnas:
+        consulta = select(clave).where(getattr(modelo, columna) == getattr(form, columna).data)
+        if id_actual is not None:
+            consulta = consulta.where(clave != id_actual)
+        if db.session.execute(consulta.limit(1)).first() is not None:
+            duplicadas.append(columna)
+    return duplicadas
+
+def errores_de_unicidad(error, form, mensajes, modelo=None, id_actual=None):
+    """Agrega a los campos del formulario los mensajes {columna: texto} de las columnas violadas
+
+    SQLite informa solo la primera restricción UNIQUE que falla: con `modelo`
+    (e `id_actual` al editar) se consultan también las demás columnas de
+    `mensajes`, para mostrar todos los duplicados de una vez. Devuelve False si
+    el error no corresponde a ninguna de esas columnas, para que el llamador lo
+    trate como un error general.
+    """
+    campos = [columna for columna in columnas_unicas_violadas(error) if columna in mensajes]
+    if campos and modelo is not None:
+        campos += _otros_duplicados(modelo, form, [c for c in mensajes if c not in campos], id_actual)
+    for columna in campos:
+        campo = getattr(form, columna)
+        campo.errors = list(campo.errors) + [mensajes[columna]]
+    return bool(campos)
+
+def insert_omitiendo_duplicados(tabla):
+    """INSERT ... ON CONFLICT DO NOTHING, o None si el motor no lo soporta"""
+    dialecto = db.engine.dialect.name
+    if dialecto == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    elif dialecto == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        return None
+    return insert_dialecto(tabla).on_conflict_do_nothing()
@@ -0,0 +1,89 @@
+import re
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app import create_app
+from extensions import db
+
+def configuracion_prueba(tmp_path, **extra):
+    """Configuración con base, logs y archivos en un directorio temporal"""
+    return {
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "publimes.db"}',
+        'LOG_DIR': str(tmp_path / 'logs'),
+        'LOG_ACCESO': False,
+        'CONSULTA_LENTA_MS': 0,
+        'TRABAJOS_DIR': str(tmp_path / 'trabajos'),
+        # Hash barato: las pruebas no miden el costo de la política
+        'CONTRASENA_COSTO': 1000,
+        **extra,
+    }
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplicación con una base SQLite propia en un directorio temporal"""
+    # La URI del entorno tiene prioridad en configurar_base_datos
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    app = create_app(configuracion_prueba(tmp_path))
+    yield app
+    # Las cachés son del proceso y sobreviven a la base temporal de cada prueba
+    from decoradores import cache_roles, cache_catalogo_roles, cache_version_roles
+    from paginacion import cache_totales
+    for cache in (cache_roles, cache_catalogo_roles, cache_version_roles, cache_totales):
+        cache.limpiar()
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+@pytest.fixture
+def cliente_admin(cliente):
+    respuesta = cliente.post('/', data={'usuario': 'admin', 'contrasena': 'admin123'})
+    assert respuesta.status_code == 302
+    return cliente
+
+class ContadorConsultas:
+    """Sentencias SQL ejecutadas mientras el contador está activo"""
+
+    def __init__(self):
+        self.sentencias = []
+
+    def __len__(self):
+        return len(self.sentencias)
+
+    def que_coinciden(self, patron):
+        expresion = re.compile(patron, re.IGNORECASE | re.DOTALL)
+        return [sentencia for sentencia in self.sentencias if expresion.search(sentencia)]
+
+@contextmanager
+def contar_consultas(app):
+    contador = ContadorConsultas()
+
+    def registrar(conexion, cursor, sentencia, parametros, contexto, executemany):
+        contador.sentencias.append(sentencia)
+
+    with app.app_context():
+        motor = db.engine
+    event.listen(motor, 'before_cursor_execute', registrar)
+    try:
+        yield contador
+    finally:
+        event.remove(motor, 'before_cursor_execute', registrar)
+
+def crear_chips(cantidad, operadora='CLARO', inicio=0):
+    """Inserta `cantidad` chips con números e ICCID correlativos; devuelve sus ids"""
+    from datetime import date
+    from modelo import Chip
+    hoy = date.today()
+    chips = [
+        Chip(numero=f'9{inicio + i:08d}', iccid=f'8951{inicio + i:015d}', operadora=operadora,
+             fecha_adquisicion=hoy, fecha_registro=hoy, fecha_activacion=hoy)
+        for i in range(cantidad)
+    ]
+    db.session.add_all(chips)
+    db.session.commit()
+    return [chip.idChip for chip in chips]
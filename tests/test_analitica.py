@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from conftest import crear_chips
+from extensions import db
+from modelo import Campania, Cliente, EnvioCampania
+from logica.Logica_Campanias import Analitica_Envios
+from logica.Logica_Campanias.Analitica_Envios import (
+    DIMENSIONES, cache_analitica, invalidar_analitica, rendimiento, totales
+)
+from logica.Logica_Campanias.Ingesta_Resultados import buffer_resultados
+
+@pytest.fixture
+def datos(app):
+    with app.app_context():
+        ids_chip = crear_chips(6)
+        cliente = Cliente(nombreCliente='Cliente A')
+        db.session.add(cliente)
+        db.session.flush()
+        campanias = [Campania(nombre=f'Campaña {i}', idCliente=cliente.idCliente) for i in range(2)]
+        db.session.add_all(campanias)
+        db.session.flush()
+        envios = [EnvioCampania(idCampania=campanias[0].idCampania, idUsuario=1),
+                  EnvioCampania(idCampania=campanias[1].idCampania, idUsuario=1),
+                  EnvioCampania(idCampania=None, idUsuario=1)]
+        db.session.add_all(envios)
+        db.session.commit()
+        eventos = [
+            {'clave': f'e{i}', 'idEnvio': envios[i % 3].idEnvio, 'idChip': ids_chip[i % 6],
+             'idUsuario': 1, 'enviados': i + 1, 'fallidos': i % 2}
+            for i in range(30)
+        ]
+        buffer_resultados._escribir(eventos)
+    yield
+
+def _por_clave(filas):
+    return {fila.clave: (fila.etiqueta, fila.enviados, fila.fallidos) for fila in filas}
+
+def _rangos():
+    hoy = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [(None, None), (hoy, hoy + timedelta(days=1)), (hoy - timedelta(days=40), None),
+            (None, hoy), (hoy.replace(day=1), hoy + timedelta(days=1))]
+
+@pytest.mark.parametrize('dimension', ['chip', 'operadora', 'campania', 'cliente'])
+def test_resumen_coincide_con_el_detalle(app, datos, dimension):
+    _, consulta = DIMENSIONES[dimension]
+    with app.app_context():
+        for desde, hasta in _rangos():
+            esperado = _por_clave(Analitica_Envios._ordenar(consulta(desde, hasta), 200))
+            assert _por_clave(rendimiento(dimension, desde, hasta)) == esperado
+
+def test_totales_desde_el_resumen(app, datos):
+    with app.app_context():
+        total = totales()
+        assert (total.enviados, total.fallidos) == (sum(range(1, 31)), 15)
+        assert len(cache_analitica) == 0
+
+def test_rangos_resumidos_no_usan_la_cache(app, datos):
+    with app.app_context():
+        rendimiento('campania')
+        rendimiento('operador')
+        assert [clave[0:4] for clave in cache_analitica._datos] == [('rendimiento', None, None, 'operador')]
+
+def test_invalidacion_solo_de_rangos_afectados(app, datos):
+    ayer = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    with app.app_context():
+        cache_analitica.limpiar()
+        rendimiento('operador', ayer - timedelta(days=7), ayer)
+        rendimiento('operador', ayer - timedelta(days=7), None)
+        invalidar_analitica(ayer + timedelta(hours=12))
+        claves = list(cache_analitica._datos)
+        assert ('rendimiento', ayer - timedelta(days=7), ayer, 'operador', 200) in claves
+        assert ('rendimiento', ayer - timedelta(days=7), None, 'operador', 200) not in claves
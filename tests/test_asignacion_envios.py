@@ -0,0 +1,38 @@
+from datetime import date, datetime
+from conftest import crear_chips
+from extensions import db
+from modelo import Celular, CelularChip, Chip, DetalleEnvioChip, EnvioCampania
+from logica.Logica_Campanias.Asignacion_Envios import asignar_envio, repartir
+
+def test_repartir_respeta_capacidad_y_descarta_chips_con_fallos():
+    chips = [(1, 0, 100, 0), (2, 900, 100, 0), (3, 0, 10, 90), (4, 1000, 0, 0)]
+    asignaciones = repartir(1500, chips, capacidad=1000)
+    assert asignaciones == {1: 1000, 2: 100}
+
+def test_repartir_equilibra_la_carga():
+    asignaciones = repartir(10000, [(i, 0, 0, 0) for i in range(1, 101)])
+    assert sum(asignaciones.values()) == 10000
+    assert max(asignaciones.values()) - min(asignaciones.values()) <= 25
+
+def test_asignar_envio_solo_usa_chips_habilitados_con_celular(app):
+    with app.app_context():
+        ids = crear_chips(4)
+        hoy = date.today()
+        celulares = [Celular(imei=f'35{i:013d}', fecha_adquisicion=hoy, fecha_registro=hoy) for i in range(3)]
+        db.session.add_all(celulares)
+        db.session.flush()
+        db.session.add_all([
+            CelularChip(idCelular=celulares[0].idCelular, idChip=ids[0]),
+            CelularChip(idCelular=celulares[1].idCelular, idChip=ids[1]),
+            # Retirado del celular: no cuenta
+            CelularChip(idCelular=celulares[2].idCelular, idChip=ids[2], fecha_remocion=datetime.utcnow()),
+        ])
+        db.session.get(Chip, ids[1]).estado_actual = 'BLOQUEADO'
+        envio = EnvioCampania(cantidad_programada=1500)
+        db.session.add(envio)
+        db.session.commit()
+
+        resultado = asignar_envio(envio.idEnvio)
+        detalles = {d.idChip: d.cantidad_asignada for d in DetalleEnvioChip.query.filter_by(idEnvio=envio.idEnvio)}
+        assert detalles == {ids[0]: 1000}
+        assert (resultado.asignado, resultado.faltante) == (1000, 500)
@@ -0,0 +1,54 @@
+import threading
+import time
+from datetime import date
+from extensions import db
+from modelo import Celular, Chip
+
+HILOS = 16
+REGISTROS_POR_HILO = 40
+
+def test_pragmas_sqlite_en_cada_conexion(app):
+    with app.app_context():
+        conexion = db.session.connection()
+        pragma = lambda nombre: conexion.exec_driver_sql(f'PRAGMA {nombre}').scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('foreign_keys') == 1
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT_MS']
+
+def test_escritores_concurrentes_sin_bloqueos(app, record_property):
+    errores = []
+    hoy = date.today()
+    barrera = threading.Barrier(HILOS)
+
+    def escribir(hilo):
+        with app.app_context():
+            barrera.wait()
+            for i in range(REGISTROS_POR_HILO):
+                n = hilo * REGISTROS_POR_HILO + i
+                try:
+                    # Un commit por registro: el caso de varios usuarios cargando a mano
+                    if i % 2:
+                        db.session.add(Chip(numero=f'9{n:08d}', iccid=f'8951{n:015d}', operadora='CLARO',
+                                            fecha_adquisicion=hoy, fecha_registro=hoy, fecha_activacion=hoy))
+                    else:
+                        db.session.add(Celular(imei=f'35{n:013d}', fecha_adquisicion=hoy, fecha_registro=hoy))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    errores.append(repr(e))
+            db.session.remove()
+
+    hilos = [threading.Thread(target=escribir, args=(h,)) for h in range(HILOS)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    segundos = time.perf_counter() - inicio
+
+    total = HILOS * REGISTROS_POR_HILO
+    record_property('escrituras_por_segundo', round(total / segundos, 1))
+    assert errores == []
+    with app.app_context():
+        assert Chip.query.count() + Celular.query.count() == total
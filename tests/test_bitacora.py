@@ -0,0 +1,28 @@
+import json
+import logging
+import os
+from logging.handlers import RotatingFileHandler, WatchedFileHandler
+from bitacora import FormateadorJSON, abrir_archivo_log
+
+def test_rotacion_externa_reabre_el_archivo_movido(app, tmp_path):
+    app.config['LOG_ROTACION'] = 'externa'
+    ruta = str(tmp_path / 'externa' / 'app.log')
+    manejador = abrir_archivo_log(app, ruta, 1024, 1)
+    assert isinstance(manejador, WatchedFileHandler)
+    manejador.setFormatter(FormateadorJSON())
+    registro = lambda mensaje: logging.makeLogRecord({'msg': mensaje, 'levelno': logging.INFO, 'levelname': 'INFO'})
+    try:
+        manejador.emit(registro('antes'))
+        # Lo que hace logrotate sin copytruncate
+        os.rename(ruta, ruta + '.1')
+        manejador.emit(registro('despues'))
+    finally:
+        manejador.close()
+    leer = lambda archivo: [json.loads(linea)['mensaje'] for linea in open(archivo, encoding='utf-8')]
+    assert leer(ruta + '.1') == ['antes']
+    assert leer(ruta) == ['despues']
+
+def test_rotacion_por_tamano_por_defecto(app, tmp_path):
+    manejador = abrir_archivo_log(app, str(tmp_path / 'app.log'), 1024, 1)
+    manejador.close()
+    assert isinstance(manejador, RotatingFileHandler)
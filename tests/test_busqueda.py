@@ -0,0 +1,45 @@
+from conftest import contar_consultas, crear_chips
+from extensions import db
+from modelo import Chip
+from busqueda import filtro_busqueda
+
+def _buscar(termino):
+    return sorted(chip.numero for chip in Chip.query.filter(filtro_busqueda('chip', termino)))
+
+def test_terminos_de_tres_o_mas_caracteres_usan_fts(app):
+    with app.app_context():
+        crear_chips(3, operadora='CLARO')
+        crear_chips(2, operadora='CNT', inicio=3)
+        with contar_consultas(app) as consultas:
+            assert _buscar('00002') == ['900000002']
+            # Trigramas: coincide en cualquier parte de la columna, sin distinguir mayúsculas
+            assert _buscar('lar') == ['900000000', '900000001', '900000002']
+            assert _buscar('"cnt') == []
+        assert len(consultas.que_coinciden(r'chip_fts MATCH')) == 3
+
+def test_terminos_cortos_usan_like(app):
+    with app.app_context():
+        crear_chips(3, operadora='CLARO')
+        crear_chips(2, operadora='CNT', inicio=3)
+        with contar_consultas(app) as consultas:
+            assert _buscar(' CN ') == ['900000003', '900000004']
+            assert _buscar('4') == ['900000004']
+        assert consultas.que_coinciden(r'MATCH') == []
+        assert len(consultas.que_coinciden(r'LIKE')) == 2
+
+def test_triggers_mantienen_el_indice(app):
+    with app.app_context():
+        crear_chips(3)
+        chip = db.session.get(Chip, 1)
+        chip.numero = '593911111111'
+        db.session.commit()
+        assert _buscar('900000000') == []
+        assert _buscar('911111') == ['593911111111']
+
+        db.session.delete(db.session.get(Chip, 2))
+        db.session.commit()
+        assert _buscar('900000001') == []
+        # Sentencias fuera del ORM también pasan por los triggers
+        db.session.execute(Chip.__table__.update().where(Chip.idChip == 3).values(operadora='TUENTI'))
+        db.session.commit()
+        assert _buscar('tuenti') == ['900000002']
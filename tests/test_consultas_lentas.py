@@ -0,0 +1,21 @@
+import json
+import consultas_lentas
+
+def _log_con(tmp_path, monkeypatch, cantidad):
+    ruta = tmp_path / 'consultas_lentas.log'
+    ruta.write_text(''.join(json.dumps({'sentencia': f'SELECT {n}', 'duracion_ms': n}) + '\n'
+                            for n in range(cantidad)), encoding='utf-8')
+    monkeypatch.setattr(consultas_lentas, '_archivo', str(ruta))
+
+def test_limite_fuera_de_rango_se_acota(tmp_path, monkeypatch):
+    _log_con(tmp_path, monkeypatch, 5)
+    assert [r['duracion_ms'] for r in consultas_lentas.leer_consultas_lentas(-1)] == [4]
+    assert len(consultas_lentas.leer_consultas_lentas(0)) == 1
+    assert len(consultas_lentas.leer_consultas_lentas(10 ** 9)) == 5
+
+def test_pagina_con_limite_negativo(cliente_admin, tmp_path, monkeypatch):
+    _log_con(tmp_path, monkeypatch, 3)
+    respuesta = cliente_admin.get('/admin/consultas-lentas?limite=-1')
+    assert respuesta.status_code == 200
+    assert b'SELECT 2' in respuesta.data
+    assert b'SELECT 1' not in respuesta.data
@@ -0,0 +1,115 @@
+import logging
+from datetime import date, datetime
+import pytest
+from conftest import crear_chips
+from extensions import db
+from modelo import (
+    Campania,
+    Celular,
+    CelularChip,
+    ChipEstado,
+    Cliente,
+    DetalleEnvioChip,
+    EnvioCampania,
+    Rol,
+    Trabajo,
+    Usuario,
+    UsuarioRol
+)
+from consultas_repetidas import ConsultasRepetidas, normalizar_sql, vigilar_consultas
+
+# Más filas que el umbral en cada listado, para que un N+1 se note
+FILAS = 12
+
+PAGINAS = [
+    '/dashboard', '/perfil', '/admin/usuarios', '/admin/roles', '/admin/consultas-lentas',
+    '/historial', '/historial/chips', '/historial/celulares', '/historial/estados',
+    '/historial/estados/transicion', '/historial/importar', '/trabajos',
+    '/campanias/analitica',
+]
+
+def _poblar():
+    hoy = date.today()
+    roles = Rol.query.all()
+    for i in range(FILAS):
+        usuario = Usuario(nombre=f'Usuario {i}', username=f'usuario{i}', password='x')
+        db.session.add(usuario)
+        db.session.flush()
+        db.session.add_all(UsuarioRol(idUsuario=usuario.idUsuario, idRol=rol.idRol) for rol in roles[:2])
+        cliente = Cliente(nombreCliente=f'Cliente {i}', idOperadorPublimes=usuario.idUsuario)
+        db.session.add(cliente)
+        db.session.flush()
+        campania = Campania(nombre=f'Campaña {i}', idCliente=cliente.idCliente)
+        db.session.add(campania)
+        db.session.flush()
+        db.session.add(EnvioCampania(idCampania=campania.idCampania, idUsuario=usuario.idUsuario,
+                                     cantidad_programada=10))
+        db.session.add(Trabajo(tipo='exportar', descripcion=f'Trabajo {i}', idUsuario=usuario.idUsuario,
+                               estado='COMPLETADO'))
+    db.session.commit()
+
+    ids_chip = crear_chips(FILAS)
+    for i, id_chip in enumerate(ids_chip):
+        celular = Celular(imei=f'35{i:013d}', marca='Marca', modelo='Modelo',
+                          fecha_adquisicion=hoy, fecha_registro=hoy)
+        db.session.add(celular)
+        db.session.flush()
+        db.session.add(CelularChip(idCelular=celular.idCelular, idChip=id_chip))
+        db.session.add(DetalleEnvioChip(idEnvio=1 + i % FILAS, idChip=id_chip, cantidad_enviada=5,
+                                        fecha_inicio=datetime.utcnow()))
+    db.session.commit()
+
+    from logica.Logica_Historial.Estados_Historial import transicion_masiva
+    transicion_masiva(ChipEstado.query.filter_by(nombre='BLOQUEADO').first(),
+                      numeros=[f'9{i:08d}' for i in range(FILAS // 2)])
+
+def test_normalizar_colapsa_listas_in_y_literales():
+    assert normalizar_sql("SELECT * FROM chip WHERE idChip IN (?, ?, ?) AND numero = 'abc'") == \
+        normalizar_sql("SELECT * FROM chip  WHERE idChip IN (?)\n AND numero = 'x''y'") == \
+        'SELECT * FROM chip WHERE idChip IN (?) AND numero = ?'
+    assert normalizar_sql('SELECT 1 FROM t LIMIT 20 OFFSET 40') == 'SELECT ? FROM t LIMIT ? OFFSET ?'
+    assert normalizar_sql('SELECT * FROM t WHERE a IN (%(a_1)s, %(a_2)s)') == 'SELECT * FROM t WHERE a IN (?)'
+
+def test_vigilar_consultas_indica_el_origen(app):
+    with app.app_context():
+        crear_chips(3)
+        with pytest.raises(ConsultasRepetidas) as error:
+            with vigilar_consultas(umbral=2):
+                for id_chip in (1, 2, 3):
+                    db.session.execute(db.text(f'SELECT numero FROM chip WHERE idChip = {id_chip}'))
+        assert '3x desde tests/test_consultas_repetidas.py:' in str(error.value)
+        # Hasta el umbral no hay error
+        with vigilar_consultas(umbral=3):
+            for id_chip in (1, 2, 3):
+                db.session.execute(db.text(f'SELECT numero FROM chip WHERE idChip = {id_chip}'))
+
+@pytest.fixture
+def vista_n1(app):
+    """Vista que carga los roles de cada usuario con una consulta por usuario"""
+    def usuarios_con_roles():
+        return ','.join(
+            f'{usuario.username}:{len(usuario.roles)}' for usuario in Usuario.query.order_by(Usuario.idUsuario)
+        )
+    app.add_url_rule('/prueba/n1', 'prueba_n1', usuarios_con_roles)
+    with app.app_context():
+        db.session.add_all(Usuario(nombre=f'U{i}', username=f'u{i}', password='x') for i in range(FILAS))
+        db.session.commit()
+    return app.test_client()
+
+def test_vista_n1_falla_en_modo_fallar(app, vista_n1):
+    assert app.config.get('N1_MODO') is None  # por defecto con TESTING
+    with pytest.raises(ConsultasRepetidas, match='prueba_n1'):
+        vista_n1.get('/prueba/n1')
+
+def test_vista_n1_solo_advierte_en_modo_advertir(app, vista_n1, caplog):
+    app.config['N1_MODO'] = 'advertir'
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        respuesta = vista_n1.get('/prueba/n1')
+    assert respuesta.status_code == 200
+    assert any('Posible N+1 en prueba_n1' in registro.getMessage() for registro in caplog.records)
+
+@pytest.mark.parametrize('pagina', PAGINAS)
+def test_paginas_sin_consultas_repetidas(app, cliente_admin, pagina):
+    with app.app_context():
+        _poblar()
+    assert cliente_admin.get(pagina).status_code == 200
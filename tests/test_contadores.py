@@ -0,0 +1,52 @@
+from datetime import date
+from conftest import contar_consultas, crear_chips
+from extensions import db
+from modelo import Chip, ChipEstado
+from contadores import ajustar_contadores, leer_contadores, reconstruir_contadores
+from logica.Logica_Historial.Estados_Historial import cambiar_estado_chip, transicion_masiva
+
+def _estado(nombre):
+    return ChipEstado.query.filter_by(nombre=nombre).one()
+
+def _sin_ceros(valores):
+    return {clave: valor for clave, valor in valores.items() if valor}
+
+def _coinciden_con_las_tablas():
+    mantenidos = _sin_ceros(leer_contadores())
+    assert mantenidos == _sin_ceros(reconstruir_contadores())
+    return mantenidos
+
+def test_contadores_tras_insertar_cambiar_estado_y_transicion_masiva(app):
+    with app.app_context():
+        reconstruir_contadores()
+        hoy = date.today()
+        chip = Chip(numero='593900000001', iccid='895930000000000001', operadora='Claro',
+                    fecha_adquisicion=hoy, fecha_registro=hoy, fecha_activacion=hoy)
+        db.session.add(chip)
+        cambiar_estado_chip(chip, _estado('ACTIVO'))
+        db.session.commit()
+        assert _coinciden_con_las_tablas()['chips'] == 1
+
+        cambiar_estado_chip(chip, _estado('SUSPENDIDO'))
+        db.session.commit()
+        _coinciden_con_las_tablas()
+
+        crear_chips(4)
+        for otro in Chip.query.filter(Chip.numero.like('9%')):
+            cambiar_estado_chip(otro, _estado('ACTIVO'))
+        db.session.commit()
+        transicion_masiva(_estado('BLOQUEADO'), busqueda='9000')
+        transicion_masiva(_estado('BLOQUEADO'), numeros=['593900000001'])
+        contadores = _coinciden_con_las_tablas()
+        assert contadores['chips'] == 5
+
+def test_clave_nueva_se_crea_y_suma_en_una_sentencia(app):
+    with app.app_context():
+        with contar_consultas(app) as consultas:
+            ajustar_contadores({'prueba': 2, 'sin_cambio': 0})
+            ajustar_contadores({'prueba': 3})
+        db.session.commit()
+        assert leer_contadores()['prueba'] == 5
+        assert 'sin_cambio' not in leer_contadores()
+        assert len(consultas.que_coinciden(r'ON CONFLICT')) == 2
+        assert consultas.que_coinciden(r'^\s*UPDATE') == []
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+from conftest import crear_chips
+from extensions import db
+from modelo import Chip, ChipEstado, ChipEstadoActual
+from contadores import clave_estado, leer_contadores
+from logica.Logica_Historial.Estados_Historial import (
+    chips_que_entraron,
+    distribucion_estados_en,
+    inicializar_estados_pendientes,
+    reconstruir_estado_actual,
+    transicion_masiva
+)
+
+T0 = datetime(2024, 1, 1)
+T1 = T0 + timedelta(days=10)
+T2 = T0 + timedelta(days=20)
+
+def _id_estado(nombre):
+    return ChipEstado.query.filter_by(nombre=nombre).one().idEstado
+
+def _historial():
+    """3 chips ACTIVO desde T0; dos pasan a BLOQUEADO en T1 y uno de ellos a SUSPENDIDO en T2"""
+    crear_chips(3)
+    inicializar_estados_pendientes(T0)
+    db.session.commit()
+    transicion_masiva(ChipEstado.query.filter_by(nombre='BLOQUEADO').one(),
+                      numeros=['900000000', '900000001'], fecha=T1)
+    transicion_masiva(ChipEstado.query.filter_by(nombre='SUSPENDIDO').one(),
+                      numeros=['900000000'], fecha=T2)
+
+def _distribucion(fecha):
+    return {nombre: chips for nombre, chips in distribucion_estados_en(fecha) if chips}
+
+def test_distribucion_entre_transiciones(app):
+    with app.app_context():
+        _historial()
+        assert _distribucion(T0 - timedelta(seconds=1)) == {}
+        assert _distribucion(T0 + timedelta(days=5)) == {'ACTIVO': 3}
+        assert _distribucion(T1 + timedelta(days=5)) == {'ACTIVO': 1, 'BLOQUEADO': 2}
+        # El inicio del intervalo es inclusivo y el fin exclusivo
+        assert _distribucion(T2) == {'ACTIVO': 1, 'BLOQUEADO': 1, 'SUSPENDIDO': 1}
+        # Todos los estados aparecen, aunque no tengan chips
+        assert len(distribucion_estados_en(T2)) == ChipEstado.query.count()
+
+def test_chips_que_entraron_en_un_rango(app):
+    with app.app_context():
+        _historial()
+        bloqueado = _id_estado('BLOQUEADO')
+        assert [chip.numero for chip, _ in chips_que_entraron(bloqueado, T0, T2)] == ['900000000', '900000001']
+        assert chips_que_entraron(bloqueado, T0, T1).all() == []
+        assert chips_que_entraron(_id_estado('SUSPENDIDO'), T1, T2 + timedelta(seconds=1)).count() == 1
+
+def test_reconstruir_estado_actual_desde_los_intervalos(app):
+    with app.app_context():
+        _historial()
+        esperado = {fila.idChip: fila.idEstado for fila in ChipEstadoActual.query}
+        # Puntero perdido y estado desnormalizado desincronizado
+        ChipEstadoActual.query.delete()
+        Chip.query.update({'estado_actual': 'PERDIDO'})
+        db.session.commit()
+
+        assert reconstruir_estado_actual() == 0
+        assert {fila.idChip: fila.idEstado for fila in ChipEstadoActual.query} == esperado
+        assert sorted(chip.estado_actual for chip in Chip.query) == ['ACTIVO', 'BLOQUEADO', 'SUSPENDIDO']
+        contadores = leer_contadores()
+        assert contadores[clave_estado(_id_estado('BLOQUEADO'))] == 1
+        assert contadores.get(clave_estado(_id_estado('PERDIDO')), 0) == 0
@@ -0,0 +1,54 @@
+import io
+import pytest
+from conftest import crear_chips
+from contadores import clave_estado, leer_contadores
+from modelo import Chip, ChipEstado, ChipEstadoActual, ChipEstadoRelacion
+from trabajos import TrabajoCancelado
+from logica.Logica_Historial.Control_Historial import ControlImportacion
+
+ENCABEZADO = 'numero,iccid,operadora,tipo_linea,fecha_adquisicion,fecha_registro,fecha_activacion\n'
+
+def _fila(n, iccid=None):
+    return f'5939{n:08d},{iccid or f"895930{n:013d}"},Claro,Prepago,2024-01-01,2024-01-02,2024-01-03\n'
+
+def _importador(tamano_lote=3):
+    importador = ControlImportacion.IMPORTADORES['chip']()
+    importador.tamano_lote = tamano_lote
+    return importador
+
+def _archivo(filas):
+    return io.BytesIO((ENCABEZADO + ''.join(filas)).encode())
+
+def _chips_activos():
+    activo = ChipEstado.query.filter_by(nombre='ACTIVO').one().idEstado
+    return ChipEstadoActual.query.filter_by(idEstado=activo).count(), leer_contadores().get(clave_estado(activo), 0)
+
+def test_importacion_con_duplicados_en_el_archivo_y_en_la_base(app):
+    with app.app_context():
+        crear_chips(1)
+        filas = [_fila(1), _fila(2), _fila(1),            # repetido en el mismo lote
+                 _fila(3, iccid='8951000000000000000'),   # ICCID de un chip ya registrado
+                 _fila(4), _fila(5), _fila(6)]
+        reporte = _importador().importar(_archivo(filas), 'chips.csv')
+
+        assert (reporte.total_filas, reporte.insertados, reporte.total_errores) == (7, 5, 2)
+        assert reporte.errores == [
+            {'fila': 4, 'errores': ['numero: está repetido en el archivo', 'iccid: está repetido en el archivo']},
+            {'fila': 5, 'errores': ['iccid: ya está registrado']},
+        ]
+        importados = Chip.query.filter(Chip.numero.like('5939%')).count()
+        assert importados == 5
+        # Cada chip importado queda con su intervalo abierto y su puntero
+        assert ChipEstadoRelacion.query.filter_by(fecha_fin=None).count() == importados
+        assert _chips_activos() == (importados, importados)
+
+def test_importacion_cancelada_deja_estados_de_los_lotes_confirmados(app):
+    def cancelar(reporte):
+        raise TrabajoCancelado()
+
+    with app.app_context():
+        with pytest.raises(TrabajoCancelado):
+            _importador().importar(_archivo([_fila(n) for n in range(1, 8)]), 'chips.csv', al_avanzar=cancelar)
+        assert Chip.query.count() == 3
+        assert _chips_activos() == (3, 3)
+        assert leer_contadores()['chips'] == 3
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy.exc import IntegrityError
+from conftest import crear_chips
+from extensions import db
+from modelo import DetalleEnvioChip, EnvioCampania, EventoIngesta, EventoRechazado, ResultadoEnvio
+from logica.Logica_Campanias import Ingesta_Resultados
+from logica.Logica_Campanias.Ingesta_Resultados import buffer_resultados, purgar_eventos
+
+TOKEN = 'token-de-prueba'
+
+@pytest.fixture
+def envio(app):
+    app.config['INGESTA_TOKENS'] = [TOKEN]
+    with app.app_context():
+        ids_chip = crear_chips(3)
+        envio = EnvioCampania(cantidad_programada=100)
+        db.session.add(envio)
+        db.session.commit()
+        return envio.idEnvio, ids_chip
+
+def _evento(clave, id_envio, id_chip, enviados=1):
+    return {'clave': clave, 'idEnvio': id_envio, 'idChip': id_chip,
+            'idUsuario': None, 'enviados': enviados, 'fallidos': 0}
+
+def _enviados(id_envio):
+    return db.session.query(db.func.sum(DetalleEnvioChip.cantidad_enviada)).filter_by(idEnvio=id_envio).scalar()
+
+def test_referencia_inexistente_no_descarta_el_lote(app, envio):
+    id_envio, ids_chip = envio
+    lote = [_evento(f'e{i}', id_envio, ids_chip[i % 3]) for i in range(10)]
+    lote.append(_evento('huerfano', id_envio + 99, ids_chip[0]))
+    with app.app_context():
+        buffer_resultados._escribir(lote)
+        assert _enviados(id_envio) == 10
+        rechazado = EventoRechazado.query.one()
+        assert rechazado.clave == 'huerfano'
+        assert 'idEnvio' in rechazado.motivo
+
+def test_claves_ya_aplicadas_se_omiten(app, envio):
+    id_envio, ids_chip = envio
+    with app.app_context():
+        buffer_resultados._escribir([_evento('a', id_envio, ids_chip[0]), _evento('b', id_envio, ids_chip[1])])
+        buffer_resultados._escribir([_evento('a', id_envio, ids_chip[0]), _evento('c', id_envio, ids_chip[1])])
+        assert _enviados(id_envio) == 3
+        assert EventoIngesta.query.count() == 3
+        assert EventoRechazado.query.count() == 0
+
+def test_error_de_un_evento_se_aisla_por_mitades(app, envio, monkeypatch):
+    id_envio, ids_chip = envio
+    original = Ingesta_Resultados.escribir_lote
+
+    def escribir_con_fallo(eventos):
+        if any(evento['clave'] == 'e5' for evento in eventos):
+            raise IntegrityError('INSERT', {}, Exception('fallo simulado'))
+        return original(eventos)
+
+    monkeypatch.setattr(Ingesta_Resultados, 'escribir_lote', escribir_con_fallo)
+    lote = [_evento(f'e{i}', id_envio, ids_chip[i % 3]) for i in range(12)]
+    with app.app_context():
+        buffer_resultados._escribir(lote)
+        assert _enviados(id_envio) == 11
+        assert [r.clave for r in EventoRechazado.query] == ['e5']
+        assert db.session.query(db.func.sum(ResultadoEnvio.enviados)).scalar() == 11
+
+def test_purga_de_claves_vencidas(app, envio):
+    with app.app_context():
+        antigua = datetime.utcnow() - timedelta(days=app.config['INGESTA_RETENCION_DIAS'] + 1)
+        db.session.add_all([EventoIngesta(clave='vieja', fecha_registro=antigua),
+                            EventoIngesta(clave='nueva', fecha_registro=datetime.utcnow())])
+        db.session.commit()
+        assert purgar_eventos() == 1
+        assert [e.clave for e in EventoIngesta.query] == ['nueva']
+
+def test_token_no_ascii_es_rechazado(cliente, envio):
+    respuesta = cliente.post('/api/resultados', json={},
+                             headers={'Authorization': 'Bearer contraseña'.encode().decode('latin-1')})
+    assert respuesta.status_code == 401
+
+def test_identificador_fuera_de_rango_responde_400(cliente, envio):
+    id_envio, ids_chip = envio
+    respuesta = cliente.post('/api/resultados', json=[_evento('ok', id_envio, ids_chip[0]),
+                                                      _evento('grande', 2 ** 70, ids_chip[0])],
+                             headers={'Authorization': f'Bearer {TOKEN}'})
+    assert respuesta.status_code == 400
+    assert buffer_resultados.pendientes() == 0
+
+def test_evento_que_no_se_puede_convertir_no_arrastra_al_lote(app, envio, monkeypatch):
+    id_envio, ids_chip = envio
+    # Sin reintentos del lote completo: el error es del evento, no de la base
+    monkeypatch.setattr(Ingesta_Resultados, 'REINTENTOS', 1)
+    lote = [_evento('ok1', id_envio, ids_chip[0]), _evento('grande', 2 ** 70, ids_chip[1]),
+            _evento('ok2', id_envio, ids_chip[2])]
+    with app.app_context():
+        buffer_resultados._escribir(lote)
+        assert _enviados(id_envio) == 2
+        rechazado = EventoRechazado.query.one()
+        assert rechazado.clave == 'grande'
+        assert 'too large' in rechazado.motivo
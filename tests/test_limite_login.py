@@ -0,0 +1,34 @@
+import pytest
+from app import create_app
+from conftest import configuracion_prueba
+from extensions import db
+
+def _intento(cliente, ip, usuario='nadie'):
+    return cliente.post('/', data={'usuario': usuario, 'contrasena': 'x'},
+                        headers={'X-Forwarded-For': ip}).status_code
+
+@pytest.fixture
+def app_proxy(tmp_path, monkeypatch):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    app = create_app(configuracion_prueba(tmp_path, PROXY_SALTOS=1, LOGIN_INTENTOS_IP=3))
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+def test_detras_del_proxy_cada_cliente_tiene_su_cubeta(app_proxy):
+    cliente = app_proxy.test_client()
+    usuarios = iter(f'u{i}' for i in range(100))
+    assert [_intento(cliente, '10.0.0.1', next(usuarios)) for _ in range(4)] == [200, 200, 200, 429]
+    # Otro cliente detrás del mismo proxy no hereda el bloqueo
+    assert _intento(cliente, '10.0.0.2', next(usuarios)) == 200
+
+def test_sin_proxy_de_confianza_se_ignora_x_forwarded_for(app):
+    app.config['LOGIN_INTENTOS_IP'] = 3
+    cliente = app.test_client()
+    resultados = [_intento(cliente, f'10.0.0.{i}', f'u{i}') for i in range(4)]
+    assert resultados == [200, 200, 200, 429]
+
+def test_la_ip_admite_una_oficina_compartida(app):
+    # Valores por defecto: 30 personas detrás de un NAT inician sesión a la vez
+    cliente = app.test_client()
+    assert all(_intento(cliente, '', f'persona{i}') == 200 for i in range(30))
@@ -0,0 +1,70 @@
+import base64
+import json
+from conftest import crear_chips
+from extensions import db
+from modelo import Chip
+from paginacion import ClaveOrden, codificar_cursor, paginar_keyset
+
+# Todos los chips de crear_chips tienen la misma fecha: el desempate es idChip
+CLAVES = [
+    ClaveOrden(Chip.fecha_registro, lambda c: c.fecha_registro, descendente=True),
+    ClaveOrden(Chip.operadora, lambda c: c.operadora),
+    ClaveOrden(Chip.idChip, lambda c: c.idChip),
+]
+
+def _pagina(cursor=None, clave_total=None):
+    return paginar_keyset(Chip.query, CLAVES, cursor=cursor, per_page=10, clave_total=clave_total)
+
+def _ids(pagina):
+    return [chip.idChip for chip in pagina.items]
+
+def test_avanzar_y_retroceder_con_empates(app):
+    with app.app_context():
+        crear_chips(13, operadora='CLARO')
+        crear_chips(12, operadora='CNT', inicio=13)
+        esperado = [chip.idChip for chip in Chip.query.order_by(Chip.operadora, Chip.idChip)]
+
+        paginas = [_pagina()]
+        while paginas[-1].has_next:
+            paginas.append(_pagina(paginas[-1].next_cursor))
+        assert [len(p.items) for p in paginas] == [10, 10, 5]
+        assert sum((_ids(p) for p in paginas), []) == esperado
+        assert not paginas[0].has_prev and paginas[-1].has_prev
+
+        # Hacia atrás se obtienen exactamente las mismas páginas
+        segunda = _pagina(paginas[2].prev_cursor)
+        assert _ids(segunda) == _ids(paginas[1])
+        primera = _pagina(segunda.prev_cursor)
+        assert _ids(primera) == _ids(paginas[0])
+        assert not primera.has_prev and primera.has_next
+
+def test_cursor_invalido_vuelve_a_la_primera_pagina(app):
+    with app.app_context():
+        crear_chips(15)
+        primera = _ids(_pagina())
+        valido = _pagina().next_cursor
+
+        def cursor(datos):
+            return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+        for invalido in ['basura', valido[:-5], valido[::-1], '%%%',
+                         cursor([1, 2]), cursor({'a': True, 'k': 7}),
+                         cursor({'a': True, 'k': [{'dt': 'no-es-fecha'}, 'CLARO', 1]}),
+                         cursor({'a': True, 'k': [{'x': 1}, 'CLARO', 1]}),
+                         codificar_cursor([1, 2])]:
+            pagina = _pagina(invalido)
+            assert _ids(pagina) == primera, invalido
+            assert not pagina.has_prev
+
+def test_total_cacheado_queda_desactualizado_hasta_vencer(app):
+    from paginacion import cache_totales
+    with app.app_context():
+        crear_chips(15)
+        assert _pagina(clave_total=('chip', '')).total == 15
+        crear_chips(3, inicio=15)
+        # Total aproximado: no se recalcula en cada página mientras dure el TTL
+        assert _pagina(clave_total=('chip', '')).total == 15
+        assert _pagina(clave_total=('chip', 'otro filtro')).total == 18
+        cache_totales.invalidar(('chip', ''))
+        assert _pagina(clave_total=('chip', '')).total == 18
+        assert db.session.query(Chip).count() == 18
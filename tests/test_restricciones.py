@@ -0,0 +1,30 @@
+from extensions import db
+from modelo import Chip
+
+DATOS_CHIP = {
+    'numero': '593999000001', 'iccid': '895930000000000001', 'operadora': 'Claro',
+    'tipo_linea': 'Prepago', 'fecha_adquisicion': '2024-01-01', 'fecha_registro': '2024-01-02',
+    'fecha_activacion': '2024-01-03',
+}
+
+def test_duplicado_en_numero_e_iccid_muestra_ambos_errores(app, cliente_admin):
+    assert cliente_admin.post('/historial/chips/nuevo', data=DATOS_CHIP).status_code == 302
+    respuesta = cliente_admin.post('/historial/chips/nuevo', data=DATOS_CHIP)
+    html = respuesta.get_data(as_text=True)
+    assert 'Este número ya está registrado' in html
+    assert 'Este ICCID ya está registrado' in html
+    with app.app_context():
+        assert Chip.query.count() == 1
+
+def test_editar_no_reporta_su_propio_valor(app, cliente_admin):
+    cliente_admin.post('/historial/chips/nuevo', data=DATOS_CHIP)
+    cliente_admin.post('/historial/chips/nuevo', data=dict(
+        DATOS_CHIP, numero='593999000002', iccid='895930000000000002'))
+    with app.app_context():
+        id_chip = db.session.execute(db.select(Chip.idChip).filter_by(numero='593999000002')).scalar()
+    # Solo el número choca con otro chip; el ICCID es el suyo
+    respuesta = cliente_admin.post(f'/historial/chips/{id_chip}/editar', data=dict(
+        DATOS_CHIP, iccid='895930000000000002'))
+    html = respuesta.get_data(as_text=True)
+    assert 'Este número ya está registrado' in html
+    assert 'Este ICCID ya está registrado' not in html
@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta
+from conftest import crear_chips
+from extensions import db
+from modelo import DetalleEnvioChip, EnvioCampania, ResumenEnvio
+from logica.Logica_Campanias.Ingesta_Resultados import buffer_resultados
+from logica.Logica_Campanias.Resumen_Envios import reconstruir_resumen
+
+def _resumen():
+    return sorted(db.session.query(
+        ResumenEnvio.grano, ResumenEnvio.dimension, ResumenEnvio.clave,
+        ResumenEnvio.periodo, ResumenEnvio.enviados, ResumenEnvio.fallidos
+    ).tuples())
+
+def test_incremental_y_reconstruccion_usan_el_mismo_periodo(app):
+    with app.app_context():
+        ids_chip = crear_chips(3)
+        envio = EnvioCampania(cantidad_programada=10, fecha_envio=datetime.utcnow() - timedelta(days=3))
+        db.session.add(envio)
+        db.session.commit()
+        evento = lambda clave, chip: {'clave': clave, 'idEnvio': envio.idEnvio, 'idChip': chip,
+                                      'idUsuario': None, 'enviados': 2, 'fallidos': 1}
+        # Un detalle asignado hace dos días, otro sin fecha (usa la del envío) y uno
+        # que crea la propia ingesta al llegar el primer reporte
+        db.session.add_all([
+            DetalleEnvioChip(idEnvio=envio.idEnvio, idChip=ids_chip[0], cantidad_asignada=5,
+                             fecha_inicio=datetime.utcnow() - timedelta(days=2)),
+            DetalleEnvioChip(idEnvio=envio.idEnvio, idChip=ids_chip[1], cantidad_asignada=5),
+        ])
+        db.session.commit()
+        buffer_resultados._escribir([evento('a', ids_chip[0]), evento('b', ids_chip[1])])
+        buffer_resultados._escribir([evento('c', ids_chip[0]), evento('d', ids_chip[2])])
+
+        incremental = _resumen()
+        reconstruir_resumen()
+        assert _resumen() == incremental
@@ -0,0 +1,35 @@
+from extensions import db
+from modelo import UsuarioRol, VersionCache
+import decoradores
+from decoradores import obtener_roles_usuario, cache_version_roles
+
+def _cambio_en_otro_worker():
+    """Lo que hace invalidar_roles_usuario en otro proceso: cambia la base y la versión"""
+    UsuarioRol.query.filter_by(idUsuario=1).delete()
+    VersionCache.query.filter_by(clave='roles').update({'version': VersionCache.version + 1})
+    db.session.commit()
+
+def test_revocacion_en_otro_worker_se_ve_al_verificar_la_version(app):
+    with app.app_context():
+        assert 'Administrador General' in obtener_roles_usuario(1)
+        _cambio_en_otro_worker()
+        # Dentro del intervalo de verificación se sigue usando la caché local
+        assert 'Administrador General' in obtener_roles_usuario(1)
+        # Vencido el intervalo (VERIFICACION_ROLES_SEGUNDOS) se relee la versión
+        cache_version_roles.limpiar()
+        assert obtener_roles_usuario(1) == frozenset()
+
+def test_invalidar_incrementa_la_version(app):
+    with app.app_context():
+        antes = db.session.get(VersionCache, 'roles').version
+        decoradores.invalidar_roles_usuario(1)
+        db.session.expire_all()
+        assert db.session.get(VersionCache, 'roles').version == antes + 1
+
+def test_usuario_sin_roles_pierde_acceso(app, cliente_admin):
+    assert cliente_admin.get('/admin/usuarios').status_code == 200
+    with app.app_context():
+        _cambio_en_otro_worker()
+    cache_version_roles.limpiar()
+    respuesta = cliente_admin.get('/admin/usuarios')
+    assert respuesta.status_code == 302
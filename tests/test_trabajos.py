@@ -0,0 +1,44 @@
+import threading
+from extensions import db
+from modelo import Trabajo
+import trabajos
+from trabajos import gestor_trabajos
+
+def test_trabajos_descartados_al_detener_quedan_fallidos(app, monkeypatch):
+    liberar = threading.Event()
+    iniciado = threading.Event()
+
+    def tarea_lenta(contexto):
+        iniciado.set()
+        liberar.wait(10)
+        return {'ok': True}
+
+    monkeypatch.setitem(trabajos.TAREAS, 'prueba_lenta', tarea_lenta)
+    app.config['TRABAJOS_HILOS'] = 1
+    gestor_trabajos.detener()  # pool nuevo con un solo hilo
+    with app.app_context():
+        ids = [gestor_trabajos.encolar('prueba_lenta').id for _ in range(3)]
+    assert iniciado.wait(10)
+    en_curso = gestor_trabajos._futuros[ids[0]]
+
+    gestor_trabajos.detener()
+    liberar.set()
+    en_curso.result(10)
+
+    with app.app_context():
+        estados = {t.id: (t.estado, t.mensaje) for t in Trabajo.query}
+    assert estados[ids[0]] == ('COMPLETADO', None)
+    for id_trabajo in ids[1:]:
+        assert estados[id_trabajo][0] == 'FALLIDO'
+        assert 'antes de iniciarlo' in estados[id_trabajo][1]
+
+def test_pendientes_de_un_proceso_terminado_se_recuperan(app):
+    import socket
+    with app.app_context():
+        # Un pid fuera del rango habitual: el proceso no existe
+        for estado in ('PENDIENTE', 'EN CURSO'):
+            db.session.add(Trabajo(tipo='prueba', estado=estado, proceso=f'{socket.gethostname()}:4194303'))
+        db.session.add(Trabajo(tipo='prueba', estado='PENDIENTE', proceso='otro-equipo:1'))
+        db.session.commit()
+        assert gestor_trabajos.recuperar_huerfanos() == 2
+        assert [t.estado for t in Trabajo.query.order_by(Trabajo.id)] == ['FALLIDO', 'FALLIDO', 'PENDIENTE']
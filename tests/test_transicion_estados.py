@@ -0,0 +1,77 @@
+import pytest
+from conftest import crear_chips
+from extensions import db
+from modelo import ChipEstado, ChipEstadoActual
+from trabajos import Trabajo
+
+def _estado(nombre):
+    return ChipEstado.query.filter_by(nombre=nombre).first()
+
+def test_transicion_masiva_sin_numeros_ni_filtro_falla(app):
+    from logica.Logica_Historial.Estados_Historial import transicion_masiva
+    with app.app_context():
+        crear_chips(5)
+        bloqueado = _estado('BLOQUEADO')
+        for numeros, busqueda in ((None, ''), ([], '  '), ([' ', ''], None)):
+            with pytest.raises(ValueError):
+                transicion_masiva(bloqueado, numeros=numeros, busqueda=busqueda)
+        assert ChipEstadoActual.query.filter_by(idEstado=bloqueado.idEstado).count() == 0
+
+def test_transicion_masiva_con_lista_vacia_usa_el_filtro(app):
+    from logica.Logica_Historial.Estados_Historial import transicion_masiva
+    with app.app_context():
+        crear_chips(3)
+        resultado = transicion_masiva(_estado('BLOQUEADO'), numeros=[], busqueda='900000001')
+        db.session.commit()
+        assert resultado.actualizados == 1
+
+@pytest.mark.parametrize('numeros', [',', ' , ,\n', ''])
+def test_formulario_rechaza_separadores_sueltos(app, cliente_admin, numeros):
+    with app.app_context():
+        crear_chips(5)
+        id_estado = _estado('BLOQUEADO').idEstado
+    respuesta = cliente_admin.post('/historial/estados/transicion',
+                                   data={'estado': id_estado, 'numeros': numeros, 'busqueda': ''})
+    assert respuesta.status_code == 200
+    assert 'Ingrese los números de chip o un filtro de búsqueda' in respuesta.get_data(as_text=True)
+    with app.app_context():
+        assert Trabajo.query.count() == 0
+
+def test_trabajo_de_transicion_informa_el_avance_final(app):
+    import json
+    from trabajos import gestor_trabajos
+    with app.app_context():
+        crear_chips(1200)
+        bloqueado = _estado('BLOQUEADO')
+        trabajo = Trabajo(tipo='transicion_estados', parametros=json.dumps(
+            {'id_estado': bloqueado.idEstado, 'numeros': None, 'busqueda': '9'}))
+        db.session.add(trabajo)
+        db.session.commit()
+        id_trabajo, id_estado = trabajo.id, bloqueado.idEstado
+    gestor_trabajos._ejecutar(id_trabajo)
+    with app.app_context():
+        trabajo = db.session.get(Trabajo, id_trabajo)
+        assert trabajo.estado == 'COMPLETADO'
+        # Los bloques siguientes caen dentro del intervalo de escritura: se guardan al terminar
+        assert (trabajo.progreso, trabajo.total) == (1200, 1200)
+        assert trabajo.mensaje == '1200 de 1200 chips actualizados'
+        assert ChipEstadoActual.query.filter_by(idEstado=id_estado).count() == 1200
+
+def test_transicion_cancelada_conserva_los_bloques_confirmados(app):
+    from contadores import clave_estado, leer_contadores
+    from logica.Logica_Historial.Estados_Historial import transicion_masiva
+    from trabajos import TrabajoCancelado
+    avances = []
+
+    def cancelar_tras_el_primero(procesados, total):
+        avances.append((procesados, total))
+        raise TrabajoCancelado()
+
+    with app.app_context():
+        crear_chips(1200)
+        bloqueado = _estado('BLOQUEADO')
+        with pytest.raises(TrabajoCancelado):
+            transicion_masiva(bloqueado, busqueda='9', al_avanzar=cancelar_tras_el_primero)
+        assert avances == [(500, 1200)]
+        assert ChipEstadoActual.query.filter_by(idEstado=bloqueado.idEstado).count() == 500
+        assert leer_contadores().get(clave_estado(bloqueado.idEstado)) == 500
@@ -0,0 +1,76 @@
+import pytest
+from conftest import contar_consultas
+
+# Lectura del usuario por clave primaria (la de obtener_usuario_actual)
+CONSULTA_IDENTIDAD = r'FROM usuario\s+WHERE usuario\."idUsuario"'
+
+PAGINAS = [
+    '/dashboard',
+    '/perfil',
+    '/historial',
+    '/historial/celulares',
+    '/historial/chips',
+    '/historial/estados',
+    '/historial/estados/transicion',
+    '/historial/importar',
+    '/admin/usuarios',
+    '/trabajos',
+    '/campanias/analitica',
+]
+
+@pytest.mark.parametrize('url', PAGINAS)
+def test_a_lo_sumo_una_consulta_de_identidad(app, cliente_admin, url):
+    with contar_consultas(app) as consultas:
+        respuesta = cliente_admin.get(url)
+    assert respuesta.status_code == 200
+    assert len(consultas.que_coinciden(CONSULTA_IDENTIDAD)) <= 1
+
+@pytest.mark.parametrize('url', ['/dashboard', '/perfil', '/historial/estados'])
+def test_paginas_con_usuario_en_plantilla_lo_cargan_una_vez(app, cliente_admin, url):
+    with contar_consultas(app) as consultas:
+        cliente_admin.get(url)
+    assert len(consultas.que_coinciden(CONSULTA_IDENTIDAD)) == 1
+
+def test_usuario_actual_se_reutiliza_en_la_peticion(app, cliente_admin):
+    from decoradores import obtener_usuario_actual
+    with app.test_request_context('/'):
+        from flask import session
+        session['id_usuario'] = 1
+        with contar_consultas(app) as consultas:
+            primero = obtener_usuario_actual()
+            segundo = obtener_usuario_actual()
+        assert primero is segundo
+        assert primero.username == 'admin'
+        assert len(consultas.que_coinciden(CONSULTA_IDENTIDAD)) == 1
+
+def test_listado_de_usuarios_con_consultas_constantes(app, cliente_admin):
+    from decoradores import cache_version_roles
+    from extensions import db
+    from modelo import Rol, Usuario, UsuarioRol
+
+    def consultas_del_listado():
+        # Las dos mediciones hacen la verificación periódica de la versión de roles
+        cache_version_roles.limpiar()
+        with contar_consultas(app) as consultas:
+            respuesta = cliente_admin.get('/admin/usuarios')
+        assert respuesta.status_code == 200
+        return consultas, respuesta.get_data(as_text=True)
+
+    with app.app_context():
+        roles = [rol.idRol for rol in Rol.query.order_by(Rol.idRol)]
+        db.session.add_all(UsuarioRol(idUsuario=1, idRol=id_rol) for id_rol in roles[1:3])
+        db.session.commit()
+    cliente_admin.get('/admin/usuarios')
+    con_uno, _ = consultas_del_listado()
+
+    with app.app_context():
+        for i in range(12):
+            usuario = Usuario(nombre=f'Usuario {i}', username=f'usuario{i}', password='x')
+            db.session.add(usuario)
+            db.session.flush()
+            db.session.add_all(UsuarioRol(idUsuario=usuario.idUsuario, idRol=id_rol) for id_rol in roles[:3])
+        db.session.commit()
+    con_pagina_llena, html = consultas_del_listado()
+
+    assert html.count('Supervisor Operaciones') >= 10
+    assert len(con_pagina_llena) == len(con_uno), con_pagina_llena.sentencias
@@ -0,0 +1,266 @@
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from modelo import db, Trabajo
+
+# Valores por defecto, sobrescribibles con TRABAJOS_HILOS / TRABAJOS_RETENCION_DIAS / TRABAJOS_DIR
+HILOS = 2
+RETENCION_DIAS = 7
+# Como máximo una escritura de avance (y una lectura de cancelación) por segundo y trabajo
+INTERVALO_PROGRESO = 1.0
+
+ESTADOS_ABIERTOS = ('PENDIENTE', 'EN CURSO')
+
+# Tareas disponibles por tipo; cada módulo registra las suyas con @tarea
+TAREAS = {}
+
+def tarea(tipo):
+    """Registra `funcion(contexto, **parametros)` como ejecutable en segundo plano"""
+    def decorador(funcion):
+        TAREAS[tipo] = funcion
+        return funcion
+    return decorador
+
+class TrabajoCancelado(Exception):
+    """Se pidió cancelar el trabajo en curso"""
+
+def _proceso_actual():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ContextoTrabajo:
+    """Lo recibe cada tarea para informar avance, atender cancelaciones y dejar archivos"""
+
+    def __init__(self, gestor, trabajo):
+        self._gestor = gestor
+        self.id = trabajo.id
+        self.archivo = None
+        self._ultima_escritura = 0.0
+        # Último avance informado que no se escribió por el intervalo; se guarda al terminar
+        self.pendiente = None
+
+    def ruta_archivo(self, extension):
+        """Ruta del archivo resultado del trabajo (se conserva hasta la purga)"""
+        self.archivo = f'{self.id}.{extension}'
+        return os.path.join(self._gestor.directorio, self.archivo)
+
+    def cancelado(self):
+        return self.id in self._gestor._cancelados
+
+    def avanzar(self, progreso, total=None, mensaje=None):
+        """Registra el avance; lanza TrabajoCancelado si se pidió cancelar"""
+        if self.cancelado():
+            raise TrabajoCancelado()
+        valores = {'progreso': progreso}
+        if total is not None:
+            valores['total'] = total
+        if mensaje is not None:
+            valores['mensaje'] = mensaje[:500]
+        ahora = time.monotonic()
+        if ahora - self._ultima_escritura < INTERVALO_PROGRESO:
+            self.pendiente = valores
+            return
+        self._ultima_escritura = ahora
+        self.pendiente = None
+
+        tabla = Trabajo.__table__
+        # Conexión propia: el avance se ve aunque la tarea tenga su transacción abierta
+        with db.engine.begin() as conexion:
+            conexion.execute(update(tabla).where(tabla.c.id == self.id).values(**valores))
+            cancelar = conexion.execute(select(tabla.c.cancelar).where(tabla.c.id == self.id)).scalar()
+        if cancelar:
+            raise TrabajoCancelado()
+
+class GestorTrabajos:
+    """Ejecuta tareas largas en un pool de hilos con su estado persistido en la tabla trabajo"""
+
+    def __init__(self):
+        self.app = None
+        self._ejecutor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._cancelados = set()
+        # id -> Future de los trabajos enviados al pool que aún no terminaron
+        self._futuros = {}
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('TRABAJOS_HILOS', int(os.environ.get('TRABAJOS_HILOS', HILOS)))
+        app.config.setdefault('TRABAJOS_RETENCION_DIAS',
+                              int(os.environ.get('TRABAJOS_RETENCION_DIAS', RETENCION_DIAS)))
+        app.config.setdefault('TRABAJOS_DIR', os.environ.get(
+            'TRABAJOS_DIR', os.path.join(app.instance_path, 'trabajos')))
+        self.directorio = app.config['TRABAJOS_DIR']
+        os.makedirs(self.directorio, exist_ok=True)
+        atexit.register(self.detener)
+
+        with app.app_context():
+            self.recuperar_huerfanos()
+            self.purgar()
+
+    def _obtener_ejecutor(self):
+        # Un pool por proceso: tras un fork el del padre no tiene hilos vivos
+        with self._lock:
+            if self._ejecutor is None or self._pid != os.getpid():
+                self._ejecutor = ThreadPoolExecutor(
+                    max_workers=self.app.config['TRABAJOS_HILOS'], thread_name_prefix='trabajo'
+                )
+                self._pid = os.getpid()
+            return self._ejecutor
+
+    def ruta_entrada(self, extension):
+        """Ruta temporal para el archivo de entrada de un trabajo (la tarea la elimina)"""
+        entradas = os.path.join(self.directorio, 'entradas')
+        os.makedirs(entradas, exist_ok=True)
+        return os.path.join(entradas, f'{uuid.uuid4().hex}.{extension}')
+
+    def encolar(self, tipo, parametros=None, id_usuario=None, descripcion=None):
+        """Registra el trabajo y lo envía al pool; devuelve el Trabajo creado"""
+        if tipo not in TAREAS:
+            raise KeyError(f'Tarea desconocida: {tipo}')
+        trabajo = Trabajo(
+            tipo=tipo,
+            descripcion=descripcion,
+            parametros=json.dumps(parametros or {}),
+            idUsuario=id_usuario,
+            proceso=_proceso_actual()
+        )
+        db.session.add(trabajo)
+        db.session.commit()
+        id_trabajo = trabajo.id
+        futuro = self._obtener_ejecutor().submit(self._ejecutar, id_trabajo)
+        self._futuros[id_trabajo] = futuro
+        futuro.add_done_callback(lambda _: self._futuros.pop(id_trabajo, None))
+        return trabajo
+
+    def _ejecutar(self, id_trabajo):
+        with self.app.app_context():
+            trabajo = db.session.get(Trabajo, id_trabajo)
+            if trabajo is None or trabajo.estado != 'PENDIENTE':
+                return
+            trabajo.estado = 'EN CURSO'
+            trabajo.fecha_inicio = datetime.utcnow()
+            db.session.commit()
+
+            contexto = ContextoTrabajo(self, trabajo)
+            resultado = None
+            mensaje = None
+            try:
+                resultado = TAREAS[trabajo.tipo](contexto, **json.loads(trabajo.parametros or '{}'))
+                estado = 'COMPLETADO'
+            except TrabajoCancelado:
+                db.session.rollback()
+                estado = 'CANCELADO'
+            except Exception as e:
+                db.session.rollback()
+                self.app.logger.exception(f'Error en el trabajo {id_trabajo} ({trabajo.tipo})')
+                estado = 'FALLIDO'
+                mensaje = str(e)[:500]
+            finally:
+                self._cancelados.discard(id_trabajo)
+
+            trabajo = db.session.get(Trabajo, id_trabajo)
+            trabajo.estado = estado
+            trabajo.fecha_fin = datetime.utcnow()
+            for campo, valor in (contexto.pendiente or {}).items():
+                setattr(trabajo, campo, valor)
+            if mensaje:
+                trabajo.mensaje = mensaje
+            if resultado is not None:
+                trabajo.resultado = json.dumps(resultado, default=str)
+            if contexto.archivo and estado == 'COMPLETADO':
+                trabajo.archivo = contexto.archivo
+            db.session.commit()
+
+    def cancelar(self, trabajo):
+        """Cancela un trabajo pendiente o pide al que está en curso que se detenga"""
+        if trabajo.estado == 'PENDIENTE':
+            trabajo.estado = 'CANCELADO'
+            trabajo.fecha_fin = datetime.utcnow()
+        elif trabajo.estado == 'EN CURSO':
+            trabajo.cancelar = True
+            self._cancelados.add(trabajo.id)
+        else:
+            return False
+        db.session.commit()
+        return True
+
+    def recuperar_huerfanos(self):
+        """Marca como fallidos los trabajos pendientes o en curso cuyo proceso ya no existe en este equipo"""
+        host = socket.gethostname()
+        huerfanos = 0
+        for trabajo in Trabajo.query.filter(Trabajo.estado.in_(ESTADOS_ABIERTOS)):
+            host_trabajo, _, pid = (trabajo.proceso or '').rpartition(':')
+            if host_trabajo != host or not pid.isdigit():
+                continue
+            if int(pid) == os.getpid() or not _proceso_vivo(int(pid)):
+                trabajo.estado = 'FALLIDO'
+                trabajo.mensaje = 'Interrumpido: el proceso que lo ejecutaba terminó'
+                trabajo.fecha_fin = datetime.utcnow()
+                huerfanos += 1
+        db.session.commit()
+        return huerfanos
+
+    def purgar(self, dias=None):
+        """Elimina los trabajos terminados hace más de `dias` y sus archivos"""
+        if dias is None:
+            dias = self.app.config['TRABAJOS_RETENCION_DIAS']
+        limite = datetime.utcnow() - timedelta(days=dias)
+        vencidos = Trabajo.query.filter(
+            Trabajo.estado.notin_(ESTADOS_ABIERTOS),
+            Trabajo.fecha_fin < limite
+        ).all()
+        for trabajo in vencidos:
+            if trabajo.archivo:
+                try:
+                    os.remove(os.path.join(self.directorio, trabajo.archivo))
+                except FileNotFoundError:
+                    pass
+            db.session.delete(trabajo)
+        db.session.commit()
+        return len(vencidos)
+
+    def detener(self, esperar=False):
+        """Descarta lo que no empezó; con `esperar` deja terminar los trabajos en curso
+
+        Los trabajos descartados quedan como fallidos: ningún proceso los va a ejecutar.
+        """
+        if self._ejecutor is None or self._pid != os.getpid():
+            return
+        enviados = list(self._futuros.items())
+        self._ejecutor.shutdown(wait=esperar, cancel_futures=True)
+        self._ejecutor = None
+        descartados = [id_trabajo for id_trabajo, futuro in enviados if futuro.cancelled()]
+        if descartados:
+            self._marcar_descartados(descartados)
+
+    def _marcar_descartados(self, ids):
+        tabla = Trabajo.__table__
+        try:
+            with self.app.app_context(), db.engine.begin() as conexion:
+                conexion.execute(update(tabla).where(
+                    tabla.c.id.in_(ids), tabla.c.estado == 'PENDIENTE'
+                ).values(
+                    estado='FALLIDO',
+                    mensaje='Interrumpido: el proceso se detuvo antes de iniciarlo',
+                    fecha_fin=datetime.utcnow()
+                ))
+        except Exception:
+            self.app.logger.exception(f'No se pudieron marcar los trabajos descartados {ids}')
+
+gestor_trabajos = GestorTrabajos()
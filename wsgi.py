@@ -0,0 +1,9 @@
+"""Punto de entrada para producción
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+`python app.py` queda para desarrollo (servidor de Werkzeug con debug).
+"""
+from app import create_app
+
+app = create_app()